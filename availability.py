@@ -0,0 +1,115 @@
+from bisect import bisect_left, bisect_right
+from typing import Any, Callable, Iterable, Mapping, Sequence
+
+INF = float("inf")
+
+
+class AvailabilityTimeline:
+    """
+    Interval index over an availability mapping ``{threshold: processors}``.
+
+    The thresholds cut time into segments, segment j being
+    [thresholds[j], thresholds[j+1]). ``views`` turns the processors of a
+    threshold into the processor views of the pool (see
+    schedule_memory.processors_views). For every segment and view, the
+    processors up during the segment are kept sorted by the end of their
+    availability window, the latest first, ties in view order. The processors
+    of a view that stay up during [t, t+d) are then a prefix of that list,
+    found by bisection: O(log S + log P) to locate it. That prefix is made of
+    runs of processors leaving together, each in view order; ``rank`` gives
+    the view order across runs.
+
+    Everything is computed once, in O(S * P).
+    """
+
+    def __init__(self, processors: Mapping[int, Any], views: Callable[[Any], Sequence[Iterable[int]]]):
+        self.processors = processors
+        self.thresholds = sorted(processors.keys())
+        num_segments = len(self.thresholds)
+        segments = [[list(view) for view in views(processors[t])] for t in self.thresholds]
+
+        # End of the window of every processor per view, and start and end of
+        # its window in any view
+        up = [{p for view in segment for p in view} for segment in segments]
+        last = num_segments - 1
+        ends: list[list[dict[int, float]]] = [[{} for _ in segment] for segment in segments]
+        up_ends: list[dict[int, float]] = [{} for _ in segments]
+        for j in range(last, -1, -1):
+            end = INF if j == last else self.thresholds[j+1]
+            following = up_ends[j+1] if j < last else {}
+            up_ends[j] = {p: following.get(p, end) for p in up[j]}
+            for v, view in enumerate(segments[j]):
+                following = ends[j+1][v] if j < last else {}
+                ends[j][v] = {p: following.get(p, end) for p in view}
+        self._window: list[dict[int, tuple[int, float]]] = []
+        starts: list[list[dict[int, int]]] = []
+        previous: dict[int, tuple[int, float]] = {}
+        for j in range(num_segments):
+            previous = {p: (previous[p][0] if p in previous else self.thresholds[j], up_ends[j][p]) for p in up[j]}
+            self._window.append(previous)
+            starts.append([{p: starts[j-1][v].get(p, self.thresholds[j]) if j else self.thresholds[j] for p in view}
+                           for v, view in enumerate(segments[j])])
+
+        self._order: list[list[list[int]]] = []
+        self._neg_ends: list[list[list[float]]] = []
+        for j, segment in enumerate(segments):
+            # sorted is stable: processors whose windows end together keep the view order
+            order = [sorted(view, key=lambda p, v=v: -ends[j][v][p]) for v, view in enumerate(segment)]
+            self._order.append(order)
+            self._neg_ends.append([[-ends[j][v][p] for p in view] for v, view in enumerate(order)])
+        self._ends = ends
+        self._rank = [[{p: k for k, p in enumerate(view)} for view in segment] for segment in segments]
+        # Start of every run of equal window ends in the sorted views
+        self._runs = [[[k for k, neg_end in enumerate(neg_ends) if not k or neg_end != neg_ends[k-1]]
+                       for neg_ends in segment] for segment in self._neg_ends]
+        self._starts = starts
+
+    def __len__(self) -> int:
+        return len(self.thresholds)
+
+    def segment(self, t: float) -> int:
+        """Segment containing time t (the first one for times before the first threshold)."""
+        return max(bisect_right(self.thresholds, t) - 1, 0)
+
+    def views(self, j: int) -> list[list[int]]:
+        """Views of segment j, each sorted by window end, the latest first."""
+        return self._order[j]
+
+    def window(self, j: int, p: int) -> tuple[int, float]:
+        """Availability window of processor p around segment j, p must be up during it."""
+        return self._window[j][p]
+
+    def window_start(self, j: int, view: int, p: int) -> int:
+        """Time processor p joined the view, p must be in it during segment j."""
+        return self._starts[j][view][p]
+
+    def window_end(self, j: int, view: int, p: int) -> float:
+        """Time processor p leaves the view, -inf if it is not in the view during segment j."""
+        return self._ends[j][view].get(p, -INF)
+
+    def count_up(self, j: int, view: int, end: float) -> int:
+        """Number of processors of the view, up during segment j, that stay in it until end."""
+        return bisect_right(self._neg_ends[j][view], -end)
+
+    def runs(self, j: int, view: int, end: float) -> list[tuple[int, int]]:
+        """
+        Slots [lo, hi) of the sorted view of segment j holding the processors
+        that stay up until end, one range per window end, the latest first.
+        """
+        count = self.count_up(j, view, end)
+        starts = self._runs[j][view]
+        if len(starts) == 1 or count <= starts[1]:
+            return [(0, count)] if count else []
+        k = bisect_left(starts, count)
+        return list(zip(starts[:k], [*starts[1:k], count]))
+
+    def rank(self, j: int, view: int, p: int) -> int:
+        """Position of processor p in the view, as given by views before sorting."""
+        return self._rank[j][view][p]
+
+    def up_during(self, t: float, duration: float, view: int = 0) -> list[int]:
+        """Processors of the view up during the whole of [t, t+duration), the longest available first."""
+        j = self.segment(t)
+        if t < self.thresholds[j]:
+            return []
+        return self._order[j][view][:self.count_up(j, view, t + duration)]
@@ -0,0 +1,197 @@
+"""
+Schedule one task graph for many configurations, loading the graph and
+computing its binding only once.
+
+A configuration is a JSON friendly dict, the scheduler is picked from its keys:
+
+    {"nodes": 4}                                      schedule (fixed core count)
+    {"processors": {"0": 4, "250": 10}}               schedule_module (core count over time)
+    {"processors": {"0": [[0, 1, 2], [3]]},
+     "mem_lim": 512}                                  schedule_memory (typed cores over time)
+
+With typed cores, ``"scheduler": "ready_list"`` runs
+ready_list.ready_list_schedule instead of schedule_memory (the same engine
+loop). ``"placement": "insertion"`` fills idle gaps of the cores instead of
+appending after their last task, and ``"profile": true`` adds the
+per-phase stats of the run (see instrumentation.py). A
+``"communication"`` model (see communication.py) replaces the fixed
+penalty paid when a task leaves the core of its predecessor, and
+``"selection": "eft"`` picks the core the task finishes first on (see
+selection.py). ``"priority"`` orders the tasks with another list
+scheduler than MCP (see engine.py), the shared ALAP binding is then not
+used. A ``"failures"`` trace (see failures.py) is applied to the
+schedule, the tasks it interrupts running again on any core; with core
+counts over time it also replaces the failure schedule_module simulates
+by default. Failures are not supported with typed cores, whose types and
+memory windows reexecute does not know. Other keys (e.g. a "name") are
+ignored.
+"""
+import argparse
+import json
+from concurrent.futures import ProcessPoolExecutor
+from types import MappingProxyType
+from typing import Any, Callable, Optional
+
+import schedule
+import schedule_memory
+import schedule_module
+from binding_cache import BindingCache, LocalStore
+from communication import CommunicationModel
+from engine import check_priority
+from failures import FailureTrace, reexecute
+from gaps import check_placement
+from graph_format import load_graph
+from instrumentation import SchedulerStats
+from ready_list import ready_list_schedule
+from schedule_result import ScheduleResult
+from selection import check_selection
+from task_graph import TaskGraph
+from timing import alap_order
+
+Config = dict[str, Any]
+Scheduler = Callable[[TaskGraph, dict[str,Any], Optional[SchedulerStats]], tuple[ScheduleResult,int]]
+
+# Graph and binding shared by the jobs of a worker process
+_graph: Optional[TaskGraph] = None
+_binding: Optional[dict[str,Any]] = None
+
+
+def parse_processors(processors: dict[Any,Any]) -> MappingProxyType:
+    """Availability mapping read from JSON: int thresholds, and sets for typed cores."""
+    mapping = {}
+    for t, cores in processors.items():
+        if isinstance(cores, int):
+            mapping[int(t)] = cores
+        else:
+            mapping[int(t)] = (set(cores[0]), set(cores[1]))
+    return MappingProxyType(dict(sorted(mapping.items())))
+
+
+def num_cores(config: Config) -> int:
+    if "nodes" in config:
+        return config["nodes"]
+    processors = parse_processors(config["processors"])
+    if "mem_lim" in config:
+        return max(max(t1 | t2, default=-1) for t1, t2 in processors.values()) + 1
+    return max(processors.values())
+
+
+def scheduler_for(config: Config) -> Scheduler:
+    placement = config.get("placement", "append")
+    check_placement(placement)
+    selection = config.get("selection", "affinity")
+    check_selection(selection)
+    priority = config.get("priority", "alap")
+    check_priority(priority)
+    communication = CommunicationModel.from_dict(config["communication"]) if config.get("communication") else None
+    failures = FailureTrace.from_list(config["failures"]) if "failures" in config else None
+    if failures is not None and "nodes" not in config and "mem_lim" in config:
+        raise ValueError(f"'failures' cannot be used with typed cores ('mem_lim'): {config}")
+    if "nodes" in config:
+        num_processors = config["nodes"]
+
+        com_penalty = schedule.FixedCores.com_penalty
+
+        def run(graph, data, stats=None):
+            result, makespan, _, _ = schedule.modified_critical_path(graph, num_processors, data, stats, placement,
+                                                                     communication, selection, priority)
+            return result, makespan
+    elif "mem_lim" in config:
+        processors = parse_processors(config["processors"])
+        mem_lim = config["mem_lim"]
+        scheduler = ready_list_schedule if config.get("scheduler") == "ready_list" else schedule_memory.modified_critical_path
+        com_penalty = schedule_memory.TypedCores.com_penalty
+
+        def run(graph, data, stats=None):
+            result, makespan, _, _ = scheduler(graph, processors, mem_lim, data, stats, placement, communication,
+                                               selection, priority)
+            return result, makespan
+    elif "processors" in config:
+        processors = parse_processors(config["processors"])
+        com_penalty = schedule_module.VaryingCores.com_penalty
+        module_failures = schedule_module.DEFAULT_FAILURES if failures is None else failures
+
+        def run(graph, data, stats=None):
+            result, makespan, _, _ = schedule_module.modified_critical_path(graph, processors, data, stats, placement,
+                                                                            communication, selection, priority,
+                                                                            module_failures)
+            return result, makespan
+    else:
+        raise ValueError(f"Configuration needs 'nodes' or 'processors': {config}")
+    if priority != "alap":
+        scheduler_run = run
+
+        def run(graph, data, stats=None):
+            # The binding holds the ALAP order, the engine computes the other priorities
+            return scheduler_run(graph, None, stats)
+    if failures is not None:
+        failure_free_run = run
+        cores = range(num_cores(config))
+
+        def run(graph, data, stats=None):
+            result, _ = failure_free_run(graph, data, stats)
+            result, makespan, _ = reexecute(graph, result, failures, cores, com_penalty)
+            return result, makespan
+    return run
+
+
+def run_config(graph: TaskGraph, binding: dict[str,Any], config: Config, include_schedule: bool = True) -> dict[str,Any]:
+    # The schedulers consume the order, every run gets its own copy
+    data = {"order": binding["order"].copy(), "ub": binding["ub"]}
+    stats = SchedulerStats() if config.get("profile") else None
+    result, makespan = scheduler_for(config)(graph, data, stats)
+    out = {"config": config, "makespan": makespan}
+    if stats is not None:
+        out["stats"] = stats.as_dict()
+    if include_schedule:
+        out["schedule"] = result.per_core(num_cores(config))
+    return out
+
+
+def _init_worker(graph: TaskGraph, binding: dict[str,Any]):
+    global _graph, _binding
+    _graph = graph
+    _binding = binding
+
+
+def _run_job(config: Config, include_schedule: bool) -> dict[str,Any]:
+    return run_config(_graph, _binding, config, include_schedule)
+
+
+def schedule_batch(graph: TaskGraph, configs: list[Config], binding: Optional[dict[str,Any]] = None,
+                   max_workers: Optional[int] = None, include_schedules: bool = True) -> list[dict[str,Any]]:
+    """
+    Schedule graph for every configuration, in order. The binding is computed
+    once (unless given) and the configurations are spread over max_workers
+    processes, each worker receiving the graph and binding once.
+    """
+    if binding is None:
+        order, ub = alap_order(graph)
+        binding = {"order": order, "ub": ub}
+
+    if max_workers == 1 or len(configs) <= 1:
+        return [run_config(graph, binding, config, include_schedules) for config in configs]
+
+    with ProcessPoolExecutor(max_workers, initializer=_init_worker, initargs=(graph, binding)) as executor:
+        return list(executor.map(_run_job, configs, [include_schedules] * len(configs)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Schedule one task graph for a list of configurations.")
+    parser.add_argument("graph", help="task graph file (.json or .tg)")
+    parser.add_argument("configs", help="JSON file with the list of configurations")
+    parser.add_argument("-o", "--output", help="where to write the results (default: print makespans)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="number of worker processes")
+    args = parser.parse_args()
+
+    G = load_graph(args.graph)
+    with open(args.configs, "r") as infile:
+        configs = json.load(infile)
+    data = BindingCache(LocalStore("bindings")).binding(G)
+
+    results = schedule_batch(G, configs, data, args.workers, include_schedules=args.output is not None)
+    if args.output is not None:
+        with open(args.output, "w") as outfile:
+            json.dump(results, outfile)
+    for res in results:
+        print(f"{json.dumps(res['config'])}: {res['makespan']}")
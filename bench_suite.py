@@ -0,0 +1,347 @@
+"""
+Benchmark suite for the hot paths: loading, graph build, binding, critical
+path, every scheduler and result serialization, over the generated size
+ladder with fixed seeds.
+
+Every (case, size) runs in a fresh process so that its memory is its own.
+Only the case itself is timed, its inputs are prepared beforehand, and the
+peak RSS is the one of the timed runs (on Linux, where the high-water mark
+can be reset; elsewhere it includes the preparation), next to the RSS
+before them. Results are written as JSON and can be compared with a
+baseline:
+
+    python bench_suite.py --sizes 1000 10000 --output bench/baseline.json
+    python bench_suite.py --sizes 1000 10000 --compare bench/baseline.json --threshold 0.1
+
+The compare mode exits with status 1 when a case got slower than the
+baseline by more than the threshold, and by more than --min-delta seconds:
+the median of a few runs of a millisecond case is mostly noise. Likewise
+when its peak RSS grew by more than --rss-threshold and by more than
+--min-rss-delta MB, if both runs measured it the same way.
+"""
+import argparse
+import gc
+import json
+import multiprocessing as mp
+import os
+import platform
+import resource
+import statistics
+import sys
+from timeit import default_timer as timer
+from types import MappingProxyType
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+import schedule
+import schedule_memory
+import schedule_module
+from graph import build_graph, find_critical_path
+from graph_format import convert_json, load_task_graph
+from graph_generator import save_graph_to_json, size_ladder
+from graph_stream import stream_task_graph
+from timing import alap_binding, alap_order
+
+BENCH_DIR = "bench_data"
+SEED = 42
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+REPEAT = 5
+# Slowdowns shorter than this (in seconds) are never regressions
+MIN_DELTA = 0.005
+# Nor peak RSS growths under this (in MB): allocator and page cache noise
+RSS_THRESHOLD = 0.2
+MIN_RSS_DELTA = 16.0
+
+CORES = 4
+PROCESSORS_MODULE = MappingProxyType({0: 4, 250: 10, 500: 7, 750: 3, 1000: 8})
+PROCESSORS_MEMORY = MappingProxyType({0: ({0,1,2},{3}),
+                                      250: ({0,1,2,6,7,8,9,10,11,12},{3,4,5,13,14,15}),
+                                      500: ({0,1,2,6,7,8,9},{3,4,15}),
+                                      750: ({0,1,7,8,9},{3,14,15}),
+                                      1000: ({0,1,2,6,7,8,9,10,11,12,17},{3,4,5,13,14,15,16})})
+MEM_LIM = 512
+
+# A case prepares its input from the graph files (untimed) and returns the function to time
+Case = Callable[[str, str], Callable[[], Any]]
+
+
+def max_dependencies(num_tasks: int) -> int:
+    """Max dependencies the size ladder of graph_generator uses for this size"""
+    ladder = dict(size_ladder(sys.maxsize))
+    return ladder.get(num_tasks, max(2, int(num_tasks ** 0.25)))
+
+
+def graph_paths(num_tasks: int) -> tuple[str, str]:
+    """JSON and binary files of the benchmark graph of this size, generated on first use."""
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    name = f"task_graph_{num_tasks}_{max_dependencies(num_tasks)}_seed_{SEED}"
+    json_path = os.path.join(BENCH_DIR, f"{name}.json")
+    tg_path = os.path.join(BENCH_DIR, f"{name}.tg")
+    if not os.path.exists(json_path):
+        save_graph_to_json(num_tasks, max_dependencies(num_tasks), SEED, filename=json_path)
+    if not os.path.exists(tg_path):
+        convert_json(json_path, tg_path)
+    return json_path, tg_path
+
+
+def _binding(graph: Any) -> dict[str, Any]:
+    order, ub = alap_order(graph)
+    return {"order": order, "ub": ub}
+
+
+def case_load_json(json_path: str, tg_path: str) -> Callable[[], Any]:
+    def run():
+        with open(json_path, "rb") as infile:
+            return stream_task_graph(infile)
+    return run
+
+
+def case_load_tg(json_path: str, tg_path: str) -> Callable[[], Any]:
+    return lambda: load_task_graph(tg_path)
+
+
+def case_build_graph(json_path: str, tg_path: str) -> Callable[[], Any]:
+    with open(json_path, "r") as infile:
+        tasks = json.load(infile)["tasks"]
+    return lambda: build_graph(tasks)
+
+
+def case_alap_binding(json_path: str, tg_path: str) -> Callable[[], Any]:
+    graph = load_task_graph(tg_path)
+    return lambda: alap_binding(graph)
+
+
+def case_find_critical_path(json_path: str, tg_path: str) -> Callable[[], Any]:
+    graph = load_task_graph(tg_path)
+    return lambda: find_critical_path(graph)
+
+
+def _scheduler_case(scheduler: Callable[[Any, dict[str, Any]], Any]) -> Case:
+    def case(json_path: str, tg_path: str) -> Callable[[], Any]:
+        graph = load_task_graph(tg_path)
+        graph.index  # built once, outside of the timed part
+        binding = _binding(graph)
+
+        def run():
+            # The schedulers consume the order
+            return scheduler(graph, {"order": binding["order"].copy(), "ub": binding["ub"]})
+        return run
+    return case
+
+
+def _schedule(graph, data):
+    return schedule.modified_critical_path(graph, CORES, data)
+
+
+def _schedule_module(graph, data):
+    return schedule_module.modified_critical_path(graph, PROCESSORS_MODULE, data)
+
+
+def _schedule_memory(graph, data):
+    return schedule_memory.modified_critical_path(graph, PROCESSORS_MEMORY, MEM_LIM, data)
+
+
+def case_serialize(json_path: str, tg_path: str) -> Callable[[], Any]:
+    graph = load_task_graph(tg_path)
+    result, _, _, _ = _schedule_memory(graph, _binding(graph))
+    num_cores = max(max(t1 | t2) for t1, t2 in PROCESSORS_MEMORY.values()) + 1
+    return lambda: json.dumps(result.per_core(num_cores))
+
+
+CASES: dict[str, Case] = {
+    "load_json": case_load_json,
+    "load_tg": case_load_tg,
+    "build_graph": case_build_graph,
+    "alap_binding": case_alap_binding,
+    "find_critical_path": case_find_critical_path,
+    "mcp_schedule": _scheduler_case(_schedule),
+    "mcp_schedule_module": _scheduler_case(_schedule_module),
+    "mcp_schedule_memory": _scheduler_case(_schedule_memory),
+    "serialize": case_serialize,
+}
+
+
+def _status_mb(field: str) -> Optional[float]:
+    """A memory field (kB) of /proc/self/status, in MB; None without /proc."""
+    try:
+        with open("/proc/self/status", "r") as status:
+            for line in status:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / (1 << 10)
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss() -> bool:
+    """Restart the high-water mark of the RSS from the current RSS (Linux), False if it cannot be."""
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _rss_mb() -> Optional[float]:
+    return _status_mb("VmRSS")
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss carries over from the parent process on Linux, the high-water
+    # mark of /proc is the one of this process only
+    peak = _status_mb("VmHWM")
+    if peak is not None:
+        return peak
+    # ru_maxrss is in KiB on Linux, in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / (1 << 10)
+
+
+def _measure(case: str, num_tasks: int, repeat: int, conn: Any):
+    try:
+        json_path, tg_path = graph_paths(num_tasks)
+        num_edges = load_task_graph(tg_path).number_of_edges()
+
+        run = CASES[case](json_path, tg_path)
+        gc.collect()
+        rss_before = _rss_mb()
+        peak_reset = _reset_peak_rss()
+        times = []
+        for _ in range(repeat):
+            start = timer()
+            run()
+            times.append(timer() - start)
+
+        median = statistics.median(times)
+        conn.send({
+            "case": case,
+            "num_tasks": num_tasks,
+            "num_edges": num_edges,
+            "repeat": repeat,
+            "median_s": median,
+            "min_s": min(times),
+            "tasks_per_s": num_tasks / median if median else float("inf"),
+            "edges_per_s": num_edges / median if median else float("inf"),
+            "peak_rss_mb": _peak_rss_mb(),
+            "rss_before_mb": rss_before,
+            "peak_rss_timed_only": peak_reset,
+        })
+    except Exception as e:
+        conn.send({"case": case, "num_tasks": num_tasks, "error": repr(e)})
+    conn.close()
+
+
+def run_case(case: str, num_tasks: int, repeat: int = REPEAT) -> dict[str, Any]:
+    """Run one case in a freshly spawned interpreter."""
+    ctx = mp.get_context("spawn")
+    recv_conn, send_conn = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_measure, args=(case, num_tasks, repeat, send_conn))
+    process.start()
+    send_conn.close()
+    try:
+        result = recv_conn.recv()
+    except EOFError:
+        result = {"case": case, "num_tasks": num_tasks, "error": "benchmark process crashed"}
+    process.join()
+    return result
+
+
+def result_key(result: dict[str, Any]) -> str:
+    return f"{result['case']}@{result['num_tasks']}"
+
+
+def run_suite(sizes: list[int], cases: list[str], repeat: int = REPEAT) -> dict[str, Any]:
+    for num_tasks in sizes:
+        # Generated once, before any process times anything
+        graph_paths(num_tasks)
+
+    results = {}
+    for num_tasks in sizes:
+        for case in cases:
+            result = run_case(case, num_tasks, repeat)
+            results[result_key(result)] = result
+            if "error" in result:
+                print(f"{result_key(result):<32} ERROR {result['error']}")
+            else:
+                print(f"{result_key(result):<32} {result['median_s']:10.4f} s  {result['tasks_per_s']:12.0f} tasks/s"
+                      f"  {result['edges_per_s']:12.0f} edges/s  {result['peak_rss_mb']:8.1f} MB")
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "seed": SEED,
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict[str, Any], baseline: dict[str, Any], threshold: float,
+            min_delta: float = MIN_DELTA, rss_threshold: float = RSS_THRESHOLD,
+            min_rss_delta: float = MIN_RSS_DELTA) -> list[str]:
+    """
+    Cases slower than the baseline by more than threshold (relative, on the
+    median time) and by more than min_delta seconds, or whose peak RSS grew
+    by more than rss_threshold and by more than min_rss_delta MB.
+    """
+    regressions = []
+    for key, result in current["results"].items():
+        base = baseline["results"].get(key)
+        if base is None or "error" in base:
+            continue
+        if "error" in result:
+            regressions.append(f"{key}: failed ({result['error']})")
+            continue
+        ratio = result["median_s"] / base["median_s"] if base["median_s"] else 1.0
+        slower = ratio > 1 + threshold and result["median_s"] - base["median_s"] > min_delta
+        rss_ratio = result["peak_rss_mb"] / base["peak_rss_mb"] if base["peak_rss_mb"] else 1.0
+        # A peak including the preparation is not comparable to one of the timed runs only
+        larger = (result.get("peak_rss_timed_only") == base.get("peak_rss_timed_only")
+                  and rss_ratio > 1 + rss_threshold and result["peak_rss_mb"] - base["peak_rss_mb"] > min_rss_delta)
+        status = "REGRESSION" if slower or larger else "ok"
+        print(f"{key:<32} {base['median_s']:10.4f} s -> {result['median_s']:10.4f} s  x{ratio:5.2f}  "
+              f"RSS {base['peak_rss_mb']:8.1f} -> {result['peak_rss_mb']:8.1f} MB  {status}")
+        if slower:
+            regressions.append(f"{key}: {ratio:.2f}x slower")
+        if larger:
+            regressions.append(f"{key}: peak RSS {rss_ratio:.2f}x larger")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the scheduler hot paths.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="numbers of tasks")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES), help="cases to run")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="timed runs per case (the median is kept)")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare the results with")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative slowdown reported as a regression")
+    parser.add_argument("--min-delta", type=float, default=MIN_DELTA,
+                        help="slowdown in seconds under which a case is never a regression")
+    parser.add_argument("--rss-threshold", type=float, default=RSS_THRESHOLD,
+                        help="relative peak RSS growth reported as a regression")
+    parser.add_argument("--min-rss-delta", type=float, default=MIN_RSS_DELTA,
+                        help="peak RSS growth in MB under which a case is never a regression")
+    args = parser.parse_args()
+
+    current = run_suite(args.sizes, args.cases, args.repeat)
+
+    if args.output is not None:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as outfile:
+            json.dump(current, outfile, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare, "r") as infile:
+            baseline = json.load(infile)
+        regressions = compare(current, baseline, args.threshold, args.min_delta, args.rss_threshold,
+                              args.min_rss_delta)
+        if regressions:
+            print("Regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("No regression")
@@ -5,7 +5,8 @@ from timeit import default_timer as timer
 import matplotlib.pyplot as plt
 import pandas as pd
 
-from graph import build_graph
+from binding_cache import BindingCache, LocalStore
+from graph_format import load_graph
 from schedule import modified_critical_path
 
 BUCKET_NAME = "central-supelec-data-groupe2"
@@ -41,17 +42,9 @@ print("=== Benchmark LOCAL vs CLOUD ===\n")
 for file_name, nb_nodes in FILES:
     # LOCAL BENCHMARK
     in_file_path = f"input_data/{file_name}.json"
-    bind_file_path = f"bindings/{file_name}.json"
 
-    with open(in_file_path, "r") as f:
-        dag = json.load(f)
-    try:
-        with open(bind_file_path, "r") as f:
-            data = json.load(f)
-    except FileNotFoundError:
-        data = None
-
-    G = build_graph(dag["tasks"])
+    G = load_graph(in_file_path)
+    data = BindingCache(LocalStore("bindings")).binding(G)
 
     # Mesure du temps d'exécution local
     start = timer()
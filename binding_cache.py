@@ -0,0 +1,205 @@
+"""
+Content-addressed cache of the scheduling binding (ALAP priority heap + ub).
+
+Entries are keyed by the hash of the graph contents and the binding version,
+so a binding can never be reused for another graph or after the algorithm
+changed. Entries are stored in a compact binary form:
+
+    header      magic, format version, binding version, num_tasks, ub,
+                graph digest, checksum of the payload
+    priority    int64[n]  ALAP priority of each heap entry
+    task        int32[n]  task index of each heap entry
+
+The heap layout is kept as is, so loading an entry needs no heapify. Task
+ids are not stored, they come from the graph. Anything that does not match
+(other graph, other version, truncated or corrupted payload) is discarded
+and the binding is rebuilt.
+"""
+import hashlib
+import logging
+import os
+import struct
+from typing import Any, Optional, Protocol
+
+import numpy as np
+
+from task_graph import TaskGraph, as_task_graph, graph_digest
+from timing import BINDING_VERSION, alap_order
+
+MAGIC = b"TGBIND\0\0"
+FORMAT_VERSION = 1
+EXTENSION = ".bind"
+DEFAULT_MAX_BYTES = 256 << 20
+
+_HEADER = struct.Struct("<8sIIqq20s16s")
+
+logger = logging.getLogger(__name__)
+
+
+def binding_key(digest: str) -> str:
+    return f"{digest}-v{BINDING_VERSION}{EXTENSION}"
+
+
+def _checksum(payload: bytes) -> bytes:
+    return hashlib.blake2b(payload, digest_size=16).digest()
+
+
+def encode_binding(graph: TaskGraph, order: list[tuple[int,Any]], ub: int, digest: str) -> bytes:
+    index = graph.index
+    priority = np.fromiter((p for p, _ in order), dtype=np.int64, count=len(order))
+    task = np.fromiter((index[node] for _, node in order), dtype=np.int32, count=len(order))
+    payload = priority.tobytes() + task.tobytes()
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, BINDING_VERSION, len(order), ub,
+                          bytes.fromhex(digest), _checksum(payload))
+    return header + payload
+
+
+def decode_binding(graph: TaskGraph, blob: bytes, digest: str) -> dict[str,Any]:
+    """Binding stored in blob, in the format of the schedulers' ``data`` argument. Raises ValueError if invalid."""
+    if len(blob) < _HEADER.size:
+        raise ValueError("truncated header")
+    magic, version, binding_version, n, ub, stored_digest, checksum = _HEADER.unpack_from(blob, 0)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError("not a binding file")
+    if binding_version != BINDING_VERSION:
+        raise ValueError(f"stale binding version {binding_version}")
+    if stored_digest != bytes.fromhex(digest) or n != graph.num_tasks:
+        raise ValueError("binding of another graph")
+    payload = memoryview(blob)[_HEADER.size:]
+    if len(payload) != 12 * n:
+        raise ValueError("truncated payload")
+    if _checksum(payload) != checksum:
+        raise ValueError("checksum mismatch")
+
+    priority = np.frombuffer(payload, dtype=np.int64, count=n)
+    task = np.frombuffer(payload, dtype=np.int32, count=n, offset=8 * n)
+    if n and (task.min() < 0 or task.max() >= n):
+        raise ValueError("task index out of range")
+    ids = graph.ids
+    order = list(zip(priority.tolist(), map(ids.__getitem__, task.tolist())))
+    return {"order": order, "ub": ub}
+
+
+class LocalStore:
+    """Directory of binding files, evicted in least recently used order past max_bytes / max_entries."""
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES, max_entries: Optional[int] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        # The modification time is the recency of the entry
+        os.utime(path)
+        return data
+
+    def put(self, key: str, data: bytes):
+        path = self.path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def delete(self, key: str):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(EXTENSION):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        count = len(entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes and (self.max_entries is None or count <= self.max_entries):
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            count -= 1
+
+
+class Store(Protocol):
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    def put(self, key: str, data: bytes):
+        ...
+
+    def delete(self, key: str):
+        ...
+
+
+class BindingCache:
+    """
+    Two tier binding cache: a local store (e.g. ``bindings/`` or ``/tmp`` on
+    Lambda) in front of an optional remote one (a storage.PrefixStore).
+    """
+
+    def __init__(self, local: Optional[LocalStore] = None, remote: Optional[Store] = None):
+        self.local = local
+        self.remote = remote
+
+    def _tiers(self) -> list[Any]:
+        return [store for store in (self.local, self.remote) if store is not None]
+
+    def load(self, graph: TaskGraph, digest: Optional[str] = None) -> Optional[dict[str,Any]]:
+        graph = as_task_graph(graph)
+        if digest is None:
+            digest = graph_digest(graph)
+        key = binding_key(digest)
+
+        for tier, store in enumerate(self._tiers()):
+            blob = store.get(key)
+            if blob is None:
+                continue
+            try:
+                data = decode_binding(graph, blob, digest)
+            except ValueError as e:
+                logger.warning(f"Discarding binding {key} from {type(store).__name__}: {e}")
+                store.delete(key)
+                continue
+            if tier > 0 and self.local is not None:
+                self.local.put(key, blob)
+            return data
+        return None
+
+    def store(self, graph: TaskGraph, order: list[tuple[int,Any]], ub: int, digest: Optional[str] = None):
+        graph = as_task_graph(graph)
+        if digest is None:
+            digest = graph_digest(graph)
+        key = binding_key(digest)
+        blob = encode_binding(graph, order, ub, digest)
+        for store in self._tiers():
+            store.put(key, blob)
+
+    def binding(self, graph: TaskGraph) -> dict[str,Any]:
+        """Cached binding of the graph, computed and stored on a miss."""
+        graph = as_task_graph(graph)
+        digest = graph_digest(graph)
+        data = self.load(graph, digest)
+        if data is None:
+            order, ub = alap_order(graph)
+            self.store(graph, order, ub, digest)
+            data = {"order": order, "ub": ub}
+        return data
@@ -0,0 +1,145 @@
+"""
+Communication costs between processors.
+
+A dependency whose two tasks run on different processors delays its
+successor by the time needed to move its data (``pred_data`` of the task
+graph, 0 when the tasks do not declare any):
+
+    latency[a][b] + ceil(data / bandwidth[a][b])
+
+where a and b are the types of the sending and receiving processors. A model
+is JSON friendly:
+
+    {"bandwidth": [[100, 10], [10, 100]],     data units per time unit, null for no limit
+     "latency": [[1, 5], [5, 1]],             time units
+     "types": {"3": 1, "4": 1}}               processor -> type, 0 when missing
+
+A single type can be given with plain numbers: ``{"bandwidth": 100, "latency": 1}``.
+"""
+import math
+from typing import Any, Mapping, Optional, Sequence
+
+import numpy as np
+
+INF = float("inf")
+NEG_INF = -INF
+
+
+class CommunicationModel:
+    """Transfer times between processor types, see the module docstring."""
+
+    def __init__(self, bandwidth: Sequence[Sequence[Optional[float]]], latency: Sequence[Sequence[int]],
+                 types: Optional[Mapping[int,int]] = None):
+        self.bandwidth = [[INF if b is None else float(b) for b in row] for row in bandwidth]
+        self.latency = [[int(lat) for lat in row] for row in latency]
+        self.num_types = len(self.bandwidth)
+        if len(self.latency) != self.num_types or any(len(row) != self.num_types for row in self.bandwidth + self.latency):
+            raise ValueError("bandwidth and latency must be square matrices of the same size")
+        self.types: dict[int,int] = dict(types) if types else {}
+        if any(not 0 <= k < self.num_types for k in self.types.values()):
+            raise ValueError(f"Processor types must be in [0, {self.num_types})")
+
+    @classmethod
+    def from_dict(cls, config: dict[str,Any]) -> "CommunicationModel":
+        bandwidth, latency = config.get("bandwidth"), config.get("latency", 0)
+        if not isinstance(bandwidth, list):
+            bandwidth = [[bandwidth]]
+        if not isinstance(latency, list):
+            latency = [[latency] * len(bandwidth) for _ in bandwidth]
+        return cls(bandwidth, latency, {int(p): k for p, k in config.get("types", {}).items()})
+
+    def to_dict(self) -> dict[str,Any]:
+        return {"bandwidth": [[None if b == INF else b for b in row] for row in self.bandwidth],
+                "latency": self.latency, "types": {str(p): k for p, k in self.types.items()}}
+
+    def with_types(self, types: Mapping[int,int]) -> "CommunicationModel":
+        """Same costs, with the processor types filled in from types where this model has none."""
+        return CommunicationModel(self.bandwidth, self.latency, {**types, **self.types})
+
+    def type_of(self, processor: int) -> int:
+        return self.types.get(processor, 0)
+
+    def transfer_time(self, data: int, src_type: int, dst_type: int) -> int:
+        bandwidth = self.bandwidth[src_type][dst_type]
+        transfer = math.ceil(data / bandwidth) if data and bandwidth != INF else 0
+        return self.latency[src_type][dst_type] + transfer
+
+    def mean_transfer_time(self, data: np.ndarray) -> np.ndarray:
+        """Transfer times of the data sizes averaged over every (sending, receiving) pair of types."""
+        total = np.zeros(len(data), dtype=np.float64)
+        for src_type in range(self.num_types):
+            for dst_type in range(self.num_types):
+                bandwidth = self.bandwidth[src_type][dst_type]
+                transfer = np.ceil(data / bandwidth) if bandwidth != INF else 0
+                total += self.latency[src_type][dst_type] + transfer
+        return total / self.num_types ** 2
+
+
+class Arrival:
+    """
+    Time the data of a task's predecessors is available on each processor,
+    updated one placed predecessor at a time in O(number of types).
+
+    Besides the latest end of the predecessors run on each processor, it
+    keeps, per receiving type, the latest arrival of remote data together
+    with the processor it comes from, and the latest arrival from any other
+    processor. Data sent by a processor to itself is free, so the arrival on
+    any processor is exact without going over the predecessors again. No
+    task starts before time, when it is released.
+    """
+
+    __slots__ = ("model", "time", "local", "best", "best_processor", "second")
+
+    def __init__(self, model: CommunicationModel, time: int = 0):
+        self.model = model
+        self.time = time
+        self.local: dict[int,int] = {}
+        self.best = [NEG_INF] * model.num_types
+        self.best_processor = [-1] * model.num_types
+        self.second = [NEG_INF] * model.num_types
+
+    def add(self, end: int, processor: int, data: int):
+        if end > self.local.get(processor, NEG_INF):
+            self.local[processor] = end
+        model = self.model
+        src_type = model.type_of(processor)
+        best, best_processor, second = self.best, self.best_processor, self.second
+        for k in range(model.num_types):
+            t = end + model.transfer_time(data, src_type, k)
+            if best_processor[k] == processor:
+                if t > best[k]:
+                    best[k] = t
+            elif t > best[k]:
+                second[k] = best[k]
+                best[k] = t
+                best_processor[k] = processor
+            elif t > second[k]:
+                second[k] = t
+
+    def on(self, processor: int) -> int:
+        """Time every input of the task is on processor."""
+        k = self.model.type_of(processor)
+        remote = self.second[k] if self.best_processor[k] == processor else self.best[k]
+        return max(self.local.get(processor, 0), remote, self.time)
+
+    def remote(self) -> int:
+        """Time every input is on any processor, even one that ran none of the predecessors."""
+        return max(max(self.best), self.time)
+
+    def earliest(self) -> int:
+        """Lower bound of on() over all processors."""
+        # Processors that ran none of the predecessors get the remote data of their type
+        earliest = max(min(self.best), self.time)
+        for processor in self.local:
+            earliest = min(earliest, self.on(processor))
+        return earliest
+
+
+def predecessors_arrival(model: CommunicationModel, dependencies: list[int], data: Sequence[int],
+                         task_end: list[int], task_processor: list[int]) -> Arrival:
+    """Arrival of the data of the placed predecessors of a task (data aligned with dependencies)."""
+    arrival = Arrival(model)
+    for dep, size in zip(dependencies, data):
+        if task_processor[dep] >= 0:
+            arrival.add(task_end[dep], task_processor[dep], size)
+    return arrival
@@ -0,0 +1,249 @@
+"""
+List-scheduling engine shared by the schedulers.
+
+A scheduler is a priority, which orders the tasks, and a machine, which
+places them. The engine keeps the ready tasks in a heap keyed by priority
+(ties by task id); placing a task walks its successors once to release them
+and to carry their ready time, preferred processor (the one of their first
+predecessor) and data arrival forward, so each edge is touched once.
+
+Priorities, see priority_order:
+
+    "alap"          MCP: latest start, the default
+    "upward_rank"   HEFT: duration plus the longest path to an exit task,
+                    mean transfer times included
+    "cpop"          CPOP: upward plus downward rank, the tasks of one
+                    critical path all go to the processor of its first task
+    "blevel"        static b-level (no communication), ties to the task
+                    with the latest ASAP start
+
+The machines (schedule.FixedCores, schedule_module.VaryingCores and
+schedule_memory.TypedCores) own the processors and the placement policy,
+see gaps.py for the placement and selection.py for the selection.
+"""
+import heapq
+from array import array
+from typing import Any, Mapping, Optional, Protocol
+
+import numpy as np
+
+from communication import Arrival, CommunicationModel
+from instrumentation import SchedulerStats
+from schedule_result import ScheduleResult
+from selection import penalty_model
+from task_graph import TaskGraph, as_task_graph
+from timing import alap_order, compute_timing, downward_rank, upward_rank
+
+PRIORITIES = ("alap", "upward_rank", "cpop", "blevel")
+TasksOrder = list[tuple[Any, Any]]
+
+
+class Machine(Protocol):
+    """Processors a scheduler places tasks on."""
+
+    com_penalty: int
+    selection: str
+
+    def start(self, ub: int):
+        """Reset the processors before a run, ub being an upper bound of the makespan."""
+
+    def types(self) -> Mapping[int,int]:
+        """Communication type of the processors, see communication.py."""
+
+    def advance(self) -> int:
+        """Update the available processors before a selection, returns the number of availability changes."""
+
+    def select(self, ready_time: int, duration: int, memory: int, preferred: Optional[int],
+               arrival: Optional[Arrival], pinned: Optional[int] = None) -> tuple[int,int]:
+        """
+        Processor and start time of a task whose predecessors end at
+        ready_time; pinned is the processor it should go to if it can.
+        """
+
+    def assign(self, processor: int, start: int, end: int):
+        """The task runs on processor during [start, end)."""
+
+
+def check_priority(priority: str):
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority {priority!r}, expected one of {PRIORITIES}")
+
+
+def _mean_costs(graph: TaskGraph, communication: Optional[CommunicationModel], data: Optional[np.ndarray]) -> Optional[np.ndarray]:
+    if communication is None:
+        return None
+    if data is None:
+        data = np.zeros(graph.number_of_edges(), dtype=np.int64)
+    return communication.mean_transfer_time(data)
+
+
+def cpop_priority(graph: TaskGraph, communication: Optional[CommunicationModel] = None) -> np.ndarray:
+    """Upward plus downward rank of every task, with the mean transfer times of the model."""
+    graph = as_task_graph(graph)
+    return (upward_rank(graph, _mean_costs(graph, communication, graph.succ_data))
+            + downward_rank(graph, _mean_costs(graph, communication, graph.pred_data)))
+
+
+def critical_path_tasks(graph: TaskGraph, priority: np.ndarray) -> list[int]:
+    """One critical path of the CPOP priorities, from an entry task to an exit task."""
+    if not len(priority):
+        return []
+    critical = np.isclose(priority, priority.max())
+    node = int(np.flatnonzero(critical & (graph.in_degree() == 0))[0])
+    path = [node]
+    while True:
+        succ = graph.successors(node)
+        succ = succ[critical[succ]]
+        if not succ.size:
+            return path
+        node = int(succ[0])
+        path.append(node)
+
+
+def priority_order(graph: TaskGraph, priority: str = "alap",
+                   communication: Optional[CommunicationModel] = None) -> tuple[TasksOrder,int]:
+    """
+    Heap of (key, task id) pairs, the most urgent task first, and the upper
+    bound of the makespan, like alap_order. communication only weighs the
+    edges of the ranks.
+    """
+    check_priority(priority)
+    if priority == "alap":
+        return alap_order(graph)
+    graph = as_task_graph(graph)
+    if priority == "blevel":
+        timing = compute_timing(graph)
+        keys = list(zip(timing.alap.tolist(), (-timing.asap).tolist()))
+    elif priority == "upward_rank":
+        keys = (-upward_rank(graph, _mean_costs(graph, communication, graph.succ_data))).tolist()
+    else:
+        keys = (-cpop_priority(graph, communication)).tolist()
+    order = list(zip(keys, graph.ids))
+    heapq.heapify(order)
+    return order, int(graph.duration.sum())
+
+
+def list_schedule(graph: TaskGraph, machine: Machine, data: Optional[dict[str,Any]] = None,
+                  stats: Optional[SchedulerStats] = None, communication: Optional[CommunicationModel] = None,
+                  priority: str = "alap") -> tuple[ScheduleResult,int,TasksOrder,int]:
+    """
+    Schedule the graph on the machine. data is a binding ({"order", "ub"},
+    see priority_order) computed beforehand for the same priority. With a
+    communication model, a task starts once the data of all its
+    predecessors reached its processor.
+    """
+    check_priority(priority)
+    if stats is not None:
+        now = stats.clock()
+    graph = as_task_graph(graph)
+    index = graph.index
+    ids = graph.ids
+    durations = graph.duration.tolist()
+    memories = graph.memory.tolist()
+    n = graph.num_tasks
+
+    # The fixed penalty stands for the transfers where the ranks or the selection need a model
+    costs = communication if communication is not None else penalty_model(machine.com_penalty)
+    if costs.num_types > 1:
+        costs = costs.with_types(machine.types())
+    model = costs if communication is not None or machine.selection == "eft" or priority == "cpop" else None
+
+    ub: int
+    order: TasksOrder
+    if data is None:
+        order, ub = priority_order(graph, priority, costs)
+    else:
+        order = data["order"]
+        ub = data["ub"]
+
+    key = [None] * n
+    for k, node in order:
+        key[index[node]] = k
+
+    # CPOP keeps one critical path on the processor of its first task
+    critical = bytearray(n)
+    if priority == "cpop":
+        for i in critical_path_tasks(graph, cpop_priority(graph, costs)):
+            critical[i] = 1
+    critical_processor: Optional[int] = None
+
+    in_degree = graph.in_degree()
+    remaining = in_degree.tolist()
+    # The preferred processor is the one of the first predecessor
+    has_pred = in_degree > 0
+    first_pred_of = np.full(n, -1, dtype=np.int64)
+    first_pred_of[has_pred] = graph.pred_idx[graph.pred_ptr[:-1][has_pred]]
+    first_pred_of = first_pred_of.tolist()
+    ready_time = [0] * n
+    preferred: list[Optional[int]] = [None] * n
+    arrivals: list[Optional[Arrival]] = [None] * n
+    if model is not None:
+        succ_data = graph.succ_data.tolist() if graph.succ_data is not None else [0] * graph.number_of_edges()
+
+    ready = [(key[i], ids[i], i) for i, d in enumerate(remaining) if d == 0]
+    heapq.heapify(ready)
+
+    succ_ptr = graph.succ_ptr.tolist()
+    succ_idx = graph.succ_idx
+    rows_task, rows_start, rows_processor = array("q"), array("q"), array("q")
+    machine.start(ub)
+
+    if stats is not None:
+        now = stats.lap("setup", now)
+
+    while ready:
+        _, _, i = heapq.heappop(ready)
+        if stats is not None:
+            now = stats.lap("heap_pop", now)
+
+        transitions = machine.advance()
+        if stats is not None:
+            now = stats.lap("availability_update", now)
+            stats.count("availability_transitions", transitions)
+
+        arrival = None
+        if model is not None:
+            arrival = arrivals[i] or Arrival(model)
+            arrivals[i] = None
+        pinned = critical_processor if critical[i] else None
+        processor, start_time = machine.select(ready_time[i], durations[i], memories[i], preferred[i], arrival, pinned)
+        if critical[i] and critical_processor is None:
+            critical_processor = processor
+        if stats is not None:
+            now = stats.selection_lap(now)
+            if preferred[i] is not None:
+                stats.count("preferred_processor_hits" if processor == preferred[i] else "com_penalties")
+
+        end_time = start_time + durations[i]
+        rows_task.append(i)
+        rows_start.append(start_time)
+        rows_processor.append(processor)
+        machine.assign(processor, start_time, end_time)
+        if stats is not None:
+            now = stats.lap("bookkeeping", now)
+            stats.count("tasks_scheduled")
+
+        # Release the successors
+        for k, succ in enumerate(succ_idx[succ_ptr[i]:succ_ptr[i+1]].tolist(), succ_ptr[i]):
+            if model is not None:
+                if arrivals[succ] is None:
+                    arrivals[succ] = Arrival(model)
+                arrivals[succ].add(end_time, processor, succ_data[k])
+            if end_time > ready_time[succ]:
+                ready_time[succ] = end_time
+            if first_pred_of[succ] == i:
+                preferred[succ] = processor
+            remaining[succ] -= 1
+            if remaining[succ] == 0:
+                heapq.heappush(ready, (key[succ], ids[succ], succ))
+        if stats is not None:
+            now = stats.lap("successor_release", now)
+
+    if len(rows_task) != n:
+        raise ValueError("Task graph contains a cycle")
+
+    schedule = ScheduleResult.from_rows(graph, rows_task, rows_start, rows_processor)
+    makespan = int(schedule.end.max(initial=0))
+    if stats is not None:
+        stats.lap("sort", now)
+    return schedule, makespan, order, ub
@@ -0,0 +1,213 @@
+"""
+Processor failures.
+
+A failure trace lists the failures of processors, JSON friendly:
+
+    [{"processor": 0, "time": 1500},                    down for good from 1500
+     {"processor": 3, "time": 200, "recovery": 450}]    down during [200, 450)
+
+Schedulers that know the trace beforehand (schedule_module) start no task
+on a processor while it is down. reexecute applies a trace to a schedule
+computed without it, as events in time order: the tasks a failure
+interrupts run again from scratch, in the idle gaps left after the failure,
+and only the tasks whose inputs now come too late are shifted right on
+their processors, with the ones they push along.
+"""
+import heapq
+from array import array
+from bisect import bisect_right
+from typing import Any, Iterable, NamedTuple, Optional
+
+from gaps import INF, GapIndex, insertion_slot, schedule_gaps, shift_slot
+from schedule_result import ScheduleResult
+from task_graph import TaskGraph
+
+
+class Failure(NamedTuple):
+    processor: int
+    time: int
+    recovery: float = INF
+
+
+class FailureTrace:
+    """
+    Failures indexed by processor: the down intervals of each processor are
+    sorted and disjoint (overlapping ones are merged), so whether a processor
+    is up at some time is a bisection, O(log F).
+    """
+
+    def __init__(self, failures: Iterable[Failure] = ()):
+        by_processor: dict[int, list[tuple[int, float]]] = {}
+        for f in failures:
+            if f.recovery <= f.time:
+                raise ValueError(f"Recovery before the failure: {f}")
+            by_processor.setdefault(f.processor, []).append((f.time, f.recovery))
+        self.times: dict[int, list[int]] = {}
+        self.recoveries: dict[int, list[float]] = {}
+        for p, down in by_processor.items():
+            times = self.times[p] = []
+            recoveries = self.recoveries[p] = []
+            for time, recovery in sorted(down):
+                if times and time <= recoveries[-1]:
+                    recoveries[-1] = max(recoveries[-1], recovery)
+                else:
+                    times.append(time)
+                    recoveries.append(recovery)
+
+    @classmethod
+    def from_list(cls, failures: list[dict[str, Any]]) -> "FailureTrace":
+        return cls(Failure(int(f["processor"]), int(f["time"]),
+                           INF if f.get("recovery") is None else int(f["recovery"])) for f in failures)
+
+    def to_list(self) -> list[dict[str, Any]]:
+        return [{"processor": f.processor, "time": f.time, **({} if f.recovery == INF else {"recovery": f.recovery})}
+                for f in self.events()]
+
+    def __len__(self) -> int:
+        return sum(len(times) for times in self.times.values())
+
+    def events(self) -> list[Failure]:
+        """Failures in time order."""
+        return sorted((Failure(p, time, recovery) for p, times in self.times.items()
+                       for time, recovery in zip(times, self.recoveries[p])), key=lambda f: (f.time, f.processor))
+
+    def down_until(self, processor: int, t: float) -> Optional[float]:
+        """Recovery time of the processor if it is down at time t, None if it is up."""
+        times = self.times.get(processor)
+        if not times:
+            return None
+        k = bisect_right(times, t) - 1
+        if k >= 0 and t < self.recoveries[processor][k]:
+            return self.recoveries[processor][k]
+        return None
+
+    def up_from(self, processor: int, t: float) -> float:
+        """First time from t on the processor is up."""
+        recovery = self.down_until(processor, t)
+        return t if recovery is None else recovery
+
+    def next_failure(self, processor: int, t: float) -> float:
+        """First failure of the processor strictly after t."""
+        times = self.times.get(processor, [])
+        k = bisect_right(times, t)
+        return times[k] if k < len(times) else INF
+
+    def block_downtime(self, gaps: GapIndex, processor: int, since: int = 0):
+        """Cut the down intervals of the processor from since on out of its gaps."""
+        times = self.times.get(processor, [])
+        recoveries = self.recoveries.get(processor, [])
+        for k in range(max(bisect_right(times, since) - 1, 0), len(times)):
+            if recoveries[k] > since:
+                gaps.block(processor, max(times[k], since), recoveries[k])
+
+
+def reexecute(graph: TaskGraph, schedule: ScheduleResult, trace: FailureTrace,
+              processors: Optional[Iterable[int]] = None, com_penalty: int = 0) -> tuple[ScheduleResult,int,list[Any]]:
+    """
+    Apply the failures of the trace to a schedule made without them, one
+    event at a time: the tasks running on the processor when it fails, or
+    starting on it while it is down, are run again from the failure on in
+    the earliest idle gap that fits them (see gaps.insertion_slot, the
+    processor of their first predecessor saving com_penalty). A dependent
+    only moves when one of its predecessors now ends after its start: it is
+    shifted later on its processor, pushing along the tasks it then
+    overlaps. The tasks are placed on the processors of the schedule, plus
+    processors (all the processors of the machine, usually). Raises
+    ValueError when no processor is up long enough to run a task again.
+
+    Returns the new schedule, its makespan and the ids of the interrupted
+    tasks (once per interruption). Each event costs O(log) per moved task
+    and per edge of a moved task, sorting the F events O(F log F).
+    """
+    n = graph.num_tasks
+    task = schedule.task.tolist()
+    start, end, processor = [0] * n, [0] * n, [-1] * n
+    for i, s, e, p in zip(task, schedule.start.tolist(), schedule.end.tolist(), schedule.processor.tolist()):
+        start[i], end[i], processor[i] = s, e, p
+
+    by_core, gaps = schedule_gaps(task, start, end, processor, processors or ())
+
+    pred_ptr, pred_idx = graph.pred_ptr.tolist(), graph.pred_idx.tolist()
+    succ_ptr, succ_idx = graph.succ_ptr.tolist(), graph.succ_idx.tolist()
+    durations = graph.duration.tolist()
+    interrupted: list[Any] = []
+
+    # Tasks to place again, by the earliest time they may start, predecessors first on ties.
+    # placed[i] is 0 meanwhile, waiting[i] is 1 while one of its predecessors is still to place
+    level = [0] * n
+    for k, nodes in enumerate(graph.topological_levels()):
+        for i in nodes.tolist():
+            level[i] = k
+    pending: list[tuple[int, int, int]] = []
+    placed, waiting, rerun = bytearray(b"\x01") * n, bytearray(n), bytearray(n)
+    not_before = [0] * n
+
+    def unschedule(i: int):
+        rows = by_core[processor[i]]
+        del rows[bisect_right(rows, (start[i], i)) - 1]
+        gaps.release(processor[i], start[i], end[i])
+        placed[i] = 0
+
+    def push(i: int, time: int):
+        not_before[i] = time
+        heapq.heappush(pending, (time, level[i], i))
+
+    for failure in trace.events():
+        p, t = failure.processor, failure.time
+        if p not in by_core:
+            by_core[p] = []
+            gaps.add(p, 0, INF)
+        rows = by_core[p]
+        # The task running at t, if any, then the ones starting while the processor is down
+        k = bisect_right(rows, (t, -1))
+        hit = [i for _, i in rows[max(k - 1, 0):k] if end[i] > t]
+        hit += [i for s, i in rows[k:bisect_right(rows, (failure.recovery, -1))]]
+        for i in hit:
+            unschedule(i)
+            interrupted.append(graph.ids[i])
+            rerun[i] = 1
+            push(i, t)
+        gaps.block(p, t, failure.recovery)
+
+        while pending:
+            _, _, i = heapq.heappop(pending)
+            preds = pred_idx[pred_ptr[i]:pred_ptr[i+1]]
+            if not all(placed[pred] for pred in preds):
+                waiting[i] = 1
+                continue
+            ready = max([not_before[i]] + [end[pred] for pred in preds])
+            duration = durations[i]
+            pushed = []
+            if rerun[i]:
+                rerun[i] = 0
+                preferred = processor[preds[0]] if preds else None
+                found = insertion_slot(gaps, ready, duration, preferred, com_penalty)
+            else:
+                # Shifted right on its core, pushing along the tasks it then overlaps
+                q = processor[i]
+                s, pushed = shift_slot(gaps, q, by_core[q], ready, duration, start[i], unschedule)
+                found = (q, s) if s is not None else insertion_slot(gaps, ready, duration)
+            if found is None:
+                raise ValueError(f"No processor is up long enough to run task {graph.ids[i]!r} from time {ready} on")
+            q, s = found
+            for j in pushed:
+                push(j, s + duration)
+            start[i], end[i], processor[i] = s, s + duration, q
+            gaps.occupy(q, s, end[i])
+            by_core[q].insert(bisect_right(by_core[q], (s, i)), (s, i))
+            placed[i] = 1
+            for succ in succ_idx[succ_ptr[i]:succ_ptr[i+1]]:
+                if placed[succ] and start[succ] < end[i]:
+                    # Its input is late
+                    unschedule(succ)
+                    push(succ, end[i])
+                elif waiting[succ]:
+                    waiting[succ] = 0
+                    push(succ, not_before[succ])
+
+    rows_task, rows_start, rows_processor = array("q", task), array("q"), array("q")
+    for i in task:
+        rows_start.append(start[i])
+        rows_processor.append(processor[i])
+    result = ScheduleResult.from_rows(graph, rows_task, rows_start, rows_processor)
+    return result, int(result.end.max(initial=0)), interrupted
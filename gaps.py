@@ -0,0 +1,310 @@
+from bisect import bisect_left, bisect_right
+from typing import Callable, Iterable, Optional
+
+from communication import Arrival
+
+INF = float("inf")
+NEG_INF = -INF
+PLACEMENTS = ("append", "insertion")
+
+
+def check_placement(placement: str):
+    if placement not in PLACEMENTS:
+        raise ValueError(f"Unknown placement {placement!r}, expected one of {PLACEMENTS}")
+
+
+class GapIndex:
+    """
+    Idle intervals ("gaps") of a set of cores, for insertion-based placement.
+
+    Every core keeps its gaps as sorted, disjoint [start, end) intervals, the
+    last one usually open-ended. All gaps are also indexed by start time in a
+    sparse segment tree over [0, 2**height): level l maps node i, covering
+    the starts [i << l, (i+1) << l), to the latest end and to the longest
+    length of its gaps. Adding, removing or splitting a gap and finding the
+    earliest gap a task fits in after its ready time are O(log T), T being
+    the largest start time.
+    """
+
+    def __init__(self):
+        self.starts: dict[int, list[int]] = {}
+        self.ends: dict[int, list[float]] = {}
+        # Gaps starting at a given time: {start: {core: end}}
+        self._buckets: dict[int, dict[int, float]] = {}
+        self._max_end: list[dict[int, float]] = [{}]
+        self._max_len: list[dict[int, float]] = [{}]
+
+    @classmethod
+    def from_processors(cls, processors: Iterable[int], time: int = 0) -> "GapIndex":
+        gaps = cls()
+        for p in processors:
+            gaps.add(p, time, INF)
+        return gaps
+
+    def __len__(self) -> int:
+        return sum(len(starts) for starts in self.starts.values())
+
+    def add(self, core: int, start: int, end: float):
+        """Declare [start, end) idle on core; it must not overlap the core's other gaps."""
+        if end <= start:
+            return
+        starts = self.starts.setdefault(core, [])
+        k = bisect_left(starts, start)
+        starts.insert(k, start)
+        self.ends.setdefault(core, []).insert(k, end)
+        self._buckets.setdefault(start, {})[core] = end
+        while start >> (len(self._max_end) - 1):
+            self._grow()
+        self._update(start)
+
+    def occupy(self, core: int, start: int, end: float) -> bool:
+        """Mark [start, end) busy on core, splitting the gap it lies in. False if no gap of the core contains it."""
+        if end <= start:
+            return True
+        starts = self.starts.get(core)
+        if not starts:
+            return False
+        k = bisect_right(starts, start) - 1
+        ends = self.ends[core]
+        if k < 0 or ends[k] < end:
+            return False
+        gap_start, gap_end = starts[k], ends[k]
+        if start > gap_start:
+            # The gap keeps its start, only its end moves
+            ends[k] = start
+            self._buckets[gap_start][core] = start
+            self._update(gap_start)
+        else:
+            self._remove(core, k)
+        self.add(core, end, gap_end)
+        return True
+
+    def clip(self, core: int, t: float):
+        """The core is unusable from time t on: drop or shorten its gaps beyond t."""
+        starts = self.starts.get(core)
+        if not starts:
+            return
+        for k in range(len(starts) - 1, bisect_left(starts, t) - 1, -1):
+            self._remove(core, k)
+        if starts and self.ends[core][-1] > t:
+            start = starts[-1]
+            self._remove(core, len(starts) - 1)
+            self.add(core, start, t)
+
+    def block(self, core: int, start: int, end: float):
+        """The core is unusable during [start, end): cut it out of the gaps it overlaps."""
+        starts, ends = self.starts.get(core), self.ends.get(core)
+        if not starts or end <= start:
+            return
+        k = bisect_right(ends, start)
+        overlapping = []
+        while k < len(starts) and starts[k] < end:
+            overlapping.append((starts[k], ends[k]))
+            self._remove(core, k)
+        for gap_start, gap_end in overlapping:
+            self.add(core, gap_start, min(gap_end, start))
+            self.add(core, max(gap_start, end), gap_end)
+
+    def release(self, core: int, start: int, end: float):
+        """[start, end) becomes idle on core again, merged with the gaps right before and after it."""
+        if end <= start:
+            return
+        starts, ends = self.starts.setdefault(core, []), self.ends.setdefault(core, [])
+        k = bisect_left(starts, start)
+        if k < len(starts) and starts[k] == end:
+            end = ends[k]
+            self._remove(core, k)
+        if k and ends[k-1] == start:
+            start = starts[k-1]
+            self._remove(core, k - 1)
+        self.add(core, start, end)
+
+    def drop_before(self, t: int):
+        """No task starts before t any more: drop the gaps ending by t, the ones open at t start at t."""
+        for core, ends in self.ends.items():
+            starts = self.starts[core]
+            for k in range(bisect_right(ends, t) - 1, -1, -1):
+                self._remove(core, k)
+            if starts and starts[0] < t:
+                end = ends[0]
+                self._remove(core, 0)
+                self.add(core, t, end)
+
+    def earliest(self, ready_time: int, duration: int) -> Optional[tuple[int,int]]:
+        """
+        Core and start time of the earliest placement of a task ready at
+        ready_time: inside a gap already open at ready_time if one is long
+        enough (the most recently opened one), otherwise at the start of the
+        first gap opening later that is long enough.
+        """
+        ready_time = max(ready_time, 0)
+        key = self._last_covering(ready_time, ready_time + duration)
+        if key is not None:
+            bucket = self._buckets[key]
+            return next(core for core, end in bucket.items() if end >= ready_time + duration), ready_time
+        key = self._first_fitting(ready_time + 1, duration)
+        if key is not None:
+            bucket = self._buckets[key]
+            return next(core for core, end in bucket.items() if end - key >= duration), key
+        return None
+
+    def earliest_on(self, core: int, ready_time: int, duration: int) -> Optional[int]:
+        """Earliest start on core of a task ready at ready_time, None if no gap of the core fits it."""
+        starts, ends = self.starts.get(core, []), self.ends.get(core, [])
+        for k in range(max(bisect_right(starts, ready_time) - 1, 0), len(starts)):
+            start = max(starts[k], ready_time)
+            if ends[k] - start >= duration:
+                return start
+        return None
+
+    def _remove(self, core: int, k: int):
+        start = self.starts[core].pop(k)
+        self.ends[core].pop(k)
+        bucket = self._buckets[start]
+        del bucket[core]
+        if not bucket:
+            del self._buckets[start]
+        self._update(start)
+
+    def _grow(self):
+        top = len(self._max_end) - 1
+        self._max_end.append({})
+        self._max_len.append({})
+        if 0 in self._max_end[top]:
+            self._max_end[top+1][0] = self._max_end[top][0]
+            self._max_len[top+1][0] = self._max_len[top][0]
+
+    def _update(self, key: int):
+        max_end, max_len = self._max_end, self._max_len
+        bucket = self._buckets.get(key)
+        if bucket:
+            end = max(bucket.values())
+            max_end[0][key] = end
+            max_len[0][key] = end - key
+        else:
+            max_end[0].pop(key, None)
+            max_len[0].pop(key, None)
+
+        i = key
+        for level in range(1, len(max_end)):
+            i >>= 1
+            ends, lens = max_end[level-1], max_len[level-1]
+            left = ends.get(2 * i, NEG_INF)
+            right = ends.get(2 * i + 1, NEG_INF)
+            end = left if left >= right else right
+            left = lens.get(2 * i, NEG_INF)
+            right = lens.get(2 * i + 1, NEG_INF)
+            length = left if left >= right else right
+            ends, lens = max_end[level], max_len[level]
+            if ends.get(i, NEG_INF) == end and lens.get(i, NEG_INF) == length:
+                # Nothing changes above
+                break
+            if end == NEG_INF:
+                del ends[i]
+                del lens[i]
+            else:
+                ends[i] = end
+                lens[i] = length
+
+    def _last_covering(self, t: int, end: float) -> Optional[int]:
+        """Latest start at or before t of a gap lasting until end."""
+        max_end = self._max_end
+        top = len(max_end) - 1
+        if t >> top:
+            t = (1 << top) - 1
+        if max_end[0].get(t, NEG_INF) >= end:
+            return t
+        i = t
+        for level in range(top):
+            if i & 1 and max_end[level].get(i - 1, NEG_INF) >= end:
+                i -= 1
+                # Rightmost leaf of that subtree holding such a gap
+                while level:
+                    level -= 1
+                    i = 2 * i + 1 if max_end[level].get(2 * i + 1, NEG_INF) >= end else 2 * i
+                return i
+            i >>= 1
+        return None
+
+    def _first_fitting(self, t: int, duration: int) -> Optional[int]:
+        """Earliest start at or after t of a gap at least duration long."""
+        max_len = self._max_len
+        top = len(max_len) - 1
+        if t >> top:
+            return None
+        if max_len[0].get(t, NEG_INF) >= duration:
+            return t
+        i = t
+        for level in range(top):
+            if not i & 1 and max_len[level].get(i + 1, NEG_INF) >= duration:
+                i += 1
+                # Leftmost leaf of that subtree holding such a gap
+                while level:
+                    level -= 1
+                    i = 2 * i if max_len[level].get(2 * i, NEG_INF) >= duration else 2 * i + 1
+                return i
+            i >>= 1
+        return None
+
+
+def schedule_gaps(tasks: Iterable[int], start: list[int], end: list[int], processor: list[int],
+                  cores: Iterable[int] = ()) -> tuple[dict[int, list[tuple[int,int]]], GapIndex]:
+    """(start, task) rows of every core in start order, and the idle time around them, for the given tasks of a schedule."""
+    by_core: dict[int, list[tuple[int, int]]] = {p: [] for p in cores}
+    for i in tasks:
+        by_core.setdefault(processor[i], []).append((start[i], i))
+    gaps = GapIndex()
+    for p, rows in by_core.items():
+        rows.sort()
+        free = 0
+        for s, i in rows:
+            if end[i] > s:
+                gaps.add(p, free, s)
+                free = end[i]
+        gaps.add(p, free, INF)
+    return by_core, gaps
+
+
+def shift_slot(gaps: GapIndex, core: int, rows: list[tuple[int,int]], ready_time: int, duration: int,
+               previous_start: int, unschedule: Callable[[int], None]) -> tuple[Optional[int], list[int]]:
+    """
+    Start of a task staying on core (rows being its other tasks, see
+    schedule_gaps), formerly starting at previous_start: the earliest gap
+    that fits it if it can start as early as before, otherwise it is shifted
+    right, pushing along the tasks of the core it then overlaps, which are
+    unscheduled and returned to be placed again after it. None if no gap of
+    the core fits it.
+    """
+    start = gaps.earliest_on(core, ready_time, duration)
+    if start is None or start <= previous_start:
+        return start, []
+    ready_time = max(ready_time, previous_start)
+    k = bisect_left(rows, (ready_time, -1))
+    pushed = []
+    while True:
+        start = gaps.earliest_on(core, ready_time, duration)
+        if start is None or k == len(rows) or rows[k][0] >= start + duration:
+            return start, pushed
+        pushed.append(rows[k][1])
+        unschedule(rows[k][1])
+
+
+def insertion_slot(gaps: GapIndex, ready_time: int, duration: int, preferred_processor: Optional[int] = None,
+                   com_penalty: int = 0, arrival: Optional[Arrival] = None) -> Optional[tuple[int,int]]:
+    """
+    Core and start time of the earliest gap the task fits in. Cores other
+    than the preferred one (the one of a predecessor) pay the communication
+    penalty, or with an arrival, the task waits for its data on the core.
+    """
+    if arrival is not None:
+        found = gaps.earliest(arrival.on(preferred_processor) if preferred_processor is not None else arrival.earliest(),
+                              duration)
+        if found is None or found[1] >= arrival.on(found[0]):
+            return found
+        # The data is on every core by then
+        return gaps.earliest(arrival.remote(), duration)
+
+    found = gaps.earliest(ready_time, duration)
+    if found is None or not com_penalty or preferred_processor is None or found[0] == preferred_processor:
+        return found
+    return gaps.earliest(ready_time + com_penalty, duration)
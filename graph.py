@@ -1,36 +1,34 @@
 import random
-from typing import Any
+from typing import TYPE_CHECKING, Any, Optional
 
-import networkx as nx
-from networkx.classes import DiGraph
+import numpy as np
 
+from task_graph import TaskGraph, as_task_graph
+from timing import compute_timing
 
-def build_graph(tasks: list[dict[str, Any]]) -> DiGraph:
-    G = nx.DiGraph()
+if TYPE_CHECKING:
+    from networkx.classes import DiGraph
 
-    for task in tasks:
-        G.add_node(task["id"], duration=task["duration"], memory=task["memory"])
-        for dep in task["dependencies"]:
-            G.add_edge(dep, task["id"])
 
-    return G
+def build_graph(tasks: list[dict[str, Any]]) -> TaskGraph:
+    return TaskGraph.from_tasks(tasks)
 
-def generate_random_dag(num_nodes: int) -> dict[str, list[Any]]:
+def build_nx_graph(tasks: list[dict[str, Any]]) -> "DiGraph":
+    return build_graph(tasks).to_networkx()
+
+def generate_random_dag(num_nodes: int, seed: Optional[int] = None) -> dict[str, list[Any]]:
+    """Every pair (i, j) with i < j is an edge with probability 1/2, drawn one row at a time."""
+    rng = np.random.default_rng(seed if seed is not None else random.getrandbits(64))
     edges = []
-    for j in range(1, num_nodes):
-        if random.choice([True, False]):
-            edges.append((0, j))
-    for i in range(1, num_nodes - 1):
-        if random.choice([True, False]):
-            edges.append((i, num_nodes - 1))
-    for i in range(1, num_nodes - 1):
-        for j in range(i + 1, num_nodes - 1):
-            if random.choice([True, False]):
-                edges.append((i, j))
+    for i in range(num_nodes - 1):
+        successors = np.flatnonzero(rng.random(num_nodes - i - 1) < 0.5) + i + 1
+        edges.extend((i, j) for j in successors.tolist())
     return {"nodes": list(range(num_nodes)), "edges": edges}
 
-def assign_subsets_and_features(dag: dict[str,list[Any]]) -> DiGraph:
+def assign_subsets_and_features(dag: dict[str,list[Any]]) -> "DiGraph":
     """Attribue un niveau `subset` et une caractéristique aléatoire (0-10) à chaque nœud."""
+    import networkx as nx
+
     G = nx.DiGraph()
     G.add_nodes_from(dag["nodes"])
     G.add_edges_from(dag["edges"])
@@ -48,23 +46,7 @@ def assign_subsets_and_features(dag: dict[str,list[Any]]) -> DiGraph:
     nx.set_node_attributes(G, features, "duration")
     return G
 
-def find_critical_path(dag: DiGraph) -> tuple[list[int], int]:
-    topological_order = list(nx.topological_sort(dag))
-    longest_path_length = {node: 0 for node in dag.nodes}
-    predecessor = {node: None for node in dag.nodes}
-
-    for node in topological_order:
-        for succ in dag.successors(node):
-            new_length = longest_path_length[node] + dag.nodes[node]["duration"]
-            if new_length > longest_path_length[succ]:
-                longest_path_length[succ] = new_length
-                predecessor[succ] = node
-
-    end_node = max(longest_path_length, key=longest_path_length.get)
-    critical_path = []
-    node = end_node
-    while node is not None:
-        critical_path.append(node)
-        node = predecessor[node]
-
-    return list(reversed(critical_path)), longest_path_length[end_node]
+def find_critical_path(dag: "TaskGraph | DiGraph") -> tuple[list[Any], int]:
+    dag = as_task_graph(dag)
+    timing = compute_timing(dag)
+    return [dag.ids[node] for node in timing.critical_path], timing.critical_length
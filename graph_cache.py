@@ -0,0 +1,81 @@
+import os
+from collections import OrderedDict
+from typing import Any, Hashable, NamedTuple, Optional
+
+from task_graph import TaskGraph
+
+# Rough size of the Python objects kept per task: the id and its slot in
+# graph.ids and graph.index, and one (priority, id) tuple of the binding
+ID_OVERHEAD = 150
+ORDER_OVERHEAD = 100
+
+
+def default_max_bytes() -> int:
+    """Half of the Lambda memory when running on Lambda, 512 MB otherwise."""
+    memory_mb = int(os.environ.get("AWS_LAMBDA_FUNCTION_MEMORY_SIZE", 1024))
+    return (memory_mb << 20) // 2
+
+
+def estimate_nbytes(graph: TaskGraph, binding: dict[str,Any]) -> int:
+    arrays = (graph.duration, graph.memory, graph.pred_ptr, graph.pred_idx, graph.succ_ptr, graph.succ_idx)
+    if graph.pred_data is not None:
+        arrays += (graph.pred_data,)
+    return sum(arr.nbytes for arr in arrays) + graph.num_tasks * ID_OVERHEAD + len(binding["order"]) * ORDER_OVERHEAD
+
+
+class CachedGraph(NamedTuple):
+    graph: TaskGraph
+    order: list[tuple[int,Any]]
+    ub: int
+    nbytes: int
+    load_time: float
+
+    def binding(self) -> dict[str,Any]:
+        """Binding in the format of the schedulers' ``data``, they consume the order so it is copied."""
+        return {"order": self.order.copy(), "ub": self.ub}
+
+
+class GraphCache:
+    """
+    Parsed graphs and their binding, kept in least recently used order and
+    bounded by an estimate of their memory use. Meant to live at module level
+    so that it survives across warm invocations of a Lambda container.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = default_max_bytes() if max_bytes is None else max_bytes
+        self.entries: OrderedDict[Hashable, CachedGraph] = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: Hashable) -> Optional[CachedGraph]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key: Hashable, graph: TaskGraph, binding: dict[str,Any], load_time: float) -> CachedGraph:
+        entry = CachedGraph(graph, binding["order"].copy(), binding["ub"], estimate_nbytes(graph, binding), load_time)
+        self.pop(key)
+        if entry.nbytes > self.max_bytes:
+            # Would evict everything and still not fit, use it once without caching it
+            return entry
+
+        self.entries[key] = entry
+        self.nbytes += entry.nbytes
+        while self.nbytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+        return entry
+
+    def pop(self, key: Hashable):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.nbytes -= entry.nbytes
@@ -0,0 +1,207 @@
+"""
+Columnar binary format for task graphs (``.tg`` files).
+
+Layout, all little-endian and every section aligned on 8 bytes:
+
+    header      magic, version, flags, num_tasks, num_edges
+    duration    int64[n]
+    memory      int64[n]
+    pred_ptr    int64[n+1]
+    pred_idx    int32[m]
+    succ_ptr    int64[n+1]
+    succ_idx    int32[m]
+    pred_data   int64[m], only with the edge data flag
+    ids         int64[n] if every id is an int, otherwise
+                int64[n+1] offsets followed by the UTF-8 encoded ids
+
+Loading maps the file in memory and hands views of it to TaskGraph, so no
+array is copied and nothing is allocated per edge.
+"""
+import argparse
+import contextlib
+import mmap
+import numbers
+import os
+import struct
+from typing import Any, Iterator, Sequence
+
+import numpy as np
+
+from graph_stream import stream_task_graph
+from task_graph import TaskGraph
+
+MAGIC = b"TASKGRPH"
+VERSION = 1
+EXTENSION = ".tg"
+FLAG_STR_IDS = 1
+FLAG_EDGE_DATA = 2
+
+_HEADER = struct.Struct("<8sIIqq")
+
+
+class IdTable(Sequence):
+    """Original task ids, decoded on access from the mapped file."""
+
+    def __init__(self, offsets: np.ndarray, blob: memoryview | bytes):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("task index out of range")
+        return str(self.blob[self.offsets[i]:self.offsets[i+1]], "utf-8")
+
+    def __reduce__(self):
+        # A memoryview of the mapped file cannot be pickled, send a copy of the ids
+        return IdTable, (self.offsets.copy(), bytes(self.blob))
+
+    def __iter__(self) -> Iterator[str]:
+        blob = self.blob
+        offsets = self.offsets.tolist()
+        for start, end in zip(offsets, offsets[1:]):
+            yield str(blob[start:end], "utf-8")
+
+
+class IntIdTable(Sequence):
+    """Integer task ids, returned as Python ints so that they stay JSON friendly."""
+
+    def __init__(self, values: np.ndarray):
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self.values[i].tolist()
+        return int(self.values[i])
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.values.tolist())
+
+
+def _padding(size: int) -> bytes:
+    return b"\0" * (-size % 8)
+
+
+def save_task_graph(graph: TaskGraph, path: str):
+    """
+    Write graph to path, through a temporary file renamed over it: a reader
+    never maps a partly written file.
+    """
+    ids = list(graph.ids)
+    str_ids = not all(isinstance(node, numbers.Integral) and not isinstance(node, bool) for node in ids)
+    flags = (FLAG_STR_IDS if str_ids else 0) | (FLAG_EDGE_DATA if graph.pred_data is not None else 0)
+    sections = [(graph.duration, np.int64), (graph.memory, np.int64),
+                (graph.pred_ptr, np.int64), (graph.pred_idx, np.int32),
+                (graph.succ_ptr, np.int64), (graph.succ_idx, np.int32)]
+    if graph.pred_data is not None:
+        sections.append((graph.pred_data, np.int64))
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, flags, graph.num_tasks, graph.number_of_edges()))
+            f.write(_padding(_HEADER.size))
+            for arr, dtype in sections:
+                data = np.ascontiguousarray(arr, dtype=dtype).tobytes()
+                f.write(data)
+                f.write(_padding(len(data)))
+
+            if str_ids:
+                encoded = [str(node).encode("utf-8") for node in ids]
+                offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+                np.cumsum([len(e) for e in encoded], out=offsets[1:])
+                f.write(offsets.tobytes())
+                f.write(b"".join(encoded))
+            else:
+                f.write(np.array(ids, dtype=np.int64).tobytes())
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
+
+
+def load_task_graph(path: str) -> TaskGraph:
+    """Memory-map a ``.tg`` file, the arrays of the graph are views of the file."""
+    with open(path, "rb") as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, flags, n, m = _HEADER.unpack_from(buf, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a task graph file")
+    if version != VERSION:
+        raise ValueError(f"{path}: unsupported task graph format version {version}")
+    if flags & ~(FLAG_STR_IDS | FLAG_EDGE_DATA):
+        raise ValueError(f"{path}: unsupported task graph flags {flags:#x}")
+
+    offset = _HEADER.size + len(_padding(_HEADER.size))
+
+    def section(dtype: Any, count: int) -> np.ndarray:
+        nonlocal offset
+        arr = np.frombuffer(buf, dtype=dtype, count=count, offset=offset)
+        offset += arr.nbytes + len(_padding(arr.nbytes))
+        return arr
+
+    duration = section(np.int64, n)
+    memory = section(np.int64, n)
+    pred_ptr = section(np.int64, n + 1)
+    pred_idx = section(np.int32, m)
+    succ_ptr = section(np.int64, n + 1)
+    succ_idx = section(np.int32, m)
+    pred_data = section(np.int64, m) if flags & FLAG_EDGE_DATA else None
+
+    ids: Sequence[Any]
+    if flags & FLAG_STR_IDS:
+        offsets = section(np.int64, n + 1)
+        ids = IdTable(offsets, memoryview(buf)[offset:offset + int(offsets[-1])])
+    else:
+        ids = IntIdTable(section(np.int64, n))
+
+    return TaskGraph(ids, duration, memory, pred_ptr, pred_idx, succ_ptr, succ_idx, pred_data)
+
+
+def binary_path(json_path: str) -> str:
+    return os.path.splitext(json_path)[0] + EXTENSION
+
+
+def convert_json(json_path: str, out_path: str | None = None) -> str:
+    """Convert an ``input_data/*.json`` task file to the binary format."""
+    if out_path is None:
+        out_path = binary_path(json_path)
+    with open(json_path, "rb") as infile:
+        graph = stream_task_graph(infile)
+    save_task_graph(graph, out_path)
+    return out_path
+
+
+def load_graph(path: str) -> TaskGraph:
+    """
+    Load a task graph from a ``.tg`` or ``.json`` file. For a JSON file, an
+    up to date ``.tg`` file next to it is memory-mapped instead.
+    """
+    if not path.endswith(EXTENSION):
+        bin_path = binary_path(path)
+        if not os.path.exists(bin_path) or os.path.getmtime(bin_path) < os.path.getmtime(path):
+            with open(path, "rb") as infile:
+                return stream_task_graph(infile)
+        path = bin_path
+    return load_task_graph(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert JSON task graphs to the binary task graph format.")
+    parser.add_argument("files", nargs="+", help="JSON task graph files (e.g. input_data/*.json)")
+    args = parser.parse_args()
+
+    for file_name in args.files:
+        print(f"{file_name} -> {convert_json(file_name)}")
@@ -1,71 +1,185 @@
-import networkx as nx
-import matplotlib.pyplot as plt
 import random
 import json
 import argparse
+import contextlib
+import os
+from typing import Any, Iterator, Optional
+
+import numpy as np
+
+from graph import build_graph
+
+SHAPES = ("random", "layered", "fork_join", "bounded_fan_in")
+BATCH_SIZE = 65_536
+MEMORY_SIZES = np.array([256, 512, 1024, 2048])  # Mémoire en Mo
+
+# Un lot de tâches consécutives : indice de la première tâche, durées, mémoires
+# et dépendances au format CSR (indices des tâches parentes)
+TaskBatch = tuple[int, np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+def _sample_parents(rng: np.random.Generator, lo: np.ndarray, hi: np.ndarray,
+                    counts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """ Tire counts[r] parents distincts dans [lo[r], hi[r]) pour chaque ligne r """
+    span = hi - lo
+    counts = np.minimum(counts, span)
+    ptr = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=ptr[1:])
+    kmax = int(counts.max(initial=0))
+    if kmax == 0:
+        return ptr, np.empty(0, dtype=np.int32)
+
+    cols = np.arange(kmax)
+    valid = cols < counts[:, None]
+    cand = lo[:, None] + (rng.random((len(counts), kmax)) * span[:, None]).astype(np.int64)
+
+    # Les petits intervalles ont trop de collisions : tirage sans remise direct
+    small = np.flatnonzero((span < 4 * kmax) & (counts > 0))
+    for r in small:
+        cand[r, :counts[r]] = lo[r] + rng.choice(span[r], counts[r], replace=False)
+
+    # Ailleurs, on retire les doublons jusqu'à ce qu'il n'y en ait plus
+    rows = np.flatnonzero(span >= 4 * kmax)
+    while rows.size:
+        masked = np.where(valid[rows], cand[rows], -1 - cols)
+        order = np.argsort(masked, axis=1, kind="stable")
+        ranked = np.take_along_axis(masked, order, axis=1)
+        dup_rows, dup_pos = np.nonzero(ranked[:, 1:] == ranked[:, :-1])
+        if not dup_rows.size:
+            break
+        r = rows[dup_rows]
+        cand[r, order[dup_rows, dup_pos + 1]] = lo[r] + (rng.random(len(r)) * span[r]).astype(np.int64)
+        rows = np.unique(r)
+
+    return ptr, cand[valid].astype(np.int32)
+
+
+def generate_batches(num_tasks: int, max_dependencies: int, random_seed: int, shape: str = "random",
+                     batch_size: int = BATCH_SIZE) -> Iterator[TaskBatch]:
+    """
+    Génère le graphe par lots de tâches, sans jamais le garder en mémoire.
+
+    Les parents d'une tâche sont toujours des tâches d'indice inférieur, le
+    graphe est donc acyclique par construction. Formes disponibles :
+      - random : 1 à max_dependencies parents parmi toutes les tâches précédentes
+      - layered : couches de largeur ~sqrt(n), parents pris dans la couche précédente
+      - fork_join : blocs fork -> max_dependencies branches -> join, enchaînés
+      - bounded_fan_in : exactement max_dependencies parents parmi les
+        4 * max_dependencies tâches précédentes (graphe profond, localité forte)
+    """
+    if shape not in SHAPES:
+        raise ValueError(f"Unknown shape {shape!r}, expected one of {SHAPES}")
+
+    rng = np.random.default_rng(random_seed)
+    width = max(1, int(num_tasks ** 0.5))
+    block = max_dependencies + 2
+
+    for start in range(0, num_tasks, batch_size):
+        idx = np.arange(start, min(start + batch_size, num_tasks), dtype=np.int64)
+        duration = rng.integers(5, 31, len(idx))  # Durée entre 5 et 30 unités
+        memory = rng.choice(MEMORY_SIZES, len(idx))
+
+        if shape == "random":
+            counts = rng.integers(1, max_dependencies + 1, len(idx))
+            ptr, parents = _sample_parents(rng, np.zeros_like(idx), idx, counts)
+        elif shape == "layered":
+            layer_start = idx // width * width
+            lo = np.maximum(layer_start - width, 0)
+            counts = np.where(layer_start > 0, rng.integers(1, max_dependencies + 1, len(idx)), 0)
+            ptr, parents = _sample_parents(rng, lo, layer_start, counts)
+        elif shape == "bounded_fan_in":
+            lo = np.maximum(idx - 4 * max_dependencies, 0)
+            ptr, parents = _sample_parents(rng, lo, idx, np.full(len(idx), max_dependencies))
+        else:
+            # Dans un bloc : 0 = fork (dépend du join précédent), 1..k = branches, k+1 = join
+            pos = idx % block
+            fork = idx - pos
+            counts = np.where(pos == 0, (idx > 0).astype(np.int64), np.where(pos == block - 1, block - 2, 1))
+            ptr = np.zeros(len(idx) + 1, dtype=np.int64)
+            np.cumsum(counts, out=ptr[1:])
+            owner = np.repeat(np.arange(len(idx)), counts)
+            rank = np.arange(ptr[-1]) - ptr[owner]
+            parents = np.select([pos[owner] == 0, pos[owner] == block - 1],
+                                [idx[owner] - 1, fork[owner] + 1 + rank], fork[owner]).astype(np.int32)
+
+        yield start, duration, memory, ptr, parents
+
 
-def generate_task_graph(num_tasks, max_dependencies=None, random_seed=None):
+def generate_task_graph(num_tasks, max_dependencies=None, random_seed=None, shape="random"):
     """ Génère un graphe de tâches avec des dépendances aléatoires """
 
     # Initialiser la graine aléatoire si fournie
     if random_seed is None:
         random_seed = random.randint(0, 99999)  # Générer une graine aléatoire
-    random.seed(random_seed)
-
-    G = nx.DiGraph()  # Graphe orienté
-    tasks = [f"task{i}" for i in range(1, num_tasks + 1)]  # Création des tâches
-    G.add_nodes_from(tasks)  # Ajout des tâches comme nœuds
-
-    task_data = {}  # Dictionnaire pour stocker les infos des tâches
 
     # Déterminer max_dependencies aléatoirement si non fourni
     if max_dependencies is None:
-        max_dependencies = random.randint(1, num_tasks - 1)  # Plus de flexibilité
-
-    for task in tasks:
-        # Génération aléatoire des attributs
-        duration = random.randint(5, 30)  # Durée entre 5 et 30 unités
-        memory = random.choice([256, 512, 1024, 2048])  # Mémoire en Mo
-
-        # Déterminer les dépendances
-        if task != "task1":  # La première tâche n'a pas de dépendances
-            num_deps = random.randint(1, min(max_dependencies, len(tasks) - 1))  
-            possible_parents = [t for t in tasks if t < task]  # Seulement les tâches précédentes
-            selected_parents = random.sample(possible_parents, min(len(possible_parents), num_deps))  # Choix aléatoire
-        else:
-            selected_parents = []
+        max_dependencies = random.Random(random_seed).randint(1, max(1, num_tasks - 1))  # Plus de flexibilité
 
-        # Ajouter les infos au dictionnaire
-        task_data[task] = {
-            "id": task,
-            "duration": duration,
-            "memory": memory,
-            "dependencies": selected_parents
-        }
-
-        # Ajouter les dépendances dans le graphe
-        for dep in selected_parents:
-            G.add_edge(dep, task)
+    task_data = {task["id"]: task for task in iter_tasks(num_tasks, max_dependencies, random_seed, shape)}
+    G = build_graph(list(task_data.values()))
 
     return G, task_data, random_seed, max_dependencies
 
-def save_graph_to_json(task_data, num_tasks, max_dependencies, random_seed):
-    """ Sauvegarde le graphe sous format JSON """
-    graph_json = {
+
+def iter_tasks(num_tasks: int, max_dependencies: int, random_seed: int, shape: str = "random") -> Iterator[dict[str, Any]]:
+    """ Tâches une par une, au format du JSON d'entrée """
+    for start, duration, memory, ptr, parents in generate_batches(num_tasks, max_dependencies, random_seed, shape):
+        parents = parents.tolist()
+        ptr = ptr.tolist()
+        for k, (d, m) in enumerate(zip(duration.tolist(), memory.tolist())):
+            yield {
+                "id": f"task{start + k + 1}",
+                "duration": d,
+                "memory": m,
+                "dependencies": [f"task{p + 1}" for p in parents[ptr[k]:ptr[k+1]]]
+            }
+
+
+def graph_file_name(num_tasks: int, max_dependencies: int, random_seed: int, shape: str = "random") -> str:
+    suffix = "" if shape == "random" else f"_{shape}"
+    return f"input_data/task_graph_{num_tasks}_{max_dependencies}_seed_{random_seed}{suffix}.json"
+
+
+def save_graph_to_json(num_tasks: int, max_dependencies: int, random_seed: int, shape: str = "random",
+                       filename: Optional[str] = None) -> str:
+    """ Génère le graphe et l'écrit en JSON au fil de l'eau, une tâche par ligne """
+    if filename is None:
+        filename = graph_file_name(num_tasks, max_dependencies, random_seed, shape)
+
+    header = {
         "graph_id": f"task_graph_ntask_{num_tasks}_max_dep_{max_dependencies}_seed_{random_seed}",
         "random_seed": random_seed,
         "max_dependencies": max_dependencies,
-        "tasks": list(task_data.values())  # Convertir le dictionnaire en liste
+        "shape": shape,
     }
 
-    filename = f"input_data/task_graph_{num_tasks}_{max_dependencies}_seed_{random_seed}.json"
-
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(graph_json, f, indent=4)  # Enregistrement avec indentation
+    # Écrit à côté puis renommé : un lecteur (sweep.prepare_graph...) ne voit jamais de fichier partiel
+    tmp_path = f"{filename}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(header)[:-1] + ', "tasks": [\n')
+            sep = ""
+            for start, duration, memory, ptr, parents in generate_batches(num_tasks, max_dependencies, random_seed, shape):
+                deps = [f'"task{p + 1}"' for p in parents.tolist()]
+                ptr = ptr.tolist()
+                lines = [
+                    f'{{"id": "task{start + k + 1}", "duration": {d}, "memory": {m}, '
+                    f'"dependencies": [{", ".join(deps[ptr[k]:ptr[k+1]])}]}}'
+                    for k, (d, m) in enumerate(zip(duration.tolist(), memory.tolist()))
+                ]
+                f.write(sep + ",\n".join(lines))
+                sep = ",\n"
+            f.write("\n]}\n")
+        os.replace(tmp_path, filename)
+    except BaseException:
+        # open() a pu échouer avant de créer le fichier temporaire
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
+
+    return filename
 
-    print(f"\n✅ Graphe sauvegardé sous {filename}")
-    print(f"🔹 Pour reproduire ce graphe, utilisez la seed : {random_seed}")
-    print(f"🔹 Nombre maximal de dépendances utilisé : {max_dependencies}")
 
 def main():
     """ Fonction principale du script """
@@ -80,95 +194,39 @@ def main():
     # Argument optionnel : nombre maximal de dépendances
     parser.add_argument("--max_dependencies", type=int, required=False, help="Nombre maximal de dépendances par tâche (optionnel, aléatoire si absent).")
 
-    args = parser.parse_args()
+    # Argument optionnel : forme du graphe
+    parser.add_argument("--shape", choices=SHAPES, default="random", help="Forme du graphe (random par défaut).")
 
-    # Générer le graphe avec ou sans seed et max_dependencies
-    G, task_data, random_seed, max_dependencies = generate_task_graph(
-        num_tasks=args.num_tasks, 
-        max_dependencies=args.max_dependencies, 
-        random_seed=args.seed
-    )
+    args = parser.parse_args()
 
-    assert nx.is_directed_acyclic_graph(G), "Le graphe généré contient un cycle !"
+    random_seed = args.seed
+    if random_seed is None:
+        random_seed = random.randint(0, 99999)
+    max_dependencies = args.max_dependencies
+    if max_dependencies is None:
+        max_dependencies = random.Random(random_seed).randint(1, max(1, args.num_tasks - 1))
 
     # Sauvegarde en JSON
-    save_graph_to_json(task_data, args.num_tasks, max_dependencies, random_seed)
+    filename = save_graph_to_json(args.num_tasks, max_dependencies, random_seed, args.shape)
 
-    # Dessiner le graphe
-    # plt.figure(figsize=(8, 6))
-    # pos = nx.shell_layout(G)  # Disposition en couches
-    # nx.draw(G, pos, with_labels=True, node_color="lightblue", edge_color="black",
-    #         node_size=2000, font_size=12, font_weight="bold", arrows=True)
+    print(f"\n✅ Graphe sauvegardé sous {filename}")
+    print(f"🔹 Pour reproduire ce graphe, utilisez la seed : {random_seed}")
+    print(f"🔹 Nombre maximal de dépendances utilisé : {max_dependencies}")
 
-    # Affichage du graphe
-    # plt.title(f"Graphe des dépendances des tâches (seed={random_seed}, max_dep={max_dependencies})")
-    # plt.show()
+def size_ladder(max_tasks: int = 1_000_000) -> list[tuple[int, int]]:
+    """ (nombre de tâches, max dépendances) des graphes de benchmark, jusqu'à max_tasks exclu """
+    sizes = [(nt, max(2, nt // 4)) for nt in range(10, 100, 10)]
+    sizes += [(nt, max(2, int(nt ** 0.3))) for nt in range(100, 1_000, 100)]
+    sizes += [(nt, max(2, int(nt ** 0.3))) for nt in range(1_000, 10_000, 1_000)]
+    sizes += [(nt, max(2, int(nt ** 0.25))) for nt in range(10_000, 100_000, 10_000)]
+    sizes += [(nt, max(2, int(nt ** 0.25))) for nt in range(100_000, 1_000_000, 100_000)]
+    return [(nt, mp) for nt, mp in sizes if nt < max_tasks]
 
 def loop_main():
-    for nt in range(10, 100, 10):
-        mp = max(2, nt // 4)
-        G, task_data, _, _ = generate_task_graph(
-                num_tasks=nt,
-                max_dependencies=mp,
-                random_seed=42
-        )
-
-        assert nx.is_directed_acyclic_graph(G), "Le graphe généré contient un cycle !"
-
-        # Sauvegarde en JSON
-        save_graph_to_json(task_data, nt, mp, 42)
-
-    for nt in range(100, 1_000, 100):
-        mp = max(2, int(nt ** 0.3))
-        G, task_data, _, _ = generate_task_graph(
-                num_tasks=nt,
-                max_dependencies=mp,
-                random_seed=42
-        )
-
-        assert nx.is_directed_acyclic_graph(G), "Le graphe généré contient un cycle !"
-
-        # Sauvegarde en JSON
-        save_graph_to_json(task_data, nt, mp, 42)
-
-    for nt in range(1_000, 10_000, 1_000):
-        mp = max(2, int(nt ** 0.3))
-        G, task_data, _, _ = generate_task_graph(
-                num_tasks=nt,
-                max_dependencies=mp,
-                random_seed=42
-        )
-
-        assert nx.is_directed_acyclic_graph(G), "Le graphe généré contient un cycle !"
-
-        # Sauvegarde en JSON
-        save_graph_to_json(task_data, nt, mp, 42)
-
-    for nt in range(10_000, 100_000, 10_000):
-        mp = max(2, int(nt ** 0.25))
-        G, task_data, _, _ = generate_task_graph(
-                num_tasks=nt,
-                max_dependencies=mp,
-                random_seed=42
-        )
-
-        assert nx.is_directed_acyclic_graph(G), "Le graphe généré contient un cycle !"
-
-        # Sauvegarde en JSON
-        save_graph_to_json(task_data, nt, mp, 42)
-
-    for nt in range(100_000, 1_000_000, 100_000):
-        mp = max(2, int(nt ** 0.25))
-        G, task_data, _, _ = generate_task_graph(
-                num_tasks=nt,
-                max_dependencies=mp,
-                random_seed=42
-        )
-
-        assert nx.is_directed_acyclic_graph(G), "Le graphe généré contient un cycle !"
-
+    for nt, mp in size_ladder():
         # Sauvegarde en JSON
-        save_graph_to_json(task_data, nt, mp, 42)
+        filename = save_graph_to_json(nt, mp, 42)
+        print(f"✅ Graphe sauvegardé sous {filename}")
 
 if __name__ == "__main__":
     loop_main()
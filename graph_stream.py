@@ -0,0 +1,108 @@
+import codecs
+import json
+import re
+from typing import IO, Any, Iterator
+
+from task_graph import TaskGraph, TaskGraphBuilder
+
+CHUNK_SIZE = 1 << 20
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_decoder = json.JSONDecoder()
+
+
+class _JsonReader:
+    """Chunked reader keeping only the unparsed tail of the stream in memory."""
+
+    def __init__(self, stream: IO, chunk_size: int):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        data = self.stream.read(self.chunk_size)
+        if isinstance(data, bytes):
+            text = self.utf8.decode(data, final=not data)
+        else:
+            text = data
+        self.eof = not data
+        self.buf = self.buf[self.pos:] + text
+        self.pos = 0
+        return not self.eof
+
+    def peek(self) -> str:
+        """Next non-whitespace character, without consuming it."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                raise ValueError("Unexpected end of JSON stream")
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos} of the current chunk, got {self.buf[self.pos]!r}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+                # A number at the very end of the buffer may continue in the next chunk
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.fill()
+
+
+def iter_json_tasks(stream: IO, chunk_size: int = CHUNK_SIZE) -> Iterator[dict[str, Any]]:
+    """
+    Yield the entries of the top-level ``tasks`` array one at a time, reading
+    the stream (file, S3 body, ...) chunk by chunk. Other top-level keys are
+    parsed and dropped.
+    """
+    reader = _JsonReader(stream, chunk_size)
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+
+    while True:
+        key = reader.value()
+        reader.expect(":")
+        if key == "tasks":
+            reader.expect("[")
+            if reader.peek() == "]":
+                reader.pos += 1
+            else:
+                while True:
+                    yield reader.value()
+                    if reader.peek() == ",":
+                        reader.pos += 1
+                    else:
+                        reader.expect("]")
+                        break
+        else:
+            reader.value()
+
+        if reader.peek() == ",":
+            reader.pos += 1
+        else:
+            reader.expect("}")
+            return
+
+
+def stream_task_graph(stream: IO, chunk_size: int = CHUNK_SIZE) -> TaskGraph:
+    """Fill a TaskGraph directly from a JSON task file, one task at a time."""
+    builder = TaskGraphBuilder()
+    for task in iter_json_tasks(stream, chunk_size):
+        builder.add_task(task["id"], task["duration"], task["memory"], task["dependencies"])
+    return builder.build()
@@ -0,0 +1,415 @@
+"""
+Incremental rescheduling.
+
+A graph delta lists the changes of a job, JSON friendly:
+
+    {"add": [{"id": "x", "duration": 5, "memory": 0, "dependencies": ["a"]}],
+     "remove": ["b"],
+     "add_edges": [["a", "c"], ["c", "d", 120]],       [src, dst] or [src, dst, data]
+     "remove_edges": [["a", "d"]],
+     "change": [{"id": "c", "duration": 30}, {"id": "d", "memory": 512}]}
+
+IncrementalSchedule keeps a schedule, the ALAP values and a topological
+rank of the tasks, and updates them for each delta instead of running
+alap_binding and the scheduler over the whole graph again: the ALAP values
+are recomputed from the changed tasks towards their ancestors only while
+they change, and only the changed tasks, then the dependents whose inputs
+now end at another time, are placed again: the added tasks in the earliest
+idle gap of a core (gaps.insertion_slot), the others on their core
+(gaps.shift_slot). Every other task keeps its place. Rebuilding the CSR
+arrays of the graph is a vectorized copy when the delta changes its edges,
+and removing tasks renumbers the others; the rest scales with the change.
+"""
+import argparse
+import heapq
+import json
+from array import array
+from bisect import bisect_right
+from types import MappingProxyType
+from typing import Any, Iterable, Mapping, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from gaps import insertion_slot, schedule_gaps, shift_slot
+from graph_format import load_graph
+from schedule import modified_critical_path
+from schedule_result import ScheduleResult
+from task_graph import TaskGraph, as_task_graph
+from timing import compute_timing
+
+
+class GraphDelta(NamedTuple):
+    added: Sequence[dict[str, Any]] = ()
+    removed: Sequence[Any] = ()
+    added_edges: Sequence[tuple[Any, Any, int]] = ()
+    removed_edges: Sequence[tuple[Any, Any]] = ()
+    durations: Mapping[Any, int] = MappingProxyType({})
+    memories: Mapping[Any, int] = MappingProxyType({})
+
+    @classmethod
+    def from_dict(cls, delta: dict[str, Any]) -> "GraphDelta":
+        changes = delta.get("change", [])
+        return cls(list(delta.get("add", [])), list(delta.get("remove", [])),
+                   [(edge[0], edge[1], int(edge[2]) if len(edge) > 2 else 0) for edge in delta.get("add_edges", [])],
+                   [(edge[0], edge[1]) for edge in delta.get("remove_edges", [])],
+                   {c["id"]: int(c["duration"]) for c in changes if "duration" in c},
+                   {c["id"]: int(c["memory"]) for c in changes if "memory" in c})
+
+    def is_structural(self) -> bool:
+        return bool(self.added or self.removed or self.added_edges or self.removed_edges)
+
+
+def _dependency(dep: Any) -> tuple[Any, int]:
+    return (dep["id"], dep.get("data", 0)) if isinstance(dep, dict) else (dep, 0)
+
+
+def apply_delta(graph: TaskGraph, delta: GraphDelta) -> tuple[TaskGraph, Optional[np.ndarray]]:
+    """
+    The graph with the delta applied, and the new index of every former
+    task (-1 once removed), None when the indices do not change. Kept tasks
+    stay in order, added ones come last; the new dependencies of a task
+    come after its former ones.
+    """
+    index = graph.index
+    for node in [*delta.removed, *delta.durations, *delta.memories]:
+        if node not in index:
+            raise ValueError(f"Unknown task {node!r}")
+    duration, memory = graph.duration.copy(), graph.memory.copy()
+    for node, d in delta.durations.items():
+        duration[index[node]] = d
+    for node, m in delta.memories.items():
+        memory[index[node]] = m
+    if not delta.is_structural():
+        # Same dependencies, the CSR arrays are shared
+        changed = TaskGraph(graph.ids, duration, memory, graph.pred_ptr, graph.pred_idx,
+                            graph.succ_ptr, graph.succ_idx, graph.pred_data)
+        changed.__dict__["index"] = index
+        return changed, None
+
+    n = graph.num_tasks
+    keep, new_index = None, None
+    ids, new_ids = list(graph.ids), dict(index)
+    if delta.removed:
+        keep = np.ones(n, dtype=bool)
+        keep[[index[node] for node in delta.removed]] = False
+        new_index = np.cumsum(keep) - 1
+        new_index[~keep] = -1
+        ids = [node for node, kept in zip(ids, keep.tolist()) if kept]
+        new_ids = {node: i for i, node in enumerate(ids)}
+    for task in delta.added:
+        if task["id"] in new_ids:
+            raise ValueError(f"Task {task['id']!r} is defined twice")
+        new_ids[task["id"]] = len(ids)
+        ids.append(task["id"])
+
+    # Former edges in the order of both CSR arrays, without the removed ones
+    pred_src, pred_dst = graph.pred_idx, np.repeat(np.arange(n), np.diff(graph.pred_ptr))
+    succ_src, succ_dst = np.repeat(np.arange(n), np.diff(graph.succ_ptr)), graph.succ_idx
+    pred_keep = np.ones(len(pred_src), dtype=bool) if keep is None else keep[pred_src] & keep[pred_dst]
+    succ_keep = np.ones(len(succ_src), dtype=bool) if keep is None else keep[succ_src] & keep[succ_dst]
+    removed_edges = set()
+    for u, v in delta.removed_edges:
+        found = []
+        if u in index and v in index:
+            found = np.flatnonzero(graph.predecessors(index[v]) == index[u])
+        if not len(found):
+            raise ValueError(f"Unknown dependency {u!r} -> {v!r}")
+        removed_edges.add((index[u], index[v]))
+        pred_keep[graph.pred_ptr[index[v]] + found[0]] = False
+        succ_keep[graph.succ_ptr[index[u]] + np.flatnonzero(graph.successors(index[u]) == index[v])[0]] = False
+
+    def remap(nodes: np.ndarray) -> np.ndarray:
+        return nodes if new_index is None else new_index[nodes]
+
+    pred_src, pred_dst = remap(pred_src[pred_keep]), remap(pred_dst[pred_keep])
+    succ_src, succ_dst = remap(succ_src[succ_keep]), remap(succ_dst[succ_keep])
+    pred_data = graph.pred_data[pred_keep] if graph.pred_data is not None else None
+
+    added_src, added_dst, added_data = [], [], []
+    edges = [(dep, task["id"], size) for task in delta.added
+             for dep, size in map(_dependency, task["dependencies"])]
+    seen = set()
+    for u, v, size in [*edges, *delta.added_edges]:
+        if u not in new_ids or v not in new_ids:
+            raise ValueError(f"Unknown task {u if u not in new_ids else v!r}")
+        old_u, old_v = index.get(u), index.get(v)
+        if (u, v) in seen or (old_u is not None and old_v is not None and (old_u, old_v) not in removed_edges
+                              and old_u in graph.predecessors(old_v)):
+            # Like in the builder, a dependency is only recorded once
+            continue
+        seen.add((u, v))
+        added_src.append(new_ids[u])
+        added_dst.append(new_ids[v])
+        added_data.append(size)
+    added_src, added_dst = np.array(added_src, dtype=np.int64), np.array(added_dst, dtype=np.int64)
+    added_data = np.array(added_data, dtype=np.int64)
+
+    # The new edges come last among the predecessors of their target, in the
+    # order of the delta, and in order among the successors of their source,
+    # like the builder would do. Values inserted at the same position keep
+    # their order, so they are sorted by target, then by (source, target)
+    m = len(ids)
+    order = np.argsort(added_dst, kind="stable")
+    at = np.searchsorted(pred_dst, added_dst[order], side="right")
+    pred_idx = np.insert(pred_src, at, added_src[order]).astype(np.int32)
+    if pred_data is not None or added_data.any():
+        if pred_data is None:
+            pred_data = np.zeros(len(pred_src), dtype=np.int64)
+        pred_data = np.insert(pred_data, at, added_data[order])
+    pred_ptr = np.zeros(m + 1, dtype=np.int64)
+    np.cumsum(np.bincount(pred_dst, minlength=m) + np.bincount(added_dst, minlength=m), out=pred_ptr[1:])
+    order = np.lexsort((added_dst, added_src))
+    at = np.searchsorted(succ_src * m + succ_dst, added_src[order] * m + added_dst[order])
+    succ_idx = np.insert(succ_dst, at, added_dst[order]).astype(np.int32)
+    succ_ptr = np.zeros(m + 1, dtype=np.int64)
+    np.cumsum(np.bincount(succ_src, minlength=m) + np.bincount(added_src, minlength=m), out=succ_ptr[1:])
+
+    if keep is not None:
+        duration, memory = duration[keep], memory[keep]
+    changed = TaskGraph(ids, np.concatenate([duration, [task["duration"] for task in delta.added]]).astype(np.int64),
+                        np.concatenate([memory, [task["memory"] for task in delta.added]]).astype(np.int64),
+                        pred_ptr, pred_idx, succ_ptr, succ_idx, pred_data)
+    changed.__dict__["index"] = new_ids
+    return changed, new_index
+
+
+def _kept(values: list[int], new_index: np.ndarray) -> list[int]:
+    return [values[i] for i in np.flatnonzero(new_index >= 0).tolist()]
+
+
+def repair_rank(graph: TaskGraph, rank: list[int], edges: list[tuple[int,int]]):
+    """
+    Raise the rank of the targets of the new edges above their sources, and
+    of their descendants above them. ValueError if an edge closes a cycle.
+    """
+    succ_ptr, succ_idx = graph.succ_ptr, graph.succ_idx
+    # Ranks only follow the edges added so far, the graph is a DAG at each step
+    unseen = set(edges)
+    for u, v in edges:
+        unseen.discard((u, v))
+        if rank[v] > rank[u]:
+            continue
+        rank[v] = rank[u] + 1
+        stack = [v]
+        while stack:
+            x = stack.pop()
+            for w in succ_idx[succ_ptr[x]:succ_ptr[x+1]].tolist():
+                if rank[w] <= rank[x] and (x, w) not in unseen:
+                    if w == u:
+                        raise ValueError(f"Dependency {graph.ids[u]!r} -> {graph.ids[v]!r} creates a cycle")
+                    rank[w] = rank[x] + 1
+                    stack.append(w)
+
+
+class IncrementalSchedule:
+    """
+    A schedule of graph on the processors, kept up to date as the graph
+    changes, see update. The schedule may come from any scheduler; the
+    tasks placed again pay com_penalty when they leave the processor of
+    their first predecessor, like in reexecute.
+    """
+
+    def __init__(self, graph: TaskGraph, schedule: ScheduleResult, processors: Iterable[int] = (),
+                 com_penalty: int = 0):
+        graph = as_task_graph(graph)
+        timing = compute_timing(graph)
+        self.graph = graph
+        self.com_penalty = com_penalty
+        self.alap = timing.alap.tolist()
+        self.ub = timing.ub
+        # Any ranking where a task comes after its predecessors, repaired when edges are added
+        self.rank = [0] * graph.num_tasks
+        for k, nodes in enumerate(timing.levels):
+            for i in nodes.tolist():
+                self.rank[i] = k
+
+        n = graph.num_tasks
+        self.start, self.end, self.processor = [0] * n, [0] * n, [-1] * n
+        for i, s, e, p in zip(schedule.task.tolist(), schedule.start.tolist(), schedule.end.tolist(),
+                              schedule.processor.tolist()):
+            self.start[i], self.end[i], self.processor[i] = s, e, p
+        self.by_core, self.gaps = schedule_gaps(range(n), self.start, self.end, self.processor, processors)
+
+    @classmethod
+    def schedule(cls, graph: TaskGraph, num_processors: int, **kwargs) -> "IncrementalSchedule":
+        """First schedule of the graph with schedule.modified_critical_path, kwargs being its options."""
+        result, _, _, _ = modified_critical_path(graph, num_processors, None, **kwargs)
+        return cls(graph, result, range(num_processors))
+
+    def result(self) -> tuple[ScheduleResult, int]:
+        task = array("q", range(self.graph.num_tasks))
+        result = ScheduleResult.from_rows(self.graph, task, array("q", self.start), array("q", self.processor))
+        return result, int(result.end.max(initial=0))
+
+    def binding(self) -> dict[str, Any]:
+        """Up to date binding of the graph, in the format of the schedulers' data argument."""
+        order = list(zip(self.alap, self.graph.ids))
+        heapq.heapify(order)
+        return {"order": order, "ub": self.ub}
+
+    def update(self, delta: GraphDelta) -> tuple[ScheduleResult, int, list[Any]]:
+        """
+        Apply the delta to the graph and the schedule. Returns the new
+        schedule, its makespan and the ids of the tasks placed again.
+        """
+        old = self.graph
+        graph, new_index = apply_delta(old, delta)
+        index = graph.index
+        added_edges = [(index[dep], index[task["id"]]) for task in delta.added
+                       for dep, _ in map(_dependency, task["dependencies"])]
+        added_edges += [(index[u], index[v]) for u, v, _ in delta.added_edges]
+        # Raises on a cycle, before anything changed
+        rank = self.rank if new_index is None else _kept(self.rank, new_index)
+        rank = rank + [0] * (graph.num_tasks - len(rank))
+        repair_rank(graph, rank, added_edges)
+
+        # Tasks whose ALAP value may change, and tasks to place again
+        changed_alap: set[int] = set()
+        replace: set[int] = set()
+        for i in [old.index[node] for node in delta.removed]:
+            self._unschedule(i)
+            changed_alap.update(old.predecessors(i).tolist())
+            replace.update(old.successors(i).tolist())
+        for u, v in delta.removed_edges:
+            changed_alap.add(old.index[u])
+            replace.add(old.index[v])
+        if new_index is not None:
+            self._reindex(new_index)
+            changed_alap = {int(new_index[i]) for i in changed_alap if new_index[i] >= 0}
+            replace = {int(new_index[i]) for i in replace if new_index[i] >= 0}
+        # The added tasks are not placed yet
+        added = graph.num_tasks - len(self.start)
+        for values in (self.start, self.end, self.alap):
+            values.extend([0] * added)
+        self.processor.extend([-1] * added)
+
+        self.graph, self.rank = graph, rank
+        self.ub = int(graph.duration.sum())
+        for node in [*delta.durations, *(task["id"] for task in delta.added)]:
+            changed_alap.add(index[node])
+            replace.add(index[node])
+        for u, v in added_edges:
+            changed_alap.add(u)
+            replace.add(v)
+        self._update_alap(changed_alap)
+        moved = self._replace(replace)
+        result, makespan = self.result()
+        return result, makespan, [graph.ids[i] for i in dict.fromkeys(moved)]
+
+    def _unschedule(self, i: int):
+        p = self.processor[i]
+        if p < 0:
+            return
+        rows = self.by_core[p]
+        del rows[bisect_right(rows, (self.start[i], i)) - 1]
+        self.gaps.release(p, self.start[i], self.end[i])
+
+    def _reindex(self, new_index: np.ndarray):
+        """Move the state of the kept tasks to their new index."""
+        for name in ("start", "end", "alap", "processor"):
+            setattr(self, name, _kept(getattr(self, name), new_index))
+        new_index = new_index.tolist()
+        for p, rows in self.by_core.items():
+            self.by_core[p] = [(s, new_index[i]) for s, i in rows]
+
+    def _update_alap(self, tasks: set[int]):
+        """Recompute the ALAP values of the tasks, then of their ancestors while they change, successors first."""
+        graph, alap, rank = self.graph, self.alap, self.rank
+        duration = graph.duration
+        heap = [(-rank[i], i) for i in tasks]
+        heapq.heapify(heap)
+        queued = set(tasks)
+        while heap:
+            _, i = heapq.heappop(heap)
+            queued.discard(i)
+            succ = graph.successors(i)
+            value = (min(alap[s] for s in succ.tolist()) if succ.size else 0) - int(duration[i])
+            if value == alap[i] and i not in tasks:
+                continue
+            alap[i] = value
+            for pred in graph.predecessors(i).tolist():
+                if pred not in queued:
+                    queued.add(pred)
+                    heapq.heappush(heap, (-rank[pred], pred))
+
+    def _replace(self, tasks: set[int]) -> list[int]:
+        """
+        Place the tasks again, then every dependent of a task that now ends
+        at another time, in the order they started before (once all their
+        predecessors are placed). The added tasks go in the earliest gap
+        that fits them, the others stay on their core.
+        """
+        graph, start, end, processor = self.graph, self.start, self.end, self.processor
+        durations = graph.duration
+        pending: list[tuple[int, int, int]] = []
+        # End of every task to place again, None for the added ones
+        previous_end: dict[int, Optional[int]] = {}
+        not_before: dict[int, int] = {}
+        # Tasks popped before one of their predecessors was placed
+        waiting: set[int] = set()
+
+        def unschedule(i: int):
+            previous_end[i] = end[i] if processor[i] >= 0 else None
+            self._unschedule(i)
+
+        def enqueue(i: int, time: int):
+            not_before[i] = time
+            key = previous_end[i] - int(durations[i]) if previous_end[i] is not None else time
+            heapq.heappush(pending, (key, self.rank[i], i))
+
+        for i in tasks:
+            unschedule(i)
+        for i in tasks:
+            enqueue(i, max([end[pred] for pred in graph.predecessors(i).tolist() if pred not in previous_end], default=0))
+        moved = []
+        while pending:
+            _, _, i = heapq.heappop(pending)
+            preds = graph.predecessors(i).tolist()
+            if any(pred in previous_end for pred in preds):
+                waiting.add(i)
+                continue
+            ready = max([not_before.pop(i)] + [end[pred] for pred in preds])
+            duration = int(durations[i])
+            if previous_end[i] is None:
+                preferred = processor[preds[0]] if preds else None
+                q, s = insertion_slot(self.gaps, ready, duration, preferred, self.com_penalty)
+            else:
+                q = processor[i]
+                s, pushed = shift_slot(self.gaps, q, self.by_core[q], ready, duration, start[i], unschedule)
+                for j in pushed:
+                    enqueue(j, s + duration)
+            start[i], end[i], processor[i] = s, s + duration, q
+            self.gaps.occupy(q, s, end[i])
+            rows = self.by_core.setdefault(q, [])
+            rows.insert(bisect_right(rows, (s, i)), (s, i))
+            moved.append(i)
+            changed = end[i] != previous_end.pop(i)
+            for succ in graph.successors(i).tolist():
+                if succ in waiting:
+                    waiting.discard(succ)
+                    enqueue(succ, max(not_before[succ], end[i]))
+                elif changed and succ not in previous_end:
+                    unschedule(succ)
+                    enqueue(succ, end[i])
+        return moved
+
+
+def load_deltas(path: str) -> list[GraphDelta]:
+    """Deltas of a JSON lines file, one per line."""
+    with open(path, "r") as infile:
+        return [GraphDelta.from_dict(json.loads(line)) for line in infile if line.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Schedule a task graph, then update the schedule for each delta.")
+    parser.add_argument("graph", help="task graph file (.json or .tg)")
+    parser.add_argument("deltas", help="JSON lines file, one graph delta per line")
+    parser.add_argument("-n", "--nodes", type=int, default=4, help="number of cores")
+    parser.add_argument("--placement", default="append", help="placement of the first schedule")
+    args = parser.parse_args()
+
+    incremental = IncrementalSchedule.schedule(load_graph(args.graph), args.nodes, placement=args.placement)
+    print(f"initial: {incremental.result()[1]}")
+    for k, delta in enumerate(load_deltas(args.deltas)):
+        _, makespan, moved = incremental.update(delta)
+        print(f"delta {k}: {makespan} ({len(moved)} tasks placed again)")
@@ -0,0 +1,48 @@
+from collections import Counter
+from time import perf_counter_ns
+from typing import Any
+
+
+class SchedulerStats:
+    """
+    Opt-in profile of a scheduling run: wall time per phase, counters and a
+    histogram of the processor selection time (power of two buckets, in ns).
+
+    The schedulers take it as ``stats=None``; when it is None the only cost is
+    an ``is not None`` test per phase.
+    """
+
+    def __init__(self):
+        self.phase_ns: Counter[str] = Counter()
+        self.counters: Counter[str] = Counter()
+        self.selection_histogram: Counter[int] = Counter()
+
+    @staticmethod
+    def clock() -> int:
+        return perf_counter_ns()
+
+    def lap(self, phase: str, since: int) -> int:
+        """Charge the time elapsed since `since` to phase, returns the current time."""
+        now = perf_counter_ns()
+        self.phase_ns[phase] += now - since
+        return now
+
+    def selection_lap(self, since: int) -> int:
+        now = perf_counter_ns()
+        elapsed = now - since
+        self.phase_ns["processor_selection"] += elapsed
+        self.selection_histogram[elapsed.bit_length()] += 1
+        return now
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] += n
+
+    def as_dict(self) -> dict[str, Any]:
+        """JSON friendly summary, times in seconds"""
+        return {
+            "phases": {phase: ns / 1e9 for phase, ns in self.phase_ns.items()},
+            "total": sum(self.phase_ns.values()) / 1e9,
+            "counters": dict(self.counters),
+            "selection_histogram": [{"le_ns": 1 << bucket, "count": self.selection_histogram[bucket]}
+                                    for bucket in sorted(self.selection_histogram)],
+        }
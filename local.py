@@ -1,9 +1,9 @@
 import json
-import os
 from timeit import default_timer as timer
 from types import MappingProxyType
 
-from graph import build_graph
+from binding_cache import BindingCache, LocalStore
+from graph_format import load_graph
 # from schedule import modified_critical_path
 # from schedule_module import modified_critical_path
 from schedule_memory import modified_critical_path
@@ -30,37 +30,19 @@ if __name__ == "__main__":
     desc = "100000_17_seed_42"
     file_name = f"task_graph_{desc}"
     in_file_name = f"input_data/{file_name}.json"
-    bind_file_name = f"bindings/{file_name}.json"
     out_file_name = f"output_data/schedule_{desc}_c_{cores_types}.json"
     # in_file_name = "input_data/graph.json"
-    # bind_file_name = "bindings/graph.json"
     # out_file_name = "output_data/schedule.json"
 
     start = timer()
-    with open(in_file_name, "r") as infile:
-        graph = json.load(infile)
+    G = load_graph(in_file_name)
 
-    data = None
-    if os.path.exists(bind_file_name):
-        with open(bind_file_name, "r") as infile:
-            data = json.load(infile)
-            tasks_order = data["order"]
-            ub = data["ub"]
-
-    G = build_graph(graph["tasks"])
+    data = BindingCache(LocalStore("bindings")).binding(G)
 
     # schedule, makespan = modified_critical_path(G, num_cores, bind_file)
     schedule, makespan, tasks_order, ub = modified_critical_path(G, processors, mem_lim, data)
 
-    with open(bind_file_name, "w") as outfile:
-        json.dump({"order": tasks_order, "ub": ub}, outfile)
-
-    result = {f"core_{core}": [] for core in range(sum(cores_types))}
-    # for id, task in schedule.items():
-    #     result[f"core_{task[2]}"].append({"task": id, "start_time": task[0]})
-
-    for task in schedule:
-        result[f"core_{task.processor}"].append({"task": task.id, "start_time": task.start_time, "duration": task.duration})
+    result = schedule.per_core(sum(cores_types))
 
     with open(out_file_name, "w") as outfile:
         json.dump(result, outfile)
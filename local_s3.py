@@ -1,19 +1,18 @@
-import json
 import logging
 from timeit import default_timer as timer
-from typing import Any, Optional
+from typing import Any
 from types import MappingProxyType
 from urllib.parse import urlparse
 
-import boto3
-from botocore.translate import build_retry_config
-
-from graph import build_graph
+from binding_cache import BindingCache, LocalStore
+from graph_stream import stream_task_graph
 from schedule_module import modified_critical_path
+from storage import PrefixStore, Uploads, encode_json, open_object, storage_for
+from task_graph import TaskGraph
 from plots import plot_schedule
 
-# Initialize the S3 client outside of the handler
-s3_client = boto3.client('s3')
+# Bindings already fetched or computed by this container
+local_bindings = LocalStore("bindings")
 
 # Initialize the logger
 logging.basicConfig(level=logging.INFO)
@@ -22,34 +21,21 @@ logger = logging.getLogger()
 BUCKET_NAME = "central-supelec-data-groupe2"
 
 
-def read_graph(bucket_name: str, key: str) -> dict[str, Any]:
-    try:
-        s3_object = s3_client.get_object(Bucket=bucket_name, Key=key)
-        body = s3_object['Body']
-        return json.loads(body.read())
-    except Exception as e:
-        logger.error(f"Failed to upload receipt to S3: {str(e)}")
-        raise
-
-def read_bind(bucket_name: str, key: str) -> Optional[dict[str, Any]]:
+def read_graph(bucket_name: str, key: str) -> TaskGraph:
+    """Build the task graph while the object is being downloaded"""
     try:
-        s3_object = s3_client.get_object(Bucket=bucket_name, Key=key)
-        body = s3_object['Body']
-        return json.loads(body.read())
-    except s3_client.exceptions.NoSuchKey:
-        return None
+        storage = storage_for(bucket_name)
+        head = storage.head(key)
+        with open_object(storage, key, head.size, etag=head.etag) as body:
+            return stream_task_graph(body)
     except Exception as e:
-        logger.error(f"Failed to upload receipt to S3: {str(e)}")
+        logger.error(f"Failed to download graph from S3: {str(e)}")
         raise
 
-def upload_json(bucket_name: str, key: str, schedule):
-    """Helper function to upload schedule to S3"""
+def upload_json(bucket_name: str, key: str, schedule, uploads: Uploads):
+    """Upload schedule as JSON (compressed if the key ends in .gz or .zst) in the background"""
     try:
-        s3_client.put_object(
-                Bucket=bucket_name,
-                Key=key,
-                Body=bytes(json.dumps(schedule).encode("utf-8"))
-        )
+        uploads.put(storage_for(bucket_name), key, encode_json(schedule, key))
     except Exception as e:
         logger.error(f"Failed to upload file to S3: {str(e)}")
         raise
@@ -69,25 +55,21 @@ if __name__ == "__main__":
         in_file_path = in_parsed_url.path.lstrip("/")
         out_bucket_name = out_parsed_url.netloc.split(".")[0]
         out_file_path = out_parsed_url.path.lstrip("/")
-        file_name = in_file_path.split(".")[0]
-        bind_file_name = f"{file_name}_bind.json"
 
         processors = MappingProxyType({0: 4, 250: 10, 500: 7, 750: 3, 1000: 8})
         num_cores = max(processors.values())
 
         start = timer()
-        dag = read_graph(in_bucket_name, in_file_path)
-        G = build_graph(dag["tasks"])
-        data = read_bind(in_bucket_name, bind_file_name)
+        uploads = Uploads()
+        G = read_graph(in_bucket_name, in_file_path)
+        data = BindingCache(local_bindings, PrefixStore(storage_for(in_bucket_name), codec="gzip", uploads=uploads)).binding(G)
 
-        schedule, _, tasks_order, ub = modified_critical_path(G, processors, data)
+        schedule, _, _, _ = modified_critical_path(G, processors, data)
 
-        result = {f"core_{core}": [] for core in range(num_cores)}
-        for task in schedule:
-            result[f"core_{task.processor}"].append({"task": task.id, "start_time": task.start_time, "duration": task.duration})
+        result = schedule.per_core(num_cores)
 
-        upload_json(out_bucket_name, out_file_path, result)
-        upload_json(out_bucket_name, bind_file_name, {"order": tasks_order, "ub": ub})
+        upload_json(out_bucket_name, out_file_path, result, uploads)
+        uploads.wait()
         end = timer()
 
         logger.info(f"Required time: {end-start}s")
@@ -1,51 +1,123 @@
+import hashlib
 import json
 import logging
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from timeit import default_timer as timer
 from typing import Any, Optional
 from urllib.parse import urlparse
 
-import boto3
-
-from graph import build_graph
+from batch import schedule_batch
+from binding_cache import BindingCache, LocalStore
+from communication import CommunicationModel
+from graph_stream import stream_task_graph
+from graph_cache import CachedGraph, GraphCache
+from graph_format import EXTENSION, load_task_graph
+from instrumentation import SchedulerStats
 from schedule import modified_critical_path
-
-# Initialize the S3 client outside of the handler
-s3_client = boto3.client('s3')
+from storage import PrefixStore, Uploads, download_object, encode_json, open_object, plain_key, storage_for
+from task_graph import TaskGraph
+
+# Compression of the bindings shared through the bucket ("gzip", "zstd" or "" for none), see storage.py
+BINDING_CODEC = os.environ.get("SCHEDULER_BINDING_CODEC", "gzip") or None
+# Bindings already fetched or computed by this container
+local_bindings = LocalStore("/tmp/bindings")
+# Binary graphs downloaded by this container, one file per version of an object
+GRAPH_DIR = "/tmp/graphs"
+# Parsed graphs and bindings, kept across warm invocations
+warm_graphs = GraphCache()
 
 # Initialize the logger
 logger = logging.getLogger()
 logger.setLevel("INFO")
 
 
-def read_graph(bucket_name: str, key: str) -> dict[str, Any]:
+@lru_cache(maxsize=None)
+def lambda_client() -> Any:
+    import boto3
+
+    return boto3.client('lambda')
+
+
+def read_graph(bucket_name: str, key: str, size: Optional[int] = None, etag: Optional[str] = None) -> TaskGraph:
+    """
+    Build the task graph while the object (of version etag if given) is
+    being downloaded (by ranges when it is large, and decompressed, see
+    storage.py)
+    """
     try:
-        s3_object = s3_client.get_object(Bucket=bucket_name, Key=key)
-        body = s3_object['Body']
-        return json.loads(body.read())
+        with open_object(storage_for(bucket_name), key, size, etag=etag) as body:
+            return stream_task_graph(body)
     except Exception as e:
-        logger.error(f"Failed to upload receipt to S3: {str(e)}")
+        logger.error(f"Failed to download graph from S3: {str(e)}")
         raise
 
-def read_bind(bucket_name: str, key: str) -> Optional[dict[str, Any]]:
+def local_graph_path(bucket_name: str, key: str, etag: str) -> str:
+    """Scratch file of a version of a binary graph, never overwritten by another version or object"""
+    digest = hashlib.sha256("\0".join((bucket_name, key, etag)).encode("utf-8")).hexdigest()[:32]
+    return os.path.join(GRAPH_DIR, f"{digest}-{os.path.basename(plain_key(key))}")
+
+def read_binary_graph(bucket_name: str, key: str, size: Optional[int] = None, etag: Optional[str] = None) -> TaskGraph:
+    """
+    Download a binary task graph to the Lambda scratch space, once per
+    version of the object, and map it. Graphs still mapped (e.g. by
+    warm_graphs) keep their file: a new version goes to another one.
+    """
     try:
-        s3_object = s3_client.get_object(Bucket=bucket_name, Key=key)
-        body = s3_object['Body']
-        return json.loads(body.read())
-    except s3_client.exceptions.NoSuchKey:
-        return None
+        storage = storage_for(bucket_name)
+        if etag is None:
+            etag, size = storage.head(key)
+        local_path = local_graph_path(bucket_name, key, etag)
+        if not os.path.exists(local_path):
+            os.makedirs(GRAPH_DIR, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=GRAPH_DIR)
+            os.close(fd)
+            try:
+                download_object(storage, key, tmp_path, size, etag)
+                os.replace(tmp_path, local_path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+        return load_task_graph(local_path)
     except Exception as e:
-        logger.error(f"Failed to upload receipt to S3: {str(e)}")
+        logger.error(f"Failed to download graph from S3: {str(e)}")
         raise
 
-def upload_json(bucket_name: str, key: str, schedule):
-    """Helper function to upload schedule to S3"""
+def load_graph_binding(bucket_name: str, key: str,
+                       uploads: Optional[Uploads] = None) -> tuple[CachedGraph,dict[str,Any]]:
+    """
+    Graph and binding of an S3 object, from the warm cache when the object
+    did not change. A binding computed here is uploaded on uploads if given.
+    """
+    start = timer()
+    storage = storage_for(bucket_name)
+    head = storage.head(key)
+    cache_key = (bucket_name, key, head.etag)
+    entry = warm_graphs.get(cache_key)
+    if entry is not None:
+        return entry, {"hit": True, "time_saved": max(entry.load_time - (timer() - start), 0.0)}
+
+    if plain_key(key).endswith(EXTENSION):
+        G = read_binary_graph(bucket_name, key, head.size, head.etag)
+    else:
+        G = read_graph(bucket_name, key, head.size, head.etag)
+    data = BindingCache(local_bindings, PrefixStore(storage, codec=BINDING_CODEC, uploads=uploads)).binding(G)
+    entry = warm_graphs.put(cache_key, G, data, timer() - start)
+    return entry, {"hit": False, "time_saved": 0.0}
+
+def upload_json(bucket_name: str, key: str, schedule, uploads: Optional[Uploads] = None):
+    """Upload schedule as JSON, compressed if the key ends in .gz or .zst; on uploads if given"""
     try:
-        s3_client.put_object(
-                Bucket=bucket_name,
-                Key=key,
-                Body=bytes(json.dumps(schedule).encode("utf-8"))
-        )
+        data = encode_json(schedule, key)
+        if uploads is not None:
+            uploads.put(storage_for(bucket_name), key, data)
+        else:
+            storage_for(bucket_name).put(key, data)
     except Exception as e:
-        logger.error(f"Failed to upload receipt to S3: {str(e)}")
+        logger.error(f"Failed to upload file to S3: {str(e)}")
         raise
 
 
@@ -58,6 +130,9 @@ def lambda_handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
     Returns:
         Dict containing status message
     """
+    if "configs" in event:
+        return batch_handler(event, context)
+
     try:
         in_url = event["graph"]
         num_cores = event["nodes"]
@@ -69,28 +144,111 @@ def lambda_handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
         in_file_path = in_parsed_url.path.lstrip("/")
         out_bucket_name = out_parsed_url.netloc.split(".")[0]
         out_file_path = out_parsed_url.path.lstrip("/")
-        file_name = in_file_path.split(".")[0]
-        bind_file_name = f"{file_name}_bind.json"
 
-        dag = read_graph(in_bucket_name, in_file_path)
-        G = build_graph(dag["tasks"])
-        data = read_bind(in_bucket_name, bind_file_name)
+        # The binding, if computed, and the schedule are uploaded at the same time
+        uploads = Uploads()
+        entry, cache = load_graph_binding(in_bucket_name, in_file_path, uploads)
+        G = entry.graph
+        data = entry.binding()
 
-        schedule, _, tasks_order, ub = modified_critical_path(G, num_cores, data)
+        # Opt-in profile of the scheduling loop
+        stats = SchedulerStats() if event.get("profile") else None
+        communication = CommunicationModel.from_dict(event["communication"]) if event.get("communication") else None
+        schedule, _, _, _ = modified_critical_path(G, num_cores, data, stats, communication=communication,
+                                                   selection=event.get("selection", "affinity"))
 
-        result = {f"core_{core}": [] for core in range(num_cores)}
-        for task in schedule:
-            result[f"core_{task.processor}"].append({"task": task.id, "start_time": task.start_time, "duration": task.duration})
+        result = schedule.per_core(num_cores)
 
-        upload_json(out_bucket_name, out_file_path, result)
-        upload_json(out_bucket_name, bind_file_name, {"order": tasks_order, "ub": ub})
+        upload_json(out_bucket_name, out_file_path, result, uploads)
+        uploads.wait()
 
         logger.info("Schedule created")
-        return {
+        response = {
             "statusCode": 200,
-            "message": "Schedule created"
+            "message": "Schedule created",
+            "cache": {**cache, "entries": len(warm_graphs), "hits": warm_graphs.hits, "misses": warm_graphs.misses}
         }
+        if stats is not None:
+            response["stats"] = stats.as_dict()
+        return response
 
     except Exception as e:
         logger.error(f"Failed to create a schedule: {str(e)}")
         raise
+
+
+def invoke_worker(function_name: str, payload: dict[str, Any]) -> list[dict[str, Any]]:
+    """Run a batch chunk in another invocation of this function"""
+    response = lambda_client().invoke(FunctionName=function_name, Payload=json.dumps(payload).encode("utf-8"))
+    body = json.loads(response["Payload"].read())
+    if response.get("FunctionError"):
+        raise RuntimeError(f"Batch worker failed: {body}")
+    return body["results"]
+
+
+def batch_handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
+    """
+    Schedule one graph for a list of configurations (see batch.py)
+    Parameters:
+        event: {"graph": url, "configs": [...], "output": url (optional), "workers": int (optional)}
+        context: Lambda runtime context
+    Returns:
+        Dict containing the makespan of every configuration, and the schedules
+        when there is no output to upload them to
+    With more than one worker, the configurations are split in chunks that are
+    scheduled by other invocations of this function.
+    """
+    try:
+        in_url = event["graph"]
+        configs = event["configs"]
+        out_url = event.get("output")
+        workers = min(event.get("workers", 1), len(configs))
+        include_schedules = event.get("schedules", out_url is not None)
+
+        in_parsed_url = urlparse(in_url)
+        in_bucket_name = in_parsed_url.netloc.split(".")[0]
+        in_file_path = in_parsed_url.path.lstrip("/")
+        uploads = Uploads()
+
+        if workers > 1:
+            size = -(-len(configs) // workers)
+            chunks = [configs[k:k + size] for k in range(0, len(configs), size)]
+            payloads = [{"graph": in_url, "configs": chunk, "schedules": include_schedules} for chunk in chunks]
+            with ThreadPoolExecutor(len(chunks)) as executor:
+                parts = executor.map(lambda payload: invoke_worker(context.function_name, payload), payloads)
+                results = [res for part in parts for res in part]
+            cache = {"hit": False, "time_saved": 0.0}
+        else:
+            entry, cache = load_graph_binding(in_bucket_name, in_file_path, uploads)
+            binding = {"order": entry.order, "ub": entry.ub}
+            results = schedule_batch(entry.graph, configs, binding, max_workers=1, include_schedules=include_schedules)
+
+        response = {
+            "statusCode": 200,
+            "message": f"{len(results)} schedules created",
+            "makespans": [res["makespan"] for res in results],
+            "cache": {**cache, "entries": len(warm_graphs), "hits": warm_graphs.hits, "misses": warm_graphs.misses}
+        }
+        if out_url is not None:
+            out_parsed_url = urlparse(out_url)
+            upload_json(out_parsed_url.netloc.split(".")[0], out_parsed_url.path.lstrip("/"), results, uploads)
+        else:
+            response["results"] = results
+        uploads.wait()
+
+        logger.info(response["message"])
+        return response
+
+    except Exception as e:
+        logger.error(f"Failed to create the batch schedules: {str(e)}")
+        raise
+
+
+if __name__ == "__main__":
+    # Run the handler on an event file, e.g. offline against a directory (see storage.py)
+    logging.basicConfig(level=logging.INFO)
+    with open(sys.argv[1]) as infile:
+        event = json.load(infile)
+    start = timer()
+    print(json.dumps(lambda_handler(event, None)))
+    logger.info(f"Required time: {timer() - start}s")
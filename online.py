@@ -0,0 +1,156 @@
+"""
+Online scheduling: tasks are placed one by one as they are submitted.
+
+A task may only depend on tasks submitted before it, so its predecessors are
+always placed already and it is assigned a processor and a start time right
+away, by the machine of the offline schedulers (see engine.py): the same
+selection as modified_critical_path, the processor of its first predecessor
+preferred. There is no priority, the tasks go in submission order.
+
+The scheduler has a clock, moved forward by the caller: no task starts
+before it, and the tasks ending by then are retired, so memory grows with
+the tasks still running or waiting, not with all the tasks ever submitted.
+A dependency on a retired or unknown task is one on a task already done,
+whose data is everywhere.
+
+The stream format is JSON lines, a task per line like in a task graph file,
+with an optional release time moving the clock first:
+
+    {"id": "b", "duration": 3, "memory": 10, "dependencies": ["a"], "time": 12}
+    {"time": 20}                                     only moves the clock
+
+Every task gives an assignment line, {"id", "processor", "start", "end"}.
+"""
+import argparse
+import heapq
+import json
+import sys
+from typing import IO, Any, Iterable, Iterator, NamedTuple, Optional
+
+from communication import Arrival, CommunicationModel
+from engine import Machine
+from schedule import FixedCores
+from selection import penalty_model
+from task_graph import _split_data
+
+# Upper bound of the end of the tasks, for the machines that need one
+HORIZON = 1 << 62
+
+
+class Assignment(NamedTuple):
+    id: Any
+    processor: int
+    start: int
+    end: int
+
+
+class OnlineScheduler:
+    """
+    Places tasks on a machine as they are submitted, see the module
+    docstring. With a communication model a task starts once the data of
+    its running predecessors reached its processor.
+    """
+
+    def __init__(self, machine: Machine, communication: Optional[CommunicationModel] = None, horizon: int = HORIZON):
+        costs = communication if communication is not None else penalty_model(machine.com_penalty)
+        if costs.num_types > 1:
+            costs = costs.with_types(machine.types())
+        self.model = costs if communication is not None or machine.selection == "eft" else None
+        self.machine = machine
+        machine.start(horizon)
+        self.now = 0
+        # End and processor of the tasks not retired yet
+        self.tasks: dict[Any, tuple[int, int]] = {}
+        # (end, submission number, id): ids need not be comparable
+        self._ends: list[tuple[int, int, Any]] = []
+        self._submitted = 0
+
+    @classmethod
+    def on_cores(cls, num_processors: int, placement: str = "append", selection: str = "affinity",
+                 communication: Optional[CommunicationModel] = None) -> "OnlineScheduler":
+        return cls(FixedCores(num_processors, placement, selection), communication)
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+    def submit(self, node: Any, duration: int, memory: int = 0, dependencies: Iterable[Any] = ()) -> Assignment:
+        """Place a task; a dependency is a task id, or ``{"id": ..., "data": size}``."""
+        if node in self.tasks:
+            raise ValueError(f"Task {node!r} is defined twice")
+        dependencies, data = _split_data(dependencies)
+        ready_time, preferred = self.now, None
+        arrival = Arrival(self.model, self.now) if self.model is not None else None
+        for k, dep in enumerate(dependencies):
+            placed = self.tasks.get(dep)
+            if placed is None:
+                continue
+            end, processor = placed
+            ready_time = max(ready_time, end)
+            if k == 0:
+                preferred = processor
+            if arrival is not None:
+                arrival.add(end, processor, data[k])
+
+        machine = self.machine
+        machine.advance()
+        processor, start = machine.select(ready_time, duration, memory, preferred, arrival)
+        end = start + duration
+        machine.assign(processor, start, end)
+        if end > self.now:
+            self.tasks[node] = (end, processor)
+            heapq.heappush(self._ends, (end, self._submitted, node))
+            self._submitted += 1
+        return Assignment(node, processor, start, end)
+
+    def advance(self, now: int) -> int:
+        """Move the clock to now, returns the number of tasks retired."""
+        if now < self.now:
+            raise ValueError(f"The clock cannot go back from {self.now} to {now}")
+        self.now = now
+        ends, retired = self._ends, 0
+        while ends and ends[0][0] <= now:
+            _, _, node = heapq.heappop(ends)
+            del self.tasks[node]
+            retired += 1
+        # Idle time before the clock is lost for good
+        gaps = getattr(self.machine, "gaps", None)
+        for index in (gaps if isinstance(gaps, list) else [gaps] if gaps is not None else []):
+            index.drop_before(now)
+        return retired
+
+
+def schedule_stream(scheduler: OnlineScheduler, lines: Iterable[str]) -> Iterator[Assignment]:
+    """Assignments of the tasks of a JSON lines stream, see the module docstring, as they are read."""
+    for line in lines:
+        if not line.strip():
+            continue
+        task = json.loads(line)
+        if "time" in task:
+            scheduler.advance(task["time"])
+        if "id" in task:
+            yield scheduler.submit(task["id"], task["duration"], task.get("memory", 0), task.get("dependencies", ()))
+
+
+def write_assignments(assignments: Iterable[Assignment], outfile: IO):
+    for assignment in assignments:
+        outfile.write(json.dumps(assignment._asdict()) + "\n")
+        outfile.flush()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Schedule tasks as they arrive, one JSON task per line.")
+    parser.add_argument("tasks", nargs="?", help="JSON lines file, standard input by default")
+    parser.add_argument("-n", "--nodes", type=int, default=4, help="number of cores")
+    parser.add_argument("--placement", default="append", help="append or insertion")
+    parser.add_argument("--selection", default="affinity", help="affinity or eft")
+    parser.add_argument("--communication", help="communication model JSON file")
+    args = parser.parse_args()
+
+    communication = None
+    if args.communication:
+        with open(args.communication) as infile:
+            communication = CommunicationModel.from_dict(json.load(infile))
+    scheduler = OnlineScheduler.on_cores(args.nodes, args.placement, args.selection, communication)
+    infile = open(args.tasks) if args.tasks else sys.stdin
+    with infile:
+        write_assignments(schedule_stream(scheduler, infile), sys.stdout)
@@ -0,0 +1,159 @@
+from typing import Callable, Iterable, Optional
+
+INF = float("inf")
+
+
+class _MinTree:
+    """Segment tree of minimums over the slots of a view, unused leaves hold +inf."""
+
+    __slots__ = ("size", "nodes")
+
+    def __init__(self, capacity: int = 1):
+        self.size = 1
+        while self.size < capacity:
+            self.size *= 2
+        self.nodes: list[float] = [INF] * (2 * self.size)
+
+    def rebuild(self):
+        nodes = self.nodes
+        for i in range(self.size - 1, 0, -1):
+            left = nodes[2 * i]
+            right = nodes[2 * i + 1]
+            nodes[i] = left if left <= right else right
+
+    def update(self, slot: int, value: float):
+        nodes = self.nodes
+        i = slot + self.size
+        nodes[i] = value
+        i >>= 1
+        while i:
+            left = nodes[2 * i]
+            right = nodes[2 * i + 1]
+            nodes[i] = left if left <= right else right
+            i >>= 1
+
+    def _roots(self, limit: Optional[int], start: int = 0) -> list[int]:
+        """Nodes covering the slots [start, limit), left to right."""
+        if limit is None or limit >= self.size:
+            if not start:
+                return [1]
+            limit = self.size
+        left, right = [], []
+        lo, hi = self.size + start, self.size + limit
+        while lo < hi:
+            if lo & 1:
+                left.append(lo)
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                right.append(hi)
+            lo >>= 1
+            hi >>= 1
+        return left + right[::-1]
+
+    def min(self, limit: Optional[int] = None, start: int = 0) -> float:
+        nodes = self.nodes
+        if limit is None and not start:
+            return nodes[1]
+        return min((nodes[i] for i in self._roots(limit, start)), default=INF)
+
+    def argmin(self, limit: Optional[int] = None, start: int = 0) -> Optional[int]:
+        """Lowest slot among those holding the smallest time, among the slots [start, limit)."""
+        return self.first_leq(self.min(limit, start), limit, start)
+
+    def first_leq(self, t: float, limit: Optional[int] = None, start: int = 0) -> Optional[int]:
+        """Lowest slot whose time is at most t, among the slots [start, limit)."""
+        if t == INF:
+            return None
+        nodes = self.nodes
+        for i in self._roots(limit, start):
+            if nodes[i] <= t:
+                while i < self.size:
+                    i *= 2
+                    if nodes[i] > t:
+                        i += 1
+                return i - self.size
+        return None
+
+
+class ProcessorPool:
+    """
+    Processor selection in O(log P).
+
+    ``times`` maps every processor ever seen to the time it becomes free,
+    like the ``processor_times`` dicts of the schedulers. Selection happens
+    within views: ordered lists of the currently eligible processors (all
+    available cores, or only those of a given type). Each view is indexed by
+    a segment tree, which gives its earliest-free core, its first core idle
+    at a given time and its minimum time without scanning it. "First" always
+    means first in the view order, so a view built from a set iterates the
+    processors exactly as a list comprehension over that set would.
+    """
+
+    def __init__(self, views: Iterable[Iterable[int]] = (), times: Optional[dict[int, int]] = None):
+        self.times: dict[int, int] = {} if times is None else times
+        self.set_views(views)
+
+    @classmethod
+    def from_processors(cls, processors: Iterable[int], time: int = 0) -> "ProcessorPool":
+        processors = list(processors)
+        return cls([processors], {p: time for p in processors})
+
+    def set_views(self, views: Iterable[Iterable[int]]):
+        """Replace the views; every processor in them must already have a time."""
+        self._order: list[list[int]] = []
+        self._trees: list[_MinTree] = []
+        self._slots: dict[int, list[tuple[int, int]]] = {}
+
+        for v, view in enumerate(views):
+            order = list(view)
+            tree = _MinTree(len(order))
+            for slot, p in enumerate(order):
+                tree.nodes[tree.size + slot] = self.times[p]
+                self._slots.setdefault(p, []).append((v, slot))
+            tree.rebuild()
+            self._order.append(order)
+            self._trees.append(tree)
+
+    def __contains__(self, p: int) -> bool:
+        return p in self._slots
+
+    def assign(self, p: int, time: int):
+        self.times[p] = time
+        for v, slot in self._slots.get(p, ()):
+            self._trees[v].update(slot, time)
+
+    def min_time(self, view: int = 0) -> float:
+        return self._trees[view].nodes[1]
+
+    def earliest(self, view: int = 0, exclude: Optional[int] = None, limit: Optional[int] = None,
+                 start: int = 0) -> Optional[int]:
+        """
+        Processor of the view that becomes free first, first in view order on
+        ties. With a limit, only the first limit processors of the view count,
+        and with a start only those from the start-th one.
+        """
+        if limit is not None and limit >= len(self._order[view]):
+            limit = None
+        return self._query(lambda: self._trees[view].argmin(limit, start), view, exclude)
+
+    def first_idle(self, t: float, view: int = 0, exclude: Optional[int] = None,
+                   limit: Optional[int] = None, start: int = 0) -> Optional[int]:
+        """First processor of the view already free at time t, among its processors [start, limit)."""
+        if limit is not None and limit >= len(self._order[view]):
+            limit = None
+        return self._query(lambda: self._trees[view].first_leq(t, limit, start), view, exclude)
+
+    def _query(self, search: Callable[[], Optional[int]], view: int, exclude: Optional[int]) -> Optional[int]:
+        tree = self._trees[view]
+        hidden = None
+        if exclude is not None:
+            hidden = next((slot for v, slot in self._slots.get(exclude, ()) if v == view), None)
+            if hidden is not None:
+                tree.update(hidden, INF)
+
+        slot = search()
+
+        if hidden is not None:
+            tree.update(hidden, self.times[exclude])
+        return None if slot is None else self._order[view][slot]
@@ -0,0 +1,25 @@
+from typing import Any, Optional
+
+from communication import CommunicationModel
+from engine import list_schedule
+from instrumentation import SchedulerStats
+from schedule_memory import ProcessorsAvailability, TasksOrder, TypedCores
+from schedule_result import ScheduleResult
+from task_graph import TaskGraph
+
+
+def ready_list_schedule(graph: TaskGraph, processors: ProcessorsAvailability, mem_lim: int,
+                        data: Optional[dict[str,Any]] = None,
+                        stats: Optional[SchedulerStats] = None, placement: str = "append",
+                        communication: Optional[CommunicationModel] = None, selection: str = "affinity",
+                        priority: str = "alap") -> tuple[ScheduleResult,int,TasksOrder,int]:
+    """
+    Event-driven variant of schedule_memory.modified_critical_path.
+
+    Tasks enter a ready queue (keyed by priority) when their last
+    predecessor has been placed, and placing a task walks its successors
+    once: O((N+E) log N). This is the loop of engine.list_schedule, which
+    every scheduler now runs, so the schedule is modified_critical_path's.
+    """
+    return list_schedule(graph, TypedCores(processors, mem_lim, placement, selection), data, stats, communication,
+                         priority)
@@ -1,124 +1,99 @@
-import heapq
 from typing import Any, Optional
 
-import networkx as nx
-from networkx.classes import DiGraph
+from communication import Arrival, CommunicationModel
+from engine import list_schedule
+from gaps import GapIndex, check_placement, insertion_slot
+from instrumentation import SchedulerStats
+from processor_pool import ProcessorPool
+from schedule_result import ScheduleResult
+from selection import check_selection, earliest_finish
+from task_graph import TaskGraph
+# The bindings moved to timing, they stay importable from here
+from timing import alap_binding, asap_binding
 
 
-class Task:
-    def __init__(self, id: int, duration: int, start_time: int, processor: int):
-        self.id = id
-        self.duration = duration
-        self.start_time = start_time
-        self.end_time = start_time + duration
-        self.processor = processor
+class FixedCores:
+    """
+    num_processors identical cores, always up. In append placement no task
+    starts before the earliest core is free.
+    """
 
-
-def alap_binding(graph: DiGraph) -> dict[Any,int]:
-    alap_times = {}
-    topo_order = list(reversed(list(nx.lexicographical_topological_sort(graph))))
-
-    for node in topo_order:
-        duration = graph.nodes[node]["duration"]
-        if graph.out_degree(node) == 0:
-            alap_times[node] = -duration
-        else:
-            successors = list(graph.successors(node))
-
-            if successors:
-                alap_times[node] = min(alap_times[succ] - duration for succ in successors)
-
-    return alap_times
-
-def asap_binding(graph: DiGraph) -> dict[Any,int]:
-    asap_times = {}
-    topo_order = list(nx.topological_sort(graph))
-
-    for node in topo_order:
-        if graph.in_degree(node) == 0:
-            asap_times[node] = 0
-        else:
-            predecessors = list(graph.predecessors(node))
-
-            if predecessors:
-                asap_times[node] = max(asap_times[pred] + graph.nodes[pred]["duration"] for pred in predecessors)
-
-    return asap_times
-
-
-def find_earliest_processor(processor_times: list[int]) -> int:
-    return min(range(len(processor_times)), key=lambda p: processor_times[p])
-
-
-# def find_same_processor(predecessors: list[int], schedule: list[Task]) -> Optional[int]:
-#     for task in schedule:
-#         if task.id in predecessors:
-#             return task.processor
-#     return None
-
-
-def find_same_processor(predecessors, task_map):
-    for pred in predecessors:
-        if pred in task_map:
-            return task_map[pred].processor
-    return None
-
-
-def modified_critical_path(graph: DiGraph, num_processors: int, data: Optional[dict[str,Any]]) -> tuple[list[Task],int,list[tuple[int,Any]],int]:
-    tasks_order: list[tuple[int,Any]] = []
-    ub: int
-    if data is None:
-        tasks_order = []
-        latest_finish, ub = alap_binding(graph)
-
-        # Priority is the latest finish time
-        for node in graph.nodes:
-            heapq.heappush(tasks_order, (latest_finish[node], node))
-    else:
-        tasks_order = data["order"]
-        ub = data["ub"]
-
-    saved_order = tasks_order.copy()
-    schedule: list[Task] = []
-    min_processor_time = 0
-    assigned_tasks = set()
-    processor_times = [0] * num_processors
     com_penalty = 0
-    task_map = {}
-
-    while tasks_order:
-        _, node = heapq.heappop(tasks_order)
-        if node in assigned_tasks:
-            continue
 
-        # Check dependency constraints
-        dependencies = list(graph.predecessors(node))
-        # max_dependency_end = max((task.end_time for task in schedule if task.id in dependencies), default=0)
-        max_dependency_end = max((task_map[dep].end_time for dep in dependencies if dep in task_map), default=0)
-        start_time = max(min_processor_time, max_dependency_end)
-        preferred_processor = find_same_processor(dependencies, task_map)
+    def __init__(self, num_processors: int, placement: str = "append", selection: str = "affinity"):
+        check_placement(placement)
+        check_selection(selection)
+        self.num_processors = num_processors
+        self.placement = placement
+        self.selection = selection
+
+    def start(self, ub: int):
+        self.pool = ProcessorPool.from_processors(range(self.num_processors))
+        self.gaps = GapIndex.from_processors(range(self.num_processors)) if self.placement == "insertion" else None
+        self.min_processor_time = 0
+
+    def types(self) -> dict[int,int]:
+        return {}
+
+    def advance(self) -> int:
+        return 0
+
+    def select(self, ready_time: int, duration: int, memory: int, preferred_processor: Optional[int],
+               arrival: Optional[Arrival], pinned: Optional[int] = None) -> tuple[int,int]:
+        pool, gaps, min_processor_time, com_penalty = self.pool, self.gaps, self.min_processor_time, self.com_penalty
+        if pinned is not None:
+            if gaps is not None:
+                return pinned, gaps.earliest_on(pinned, arrival.on(pinned), duration)
+            return pinned, max(min_processor_time, arrival.on(pinned), pool.times[pinned])
+
+        start_time = max(min_processor_time, ready_time)
+        if gaps is not None:
+            # Gaps may open before the earliest core is free
+            return insertion_slot(gaps, ready_time, duration,
+                                  preferred_processor if self.selection == "affinity" else None, com_penalty, arrival)
+        elif self.selection == "eft":
+            return earliest_finish([*arrival.local, pool.earliest()], arrival, pool.times, min_processor_time)
+        elif arrival is not None:
+            # Same as below, the penalty being the time the data needs to reach another core
+            if preferred_processor is not None and pool.times[preferred_processor] <= max(min_processor_time, arrival.remote()):
+                processor = preferred_processor
+            else:
+                processor = pool.first_idle(max(min_processor_time, arrival.earliest()))
+                if processor is None:
+                    processor = pool.earliest()
 
-        # First try to allocate the next task to the same core
-        # then try to allocate an already used core
-        # finally allocate a never used core if there is one
-        if preferred_processor is not None and processor_times[preferred_processor] <= start_time + com_penalty:
-            processor = preferred_processor
+            start_time = max(min_processor_time, arrival.on(processor), pool.times[processor])
         else:
-            available_processors = [p for p in range(num_processors) if processor_times[p] <= start_time]
-            if available_processors:
-                processor = available_processors[0]
+            # First try to allocate the next task to the same core
+            # then try to allocate an already used core
+            # finally allocate a never used core if there is one
+            if preferred_processor is not None and pool.times[preferred_processor] <= start_time + com_penalty:
+                processor = preferred_processor
             else:
-                processor = find_earliest_processor(processor_times)
-
-        start_time = max(start_time, processor_times[processor])
-        task = Task(node, graph.nodes[node]["duration"], start_time, processor)
-        schedule.append(task)
-        assigned_tasks.add(node)
-        processor_times[processor] = task.end_time
-        min_processor_time = min(processor_times)
-        task_map[node] = task
-
-    schedule.sort(key=lambda t: t.start_time)
-    makespan = max(processor_times)
-    return schedule, makespan, saved_order, ub
-
+                processor = pool.first_idle(start_time)
+                if processor is None:
+                    processor = pool.earliest()
+
+            start_time = max(start_time, pool.times[processor])
+        return processor, start_time
+
+    def assign(self, processor: int, start: int, end: int):
+        self.pool.assign(processor, max(end, self.pool.times[processor]))
+        if self.gaps is not None:
+            self.gaps.occupy(processor, start, end)
+        self.min_processor_time = self.pool.min_time()
+
+
+def modified_critical_path(graph: TaskGraph, num_processors: int, data: Optional[dict[str,Any]],
+                           stats: Optional[SchedulerStats] = None, placement: str = "append",
+                           communication: Optional[CommunicationModel] = None, selection: str = "affinity",
+                           priority: str = "alap") -> tuple[ScheduleResult,int,list[tuple[int,Any]],int]:
+    """
+    placement="append" puts every task after the last task of its core,
+    "insertion" puts it in the earliest idle gap of a core that fits it.
+    With a communication model, a task starts once the data of all its
+    predecessors reached its core. selection picks the core among the
+    candidates, see selection.py, and priority orders the tasks, see
+    engine.py.
+    """
+    return list_schedule(graph, FixedCores(num_processors, placement, selection), data, stats, communication, priority)
@@ -1,18 +1,17 @@
-import heapq
 from types import MappingProxyType
 from typing import Any, Optional, TypeAlias
 
-import networkx as nx
-from networkx.classes import DiGraph
-
-
-class Task:
-    def __init__(self, id: int, duration: int, start_time: int, processor: int):
-        self.id = id
-        self.duration = duration
-        self.start_time = start_time
-        self.end_time = start_time + duration
-        self.processor = processor
+from availability import AvailabilityTimeline
+from communication import Arrival, CommunicationModel
+from engine import list_schedule
+from gaps import GapIndex, check_placement, insertion_slot
+from instrumentation import SchedulerStats
+from processor_pool import ProcessorPool
+from schedule_result import ScheduleResult
+from selection import check_selection, earliest_finish
+from task_graph import TaskGraph
+# The bindings moved to timing, they stay importable from here
+from timing import alap_binding, asap_binding
 
 
 # TasksOrder = NewType("TasksOrder", list[tuple[int,Any]])
@@ -22,143 +21,275 @@ ProcessorsAvailability: TypeAlias = MappingProxyType[int, ProcessorsTypes]
 ScheduleBinding: TypeAlias = tuple[dict[int,int],int]
 
 
-def alap_binding(graph: DiGraph) -> ScheduleBinding:
-    alap_times = {}
-    topo_order = list(reversed(list(nx.lexicographical_topological_sort(graph))))
-    ub = 0
-
-    for node in topo_order:
-        duration = graph.nodes[node]["duration"]
-        ub += duration
-        if graph.out_degree(node) == 0:
-            alap_times[node] = -duration
-        else:
-            successors = list(graph.successors(node))
-
-            if successors:
-                alap_times[node] = min(alap_times[succ] - duration for succ in successors)
-
-    return alap_times, ub
-
-
-def asap_binding(graph: DiGraph) -> dict[int,int]:
-    asap_times = {}
-    topo_order = list(nx.topological_sort(graph))
-
-    for node in topo_order:
-        if graph.in_degree(node) == 0:
-            asap_times[node] = 0
-        else:
-            predecessors = list(graph.predecessors(node))
-
-            if predecessors:
-                asap_times[node] = max(asap_times[pred] + graph.nodes[pred]["duration"] for pred in predecessors)
-
-    return asap_times
-
-
-def find_earliest_processor(processors_types: ProcessorsTypes, processor_times: dict[int,int],
-                            task_memory: int, mem_lim: int, start_time: int, banned_processor: Optional[int] = None) -> int:
-    type1_processors, type2_processors = processors_types
-
-    if task_memory > mem_lim:
-        available_processors = type2_processors
-    else:
-        available_processors = type1_processors | type2_processors
-
-    if banned_processor is not None:
-        available_processors = [p for p in available_processors if p != banned_processor]
-
-    used_processors = [p for p in available_processors if processor_times[p] <= start_time]
-    if used_processors:
-        return used_processors[0]
-
-    return min(available_processors, key=lambda p: processor_times[p])
-
-
-def find_same_processor(predecessors: list[Any], task_map: dict[Any,Task]) -> Optional[int]:
-    for pred in predecessors:
-        if pred in task_map:
-            return task_map[pred].processor
-    return None
-
-
-def modified_critical_path(graph: DiGraph, processors: ProcessorsAvailability, mem_lim: int,
-                           data: Optional[dict[str,Any]] = None) -> tuple[list[Task],int,TasksOrder,int]:
-    ub: int
-    order: TasksOrder
-    if data is None:
-        order = []
-        latest_finish, ub = alap_binding(graph)
-
-        # Priority is the latest finish time
-        for node in graph.nodes:
-            heapq.heappush(order, (latest_finish[node], node))
+def processors_views(processors_types: ProcessorsTypes) -> tuple[set[int],set[int]]:
+    """Pool views: every available processor, and type 2 processors only."""
+    return processors_types[0] | processors_types[1], processors_types[1]
+
+
+def processor_types(processors: ProcessorsAvailability) -> dict[int,int]:
+    """Communication type of every processor: 1 for type 2 processors, 0 otherwise, as first seen."""
+    types: dict[int,int] = {}
+    for t in sorted(processors.keys()):
+        for k, group in enumerate(processors[t]):
+            for p in group:
+                types.setdefault(p, k)
+    return types
+
+
+def _first_idle(pool: ProcessorPool, timeline: AvailabilityTimeline, ti: int, view: int, t: int,
+                banned_processor: Optional[int], end: float) -> Optional[int]:
+    """First processor of the view, in view order, idle at t and staying up until end."""
+    # The pool views are sorted by window end: the processors staying up come
+    # first, in runs leaving together, each run in view order
+    runs = timeline.runs(ti, view, end)
+    if len(runs) == 1:
+        return pool.first_idle(t, view, banned_processor, runs[0][1])
+    best, best_rank = None, None
+    for lo, hi in runs:
+        p = pool.first_idle(t, view, banned_processor, hi, lo)
+        if p is not None:
+            rank = timeline.rank(ti, view, p)
+            if best is None or rank < best_rank:
+                best, best_rank = p, rank
+    return best
+
+
+def _earliest(pool: ProcessorPool, timeline: AvailabilityTimeline, ti: int, view: int,
+              banned_processor: Optional[int], end: float) -> Optional[int]:
+    """Processor of the view staying up until end that becomes free first, first in view order on ties."""
+    runs = timeline.runs(ti, view, end)
+    if len(runs) == 1:
+        return pool.earliest(view, banned_processor, runs[0][1])
+    best, best_key = None, None
+    for lo, hi in runs:
+        p = pool.earliest(view, banned_processor, hi, lo)
+        if p is not None:
+            key = (pool.times[p], timeline.rank(ti, view, p))
+            if best is None or key < best_key:
+                best, best_key = p, key
+    return best
+
+
+def find_earliest_processor(pool: ProcessorPool, timeline: AvailabilityTimeline, ti: int, task_memory: int, mem_lim: int,
+                            start_time: int, duration: int, preferred_processor: Optional[int] = None, com_penalty: int = 0,
+                            banned_processor: Optional[int] = None,
+                            arrival: Optional[Arrival] = None, view: Optional[int] = None) -> Optional[tuple[int,int]]:
+    """
+    Processor and start time for a task whose dependencies end at start_time,
+    among the processors of segment ti that stay up until the task ends.
+    None when no processor of the segment is up long enough. With an arrival
+    the task starts once its data is on the processor instead. The view
+    defaults to the one the task memory allows.
+    """
+    # See processors_views for the content of each view
+    if view is None:
+        view = 1 if task_memory > mem_lim else 0
+
+    if arrival is not None:
+        def start_on(processor: int) -> int:
+            return max(arrival.on(processor), pool.times[processor])
+        start_time, com_penalty = arrival.earliest(), 0
     else:
-        order = data["order"]
-        ub = data["ub"]
-
-    tasks_order = order
-    saved_order = order.copy()
-    schedule: list[Task] = []
-    min_processor_time = 0
-    thresholds = sorted(processors.keys())
-    ti = 0
-    processors_types = processors[thresholds[ti]]
-    all_processors = processors_types[0] | processors_types[1]
-    processor_times: dict[int,int] = {p: 0 for p in all_processors}
-    com_penalty = 1
-    task_map: dict[Any,Task] = {}
-
-    # failed_processor = 0
-    # failure_time = 1500
-
-    while tasks_order:
-        _, node = heapq.heappop(tasks_order)
-
-        # update availability of processors
-        if ti < len(thresholds) - 1:
-            next_t = thresholds[ti+1]
-            if min_processor_time >= next_t:
-                ti += 1
-                processors_types = processors[thresholds[ti]]
-                all_processors = processors_types[0] | processors_types[1]
-                old_processors_types = processors[thresholds[ti-1]]
-
-                processor_times.update({p: ub for p in old_processors_types[0] - processors_types[0]})
-                processor_times.update({p: ub for p in old_processors_types[1] - processors_types[1]})
-                processor_times.update({p: min_processor_time for p in processors_types[0] - old_processors_types[0]})
-                processor_times.update({p: min_processor_time for p in processors_types[1] - old_processors_types[1]})
-
-        # Check dependency constraints
-        dependencies = list(graph.predecessors(node))
-        max_dependency_end = max((task_map[dep].end_time for dep in dependencies), default=0)
-        start_time = max_dependency_end
-        preferred_processor = find_same_processor(dependencies, task_map)
-
-        # First try to allocate the next task to the same core
-        # then try to allocate an already used core
-        # finally allocate a never used core if there is one
-        task_mem = graph.nodes[node]["memory"]
-        if preferred_processor is not None and (processor_times[preferred_processor] <= start_time + com_penalty and task_mem > mem_lim and preferred_processor in processors_types[0]):
-            processor = preferred_processor
+        def start_on(processor: int) -> int:
+            delay = 0 if processor == preferred_processor or preferred_processor is None else com_penalty
+            return max(start_time + delay, pool.times[processor])
+
+    end = start_time + com_penalty + duration
+    used_processor = _first_idle(pool, timeline, ti, view, start_time, banned_processor, end)
+    if used_processor is not None:
+        start = start_on(used_processor)
+        if arrival is None or timeline.window_end(ti, view, used_processor) >= start + duration:
+            return used_processor, start
+
+    while True:
+        processor = _earliest(pool, timeline, ti, view, banned_processor, end)
+        if processor is None:
+            return None
+        start = start_on(processor)
+        if timeline.window_end(ti, view, processor) >= start + duration:
+            return processor, start
+        # Ends too late for this processor, and for every one whose window ends sooner
+        if arrival is None:
+            end = start + duration
         else:
-            processor = find_earliest_processor(processors_types, processor_times, task_mem, mem_lim, start_time)
+            # The data may reach the others sooner, only drop the windows ending no later
+            end = timeline.window_end(ti, view, processor) + 1
+
+
+def enter_segment(pool: ProcessorPool, timeline: AvailabilityTimeline, ti: int,
+                  gaps: Optional[list[GapIndex]] = None, previous: Optional[int] = None):
+    """
+    Restrict the pool to the processors up during segment ti, those coming up
+    are free from then on. With gap indexes (one per view), the processors
+    starting a new window in a view get a gap until its end.
+    """
+    for p in timeline.views(ti)[0]:
+        window_start, _ = timeline.window(ti, p)
+        pool.times[p] = max(pool.times.get(p, window_start), window_start)
+    pool.set_views(timeline.views(ti))
+
+    if gaps is not None:
+        for v, view in enumerate(timeline.views(ti)):
+            for p in view:
+                window_end = timeline.window_end(ti, v, p)
+                if previous is None or timeline.window_end(previous, v, p) != window_end:
+                    gaps[v].add(p, max(pool.times[p], timeline.window_start(ti, v, p)), window_end)
+
+
+def update_availability(pool: ProcessorPool, timeline: AvailabilityTimeline, ti: int, min_processor_time: int,
+                        gaps: Optional[list[GapIndex]] = None) -> int:
+    """Move to the segment of min_processor_time once every available processor has reached it, returns its index"""
+    target = timeline.segment(min_processor_time)
+    if target > ti:
+        # Possibly several thresholds at once
+        enter_segment(pool, timeline, target, gaps, ti)
+        ti = target
+    return ti
+
+
+def select_processor(pool: ProcessorPool, timeline: AvailabilityTimeline, ti: int, preferred_processor: Optional[int],
+                     start_time: int, duration: int, task_mem: int, mem_lim: int, com_penalty: int,
+                     gaps: Optional[list[GapIndex]] = None,
+                     arrival: Optional[Arrival] = None, selection: str = "affinity") -> tuple[int,int,int]:
+    """
+    Processor for a task whose dependencies end at start_time, the task's
+    actual start time, and the segment the pool is in afterwards. With gap
+    indexes the task goes in the earliest gap of its view that fits it. With
+    an arrival, the communication penalty is replaced by the data transfers;
+    "eft" selection needs one.
+    """
+    if gaps is not None:
+        view = 1 if task_mem > mem_lim else 0
+        if selection == "eft":
+            preferred_processor = None
+        while True:
+            found = insertion_slot(gaps[view], start_time, duration, preferred_processor, com_penalty, arrival)
+            if found is not None:
+                processor, start = found
+                return processor, start, ti
+            if ti == len(timeline) - 1:
+                raise ValueError(f"No processor available for a task of {task_mem} MB")
+            # No window long enough yet, wait for the next segment
+            ti += 1
+            enter_segment(pool, timeline, ti, gaps, ti - 1)
+
+    if selection == "eft":
+        # Eligible views: type 2 processors only for big tasks, otherwise both types
+        views = (1,) if task_mem > mem_lim else (0, 1)
+        while True:
+            candidates = list(arrival.local)
+            for view in views:
+                found = find_earliest_processor(pool, timeline, ti, task_mem, mem_lim, start_time, duration,
+                                                arrival=arrival, view=view)
+                candidates.append(found[0] if found is not None else None)
+            found = earliest_finish(candidates, arrival, pool.times,
+                                    fits=lambda p, start: timeline.window_end(ti, views[0], p) >= start + duration)
+            if found is not None:
+                processor, start = found
+                return processor, start, ti
+            if ti == len(timeline) - 1:
+                raise ValueError(f"No processor available for a task of {task_mem} MB")
+            ti += 1
+            enter_segment(pool, timeline, ti)
+
+    processors_types = timeline.processors[timeline.thresholds[ti]]
+    # First try to allocate the next task to the same core
+    # then try to allocate an already used core
+    # finally allocate a never used core if there is one
+    ready_time = start_time + com_penalty if arrival is None else arrival.remote()
+    if preferred_processor is not None and (pool.times[preferred_processor] <= ready_time and task_mem > mem_lim and preferred_processor in processors_types[0]):
+        start = max(start_time if arrival is None else arrival.on(preferred_processor), pool.times[preferred_processor])
+        if timeline.window_end(ti, 0, preferred_processor) >= start + duration:
+            return preferred_processor, start, ti
+
+    # Failures are applied to the schedule afterwards, see failures.reexecute
+
+    while True:
+        found = find_earliest_processor(pool, timeline, ti, task_mem, mem_lim, start_time, duration,
+                                        preferred_processor, com_penalty, arrival=arrival)
+        if found is not None:
+            processor, start = found
+            return processor, start, ti
+        if ti == len(timeline) - 1:
+            raise ValueError(f"No processor available for a task of {task_mem} MB")
+        # No processor of this segment stays up until the task ends, wait for the next one
+        ti += 1
+        enter_segment(pool, timeline, ti)
+
+
+class TypedCores:
+    """
+    Processors of two types, available during the windows of an
+    availability mapping (see AvailabilityTimeline); tasks needing more than
+    mem_lim memory only run on type 2 processors.
+    """
 
-        # start_time = max(start_time, processor_times[processor])
-        # if start_time >= failure_time and processor == failed_processor:
-        #     processor = find_earliest_processor(processors_types, processor_times, task_mem, mem_lim, start_time, failed_processor)
-
-        if preferred_processor is not None and processor != preferred_processor:
-            start_time += com_penalty  # Communication cost
-
-        start_time = max(start_time, processor_times[processor])
-        task = Task(node, graph.nodes[node]["duration"], start_time, processor)
-        schedule.append(task)
-        processor_times[processor] = task.end_time
-        min_processor_time = min(processor_times[p] for p in all_processors)
-        task_map[node] = task
+    com_penalty = 1
 
-    schedule.sort(key=lambda t: t.start_time)
-    makespan = max(processor_times[p] for p in processor_times if processor_times[p] < ub)
-    return schedule, makespan, saved_order, ub
+    def __init__(self, processors: ProcessorsAvailability, mem_lim: int, placement: str = "append",
+                 selection: str = "affinity"):
+        check_placement(placement)
+        check_selection(selection)
+        self.processors = processors
+        self.mem_lim = mem_lim
+        self.placement = placement
+        self.selection = selection
+        self.timeline = AvailabilityTimeline(processors, processors_views)
+
+    def start(self, ub: int):
+        self.ti = 0
+        self.pool = ProcessorPool()
+        self.gaps = [GapIndex(), GapIndex()] if self.placement == "insertion" else None
+        enter_segment(self.pool, self.timeline, self.ti, self.gaps)
+        self.min_processor_time = 0
+
+    def types(self) -> dict[int,int]:
+        return processor_types(self.processors)
+
+    def advance(self) -> int:
+        previous_ti = self.ti
+        self.ti = update_availability(self.pool, self.timeline, self.ti, self.min_processor_time, self.gaps)
+        return self.ti - previous_ti
+
+    def select(self, ready_time: int, duration: int, memory: int, preferred_processor: Optional[int],
+               arrival: Optional[Arrival], pinned: Optional[int] = None) -> tuple[int,int]:
+        if pinned is not None:
+            view = 1 if memory > self.mem_lim else 0
+            if self.gaps is not None:
+                start = self.gaps[view].earliest_on(pinned, arrival.on(pinned), duration)
+                if start is not None:
+                    return pinned, start
+            else:
+                start = max(arrival.on(pinned), self.pool.times[pinned])
+                if self.timeline.window_end(self.ti, view, pinned) >= start + duration:
+                    return pinned, start
+
+        processor, start, self.ti = select_processor(self.pool, self.timeline, self.ti, preferred_processor, ready_time,
+                                                     duration, memory, self.mem_lim, self.com_penalty, self.gaps,
+                                                     arrival, self.selection)
+        return processor, start
+
+    def assign(self, processor: int, start: int, end: int):
+        self.pool.assign(processor, max(end, self.pool.times[processor]))
+        if self.gaps is not None:
+            for view_gaps in self.gaps:
+                view_gaps.occupy(processor, start, end)
+        self.min_processor_time = self.pool.min_time()
+
+
+def modified_critical_path(graph: TaskGraph, processors: ProcessorsAvailability, mem_lim: int,
+                           data: Optional[dict[str,Any]] = None,
+                           stats: Optional[SchedulerStats] = None, placement: str = "append",
+                           communication: Optional[CommunicationModel] = None, selection: str = "affinity",
+                           priority: str = "alap") -> tuple[ScheduleResult,int,TasksOrder,int]:
+    """
+    placement="append" puts every task after the last task of its core,
+    "insertion" puts it in the earliest idle gap of a core that fits it.
+    With a communication model, a task starts once the data of all its
+    predecessors reached its core; processors without a type in the model
+    take the one of their group (see processor_types). selection picks the
+    processor among the candidates, see selection.py, and priority orders
+    the tasks, see engine.py.
+    """
+    return list_schedule(graph, TypedCores(processors, mem_lim, placement, selection), data, stats, communication,
+                         priority)
@@ -1,150 +1,208 @@
-import heapq
 from types import MappingProxyType
-from typing import Any, Optional, NewType
+from typing import Any, Callable, Optional, NewType
 
-import networkx as nx
-from networkx.classes import DiGraph
+from communication import Arrival, CommunicationModel
+from engine import list_schedule
+from failures import Failure, FailureTrace
+from gaps import INF, GapIndex, check_placement, insertion_slot
+from instrumentation import SchedulerStats
+from processor_pool import ProcessorPool
+from schedule_result import ScheduleResult
+from selection import check_selection, earliest_finish
+from task_graph import TaskGraph
+# The bindings moved to timing, they stay importable from here
+from timing import alap_binding, asap_binding
 
 
-class Task:
-    def __init__(self, id: int, duration: int, start_time: int, processor: int):
-        self.id = id
-        self.duration = duration
-        self.start_time = start_time
-        self.end_time = start_time + duration
-        self.processor = processor
-
 TasksOrder = NewType("TasksOrder", list[tuple[int,Any]])
+# Failure the module has always simulated
+DEFAULT_FAILURES = FailureTrace([Failure(0, 1500)])
 
 
-def alap_binding(graph: DiGraph) -> tuple[dict[int,int],int]:
-    alap_times = {}
-    topo_order = list(reversed(list(nx.lexicographical_topological_sort(graph))))
-    ub = 0
-
-    for node in topo_order:
-        duration = graph.nodes[node]["duration"]
-        ub += duration
-        if graph.out_degree(node) == 0:
-            alap_times[node] = -duration
-        else:
-            successors = list(graph.successors(node))
-
-            if successors:
-                alap_times[node] = min(alap_times[succ] - duration for succ in successors)
-
-    return alap_times, ub
-
-
-def asap_binding(graph: DiGraph) -> dict[int,int]:
-    asap_times = {}
-    topo_order = list(nx.topological_sort(graph))
-
-    for node in topo_order:
-        if graph.in_degree(node) == 0:
-            asap_times[node] = 0
-        else:
-            predecessors = list(graph.predecessors(node))
-
-            if predecessors:
-                asap_times[node] = max(asap_times[pred] + graph.nodes[pred]["duration"] for pred in predecessors)
-
-    return asap_times
+def find_earliest_processor(pool: ProcessorPool, banned_processor: Optional[int] = None) -> int:
+    processor = pool.earliest(exclude=banned_processor)
+    if processor is None:
+        # Only the banned processor is available, fall back on the removed ones,
+        # or give the banned one back for the caller to find it down
+        processor = min((p for p in pool.times if p != banned_processor), key=pool.times.__getitem__,
+                        default=banned_processor)
+    return processor
 
 
-def find_earliest_processor(num_processors: int, processor_times: dict[int,int]) -> int:
-    return min(range(num_processors), key=lambda p: processor_times[p])
+class VaryingCores:
+    """
+    processors[t] identical cores from time t on. Removed cores are kept busy
+    until the upper bound, and no task starts on a core while it is down in
+    the failure trace.
+    """
 
-
-def find_same_processor(predecessors: list[Any], task_map: dict[Any,Task]):
-    for pred in predecessors:
-        if pred in task_map:
-            return task_map[pred].processor
-    return None
-
-
-def modified_critical_path(graph: DiGraph, processors: MappingProxyType[int,int], data: Optional[dict[str,Any]]) -> tuple[list[Task],int,TasksOrder,int]:
-    ub: int
-    order: list
-    if data is None:
-        order = []
-        latest_finish, ub = alap_binding(graph)
-
-        # Priority is the latest finish time
-        for node in graph.nodes:
-            heapq.heappush(order, (latest_finish[node], node))
-    else:
-        order = data["order"]
-        ub = data["ub"]
-
-    tasks_order = TasksOrder(order)
-    saved_order = TasksOrder(order.copy())
-    schedule: list[Task] = []
-    min_processor_time = 0
-    thresholds = sorted(processors.keys())
-    ti = 0
-    num_processors = processors[thresholds[ti]]
-    processor_times: dict[int,int] = {p: 0 for p in range(num_processors)}
     com_penalty = 1
-    task_map: dict[Any,Task] = {}
-
-    failed_processor = 0
-    failure_time = 1500
-
-    while tasks_order:
-        _, node = heapq.heappop(tasks_order)
-
-        if ti < len(thresholds) - 1:
-            next_t = thresholds[ti+1]
-            if min_processor_time >= next_t:
-                ti += 1
-                num_processors = processors[thresholds[ti]]
-                old_num_processors = processors[thresholds[ti-1]]
-
-                if old_num_processors > num_processors:
-                    for p in range(num_processors, old_num_processors):
-                        processor_times[p] = ub
-                elif old_num_processors < num_processors:
-                    for p in range(old_num_processors, num_processors):
-                        processor_times[p] = min_processor_time
-
-        # Check dependency constraints
-        dependencies = list(graph.predecessors(node))
-        max_dependency_end = max((task_map[dep].end_time for dep in dependencies), default=0)
-        start_time = max_dependency_end
-        preferred_processor = find_same_processor(dependencies, task_map)
-
-        # First try to allocate the next task to the same core
-        # then try to allocate an already used core
-        # finally allocate a never used core if there is one
-        if preferred_processor is not None and processor_times[preferred_processor] <= start_time + com_penalty:
-            processor = preferred_processor
-        else:
-            available_processors = [p for p in range(num_processors) if processor_times[p] <= start_time]
-            if available_processors:
-                processor = available_processors[0]
-            else:
-                processor = find_earliest_processor(num_processors, processor_times)
 
-        start_time = max(start_time, processor_times[processor])
-        if start_time >= failure_time and processor == failed_processor:
-            available_processors = [p for p in range(num_processors) if p != failed_processor and processor_times[p] <= start_time]
-            if available_processors:
-                processor = available_processors[0]
+    def __init__(self, processors: MappingProxyType[int,int], placement: str = "append", selection: str = "affinity",
+                 failures: FailureTrace = DEFAULT_FAILURES):
+        check_placement(placement)
+        check_selection(selection)
+        self.processors = processors
+        self.thresholds = sorted(processors.keys())
+        self.placement = placement
+        self.selection = selection
+        self.failures = failures
+
+    def start(self, ub: int):
+        self.ub = ub
+        self.ti = 0
+        self.num_processors = self.processors[self.thresholds[0]]
+        self.pool = ProcessorPool.from_processors(range(self.num_processors))
+        self.gaps = None
+        if self.placement == "insertion":
+            self.gaps = GapIndex.from_processors(range(self.num_processors))
+            for p in range(self.num_processors):
+                self.failures.block_downtime(self.gaps, p)
+        self.min_processor_time = 0
+
+    def types(self) -> dict[int,int]:
+        return {}
+
+    def advance(self) -> int:
+        processors, thresholds, ti = self.processors, self.thresholds, self.ti
+        pool, gaps, min_processor_time = self.pool, self.gaps, self.min_processor_time
+        if ti == len(thresholds) - 1 or min_processor_time < thresholds[ti+1]:
+            return 0
+        ti = self.ti = ti + 1
+        num_processors = self.num_processors = processors[thresholds[ti]]
+        old_num_processors = processors[thresholds[ti-1]]
+
+        if old_num_processors > num_processors:
+            for p in range(num_processors, old_num_processors):
+                pool.times[p] = self.ub
+                if gaps is not None:
+                    gaps.clip(p, min_processor_time)
+        elif old_num_processors < num_processors:
+            for p in range(old_num_processors, num_processors):
+                pool.times[p] = min_processor_time
+                if gaps is not None:
+                    gaps.add(p, min_processor_time, INF)
+                    self.failures.block_downtime(gaps, p, min_processor_time)
+        pool.set_views([range(num_processors)])
+        return 1
+
+    def select(self, ready_time: int, duration: int, memory: int, preferred_processor: Optional[int],
+               arrival: Optional[Arrival], pinned: Optional[int] = None) -> tuple[int,int]:
+        pool, gaps, com_penalty, failures = self.pool, self.gaps, self.com_penalty, self.failures
+        if pinned is not None and pinned < self.num_processors:
+            if gaps is not None:
+                start_time = gaps.earliest_on(pinned, arrival.on(pinned), duration)
+                if start_time is not None:
+                    return pinned, start_time
+            else:
+                start_time = max(arrival.on(pinned), pool.times[pinned])
+                if failures.down_until(pinned, start_time) is None:
+                    return pinned, start_time
+
+        start_time = ready_time
+        if gaps is not None:
+            # Failed processors have no gap while they are down
+            found = insertion_slot(gaps, start_time, duration,
+                                   preferred_processor if self.selection == "affinity" else None, com_penalty, arrival)
+            if found is None:
+                # None left for good
+                found = self.first_up(lambda p: max(start_time if arrival is None else arrival.on(p), pool.times[p]))
+            return found
+        elif self.selection == "eft":
+            # Removed processors are out of the view, failed ones while they are down
+            candidates = [p for p in arrival.local if p < self.num_processors]
+            earliest = pool.earliest()
+            candidates += [earliest, pool.earliest(exclude=earliest)]
+            found = earliest_finish(candidates, arrival, pool.times,
+                                    fits=lambda p, start: failures.down_until(p, start) is None)
+            if found is None:
+                # Wait for the first candidate to come back
+                found = min(((p, failures.up_from(p, max(arrival.on(p), pool.times[p])))
+                             for p in candidates if p is not None), key=lambda c: (c[1], c[0]))
+                if found[1] == INF:
+                    found = self.first_up(lambda p: max(arrival.on(p), pool.times[p]))
+            return found
+        elif arrival is not None:
+            # Same as below, the penalty being the time the data needs to reach another core
+            if preferred_processor is not None and pool.times[preferred_processor] <= arrival.remote():
+                processor = preferred_processor
+            else:
+                processor = pool.first_idle(arrival.earliest())
+                if processor is None:
+                    processor = find_earliest_processor(pool)
+
+            start_time = max(arrival.on(processor), pool.times[processor])
+            if failures.down_until(processor, start_time) is not None:
+                failed_processor = processor
+                processor = pool.first_idle(start_time, exclude=failed_processor)
+                if processor is None:
+                    processor = find_earliest_processor(pool, failed_processor)
+                start_time = max(arrival.on(processor), pool.times[processor])
+                if failures.down_until(processor, start_time) is not None:
+                    processor, start_time = self.first_up(lambda p: max(arrival.on(p), pool.times[p]))
+        else:
+            # First try to allocate the next task to the same core
+            # then try to allocate an already used core
+            # finally allocate a never used core if there is one
+            if preferred_processor is not None and pool.times[preferred_processor] <= start_time + com_penalty:
+                processor = preferred_processor
             else:
-                available_processors = [p for p in range(len(processor_times)) if p != failed_processor]
-                processor = min(available_processors, key=lambda p: processor_times[p])
-
-        if preferred_processor is not None and processor != preferred_processor:
-            start_time += com_penalty  # Communication cost
-
-        start_time = max(start_time, processor_times[processor])
-        task = Task(node, graph.nodes[node]["duration"], start_time, processor)
-        schedule.append(task)
-        processor_times[processor] = task.end_time
-        min_processor_time = min(processor_times[p] for p in range(num_processors))
-        task_map[node] = task
-
-    schedule.sort(key=lambda t: t.start_time)
-    makespan = max(processor_times)
-    return schedule, makespan, saved_order, ub
+                processor = pool.first_idle(start_time)
+                if processor is None:
+                    processor = find_earliest_processor(pool)
+
+            start_time = max(start_time, pool.times[processor])
+            if failures.down_until(processor, start_time) is not None:
+                failed_processor = processor
+                processor = pool.first_idle(start_time, exclude=failed_processor)
+                if processor is None:
+                    processor = find_earliest_processor(pool, failed_processor)
+
+            if preferred_processor is not None and processor != preferred_processor:
+                start_time += com_penalty  # Communication cost
+
+            start_time = max(start_time, pool.times[processor])
+            if failures.down_until(processor, start_time) is not None:
+                ready_time = start_time
+                processor, start_time = self.first_up(lambda p: max(ready_time, pool.times[p]))
+        return processor, start_time
+
+    def first_up(self, earliest: Callable[[int], int]) -> tuple[int,int]:
+        """
+        Core the task can start on first, and when, earliest(p) being its start
+        on core p if p were up. Once every core is down for good, the removed
+        ones are left, like in find_earliest_processor.
+        """
+        found = min(((p, self.failures.up_from(p, earliest(p))) for p in range(self.num_processors)),
+                    key=lambda c: (c[1], c[0]))
+        if found[1] == INF:
+            removed = (p for p in self.pool.times if p >= self.num_processors)
+            found = min(((p, self.failures.up_from(p, earliest(p))) for p in removed),
+                        key=lambda c: (c[1], c[0]), default=found)
+        if found[1] == INF:
+            raise ValueError("Every core is down for good")
+        return found
+
+    def assign(self, processor: int, start: int, end: int):
+        self.pool.assign(processor, max(end, self.pool.times[processor]))
+        if self.gaps is not None:
+            self.gaps.occupy(processor, start, end)
+        self.min_processor_time = self.pool.min_time()
+
+
+def modified_critical_path(graph: TaskGraph, processors: MappingProxyType[int,int], data: Optional[dict[str,Any]],
+                           stats: Optional[SchedulerStats] = None, placement: str = "append",
+                           communication: Optional[CommunicationModel] = None, selection: str = "affinity",
+                           priority: str = "alap",
+                           failures: FailureTrace = DEFAULT_FAILURES) -> tuple[ScheduleResult,int,TasksOrder,int]:
+    """
+    placement="append" puts every task after the last task of its core,
+    "insertion" puts it in the earliest idle gap of a core that fits it.
+    With a communication model, a task starts once the data of all its
+    predecessors reached its core. selection picks the core among the
+    candidates, see selection.py, and priority orders the tasks, see
+    engine.py. No task starts on a core while the failure trace has it down
+    (see failures.reexecute for the tasks running when it fails).
+    """
+    return list_schedule(graph, VaryingCores(processors, placement, selection, failures), data, stats, communication,
+                         priority)
@@ -0,0 +1,95 @@
+from array import array
+from typing import Any, Iterator, Optional, Sequence
+
+import numpy as np
+
+from task_graph import TaskGraph
+
+
+class TaskView:
+    """Read-only, Task-like view on one row of a ScheduleResult."""
+
+    __slots__ = ("result", "row")
+
+    def __init__(self, result: "ScheduleResult", row: int):
+        self.result = result
+        self.row = row
+
+    @property
+    def id(self) -> Any:
+        return self.result.ids[int(self.result.task[self.row])]
+
+    @property
+    def duration(self) -> int:
+        return int(self.result.duration[self.row])
+
+    @property
+    def start_time(self) -> int:
+        return int(self.result.start[self.row])
+
+    @property
+    def end_time(self) -> int:
+        return int(self.result.end[self.row])
+
+    @property
+    def processor(self) -> int:
+        return int(self.result.processor[self.row])
+
+    def __repr__(self) -> str:
+        return f"Task(id={self.id!r}, start_time={self.start_time}, duration={self.duration}, processor={self.processor})"
+
+
+class ScheduleResult:
+    """
+    Schedule stored as parallel arrays (task index, start, end, processor),
+    one row per task sorted by start time. Iterating yields TaskView rows, so
+    it can be used where a list of Task objects was expected.
+    """
+
+    def __init__(self, ids: Sequence[Any], task: np.ndarray, start: np.ndarray, duration: np.ndarray,
+                 processor: np.ndarray):
+        self.ids = ids
+        self.task = task
+        self.start = start
+        self.duration = duration
+        self.end = start + duration
+        self.processor = processor
+
+    @classmethod
+    def from_rows(cls, graph: TaskGraph, tasks: array, starts: array, processors: array) -> "ScheduleResult":
+        """Build from rows recorded in scheduling order, ties on start time keep that order."""
+        task = np.frombuffer(tasks, dtype=np.int64)
+        start = np.frombuffer(starts, dtype=np.int64)
+        order = np.argsort(start, kind="stable")
+        task = task[order]
+        return cls(graph.ids, task, start[order], graph.duration[task],
+                   np.frombuffer(processors, dtype=np.int64)[order])
+
+    def __len__(self) -> int:
+        return len(self.task)
+
+    def __getitem__(self, row: int) -> TaskView:
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        return TaskView(self, row)
+
+    def __iter__(self) -> Iterator[TaskView]:
+        return (TaskView(self, row) for row in range(len(self)))
+
+    def per_core(self, num_cores: Optional[int] = None) -> dict[str, list[dict[str, Any]]]:
+        """Tasks of each core in start order, in the format written to output_data"""
+        num_cores = max(num_cores or 0, int(self.processor.max(initial=-1)) + 1)
+        by_core = np.argsort(self.processor, kind="stable")
+        bounds = np.searchsorted(self.processor[by_core], np.arange(num_cores + 1)).tolist()
+
+        ids = self.ids
+        tasks = self.task[by_core].tolist()
+        starts = self.start[by_core].tolist()
+        durations = self.duration[by_core].tolist()
+        return {
+            f"core_{core}": [{"task": ids[t], "start_time": s, "duration": d}
+                             for t, s, d in zip(tasks[a:b], starts[a:b], durations[a:b])]
+            for core, (a, b) in enumerate(zip(bounds, bounds[1:]))
+        }
@@ -0,0 +1,45 @@
+"""
+Processor selection strategies of the schedulers.
+
+"affinity" (the default) keeps a task on the core of its first placed
+predecessor when that core is free early enough, and otherwise takes the
+first idle core. "eft" looks at the core of every placed predecessor and at
+the earliest free core of every eligible view, and takes the one the task
+finishes first on. The cores run at the same speed, so that is the earliest
+start, ties going to the lowest candidate core id. With an Arrival of the task's
+inputs this is O(in-degree + log P) per task.
+"""
+from typing import Callable, Iterable, Optional
+
+from communication import Arrival, CommunicationModel
+
+SELECTIONS = ("affinity", "eft")
+
+
+def check_selection(selection: str):
+    if selection not in SELECTIONS:
+        raise ValueError(f"Unknown selection {selection!r}, expected one of {SELECTIONS}")
+
+
+def penalty_model(com_penalty: int) -> CommunicationModel:
+    """The fixed penalty as a communication model: any transfer between two cores takes com_penalty."""
+    return CommunicationModel([[None]], [[com_penalty]])
+
+
+def earliest_finish(candidates: Iterable[Optional[int]], arrival: Arrival, times: dict[int,int], not_before: int = 0,
+                    fits: Optional[Callable[[int,int], bool]] = None) -> Optional[tuple[int,int]]:
+    """
+    Processor and start time of the earliest start among the candidates
+    (None ones are skipped), the task waiting for its inputs and for the
+    processor. fits(processor, start) rules out a placement.
+    """
+    best: Optional[tuple[int,int]] = None
+    for processor in candidates:
+        if processor is None:
+            continue
+        start = max(not_before, arrival.on(processor), times[processor])
+        if fits is not None and not fits(processor, start):
+            continue
+        if best is None or (start, processor) < (best[1], best[0]):
+            best = processor, start
+    return best
@@ -0,0 +1,300 @@
+"""
+Long-running HTTP/JSON front-end to the schedulers.
+
+Graphs are registered once and scheduled many times; every request body and
+response is JSON:
+
+    POST /graphs    {"path": "input_data/g.json"}, or a task graph itself
+                    ({"tasks": [...]}) -> {"graph": digest, "tasks": n}
+    POST /schedule  {"graph": digest, "nodes": 4, ...} -> the result of
+                    batch.run_config: {"config", "makespan", "schedule"}.
+                    "path" may replace "graph", the rest is a batch
+                    configuration; "schedule": false leaves the schedule out
+    GET  /metrics   request counts and latencies per route, coalesced and
+                    rejected requests, computations in flight
+
+Parsing and scheduling run on a process pool, the event loop only moves
+bytes. A registered graph is written to the spool directory in the binary
+format (graph_format.py) with its binding (binding_cache.py), under its
+digest; each worker keeps the graphs it used in a GraphCache, so a graph is
+mapped at most once per worker and a schedule request only sends its
+configuration.
+
+Identical requests in flight (same graph digest and configuration, or same
+graph file or body) share one computation. Past max_pending distinct
+computations, requests are turned down with 503 and a Retry-After header
+instead of queueing without bound.
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import os
+import signal
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from typing import Any, Callable, Hashable, Optional
+
+from batch import run_config
+from binding_cache import BindingCache, LocalStore
+from graph_cache import CachedGraph, GraphCache
+from graph_format import EXTENSION, load_graph, load_task_graph, save_task_graph
+from graph_stream import stream_task_graph
+from task_graph import TaskGraph, graph_digest
+
+MAX_BODY = 1 << 30
+LATENCY_WINDOW = 1024
+
+logger = logging.getLogger(__name__)
+
+# Graphs of this worker process, by digest
+_graphs = GraphCache()
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+ROUTES = {"/graphs": "POST", "/schedule": "POST", "/metrics": "GET"}
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+           500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+def _spooled(spool: str, digest: str) -> str:
+    return os.path.join(spool, digest + EXTENSION)
+
+
+def _resident(spool: str, digest: str) -> CachedGraph:
+    entry = _graphs.get(digest)
+    if entry is None:
+        start = perf_counter()
+        graph = load_task_graph(_spooled(spool, digest))
+        binding = BindingCache(LocalStore(os.path.join(spool, "bindings"))).binding(graph)
+        entry = _graphs.put(digest, graph, binding, perf_counter() - start)
+    return entry
+
+
+def _register(spool: str, graph: TaskGraph, load_time: float) -> dict[str,Any]:
+    digest = graph_digest(graph)
+    path = _spooled(spool, digest)
+    if not os.path.exists(path):
+        save_task_graph(graph, path)
+    binding = BindingCache(LocalStore(os.path.join(spool, "bindings"))).binding(graph)
+    _graphs.put(digest, graph, binding, load_time)
+    return {"graph": digest, "tasks": graph.num_tasks}
+
+
+def register_file(spool: str, path: str) -> dict[str,Any]:
+    start = perf_counter()
+    return _register(spool, load_graph(path), perf_counter() - start)
+
+
+def register_body(spool: str, body: bytes) -> dict[str,Any]:
+    start = perf_counter()
+    return _register(spool, stream_task_graph(io.BytesIO(body)), perf_counter() - start)
+
+
+def schedule_job(spool: str, digest: str, config: dict[str,Any], include_schedule: bool) -> bytes:
+    """Encoded result of batch.run_config, encoded in the worker so that the event loop does not have to."""
+    entry = _resident(spool, digest)
+    result = run_config(entry.graph, {"order": entry.order, "ub": entry.ub}, config, include_schedule)
+    return json.dumps(result).encode("utf-8")
+
+
+class LatencyWindow:
+    """Request count and latency percentiles over the last LATENCY_WINDOW requests of a route."""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.recent: deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def record(self, seconds: float, error: bool = False):
+        self.count += 1
+        self.errors += error
+        self.recent.append(seconds)
+
+    def as_dict(self) -> dict[str,Any]:
+        out: dict[str,Any] = {"count": self.count, "errors": self.errors}
+        if self.recent:
+            latencies = sorted(self.recent)
+            out["mean_ms"] = 1000 * sum(latencies) / len(latencies)
+            for q in (50, 90, 99):
+                out[f"p{q}_ms"] = 1000 * latencies[min(len(latencies) * q // 100, len(latencies) - 1)]
+            out["max_ms"] = 1000 * latencies[-1]
+        return out
+
+
+class ScheduleService:
+    """Routes of the module docstring, computations running on a pool of workers processes."""
+
+    def __init__(self, spool: str = ".service", workers: Optional[int] = None, max_pending: Optional[int] = None):
+        os.makedirs(spool, exist_ok=True)
+        self.spool = spool
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(self.workers)
+        self.max_pending = 4 * self.workers if max_pending is None else max_pending
+        self.inflight: dict[Hashable, asyncio.Future] = {}
+        # (absolute path, mtime, size) -> registration of the graph files
+        self.files: dict[tuple[str,int,int], dict[str,Any]] = {}
+        self.latency: dict[str, LatencyWindow] = {}
+        self.coalesced = 0
+        self.rejected = 0
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+    async def _shared(self, key: Hashable, job: Callable[..., Any], *args: Any) -> Any:
+        """Result of job(*args) run on the pool, or of the identical computation already in flight."""
+        future = self.inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            if len(self.inflight) >= self.max_pending:
+                self.rejected += 1
+                raise HttpError(503, f"{len(self.inflight)} computations in flight, try again later")
+            future = asyncio.get_running_loop().run_in_executor(self.pool, job, *args)
+            self.inflight[key] = future
+            future.add_done_callback(lambda _: self.inflight.pop(key, None))
+        # A client going away must not cancel the computation for the others
+        return await asyncio.shield(future)
+
+    async def register(self, request: dict[str,Any], body: bytes) -> dict[str,Any]:
+        if "tasks" in request:
+            key = ("body", hashlib.blake2b(body, digest_size=20).digest())
+            return await self._shared(key, register_body, self.spool, body)
+
+        path = os.path.abspath(request["path"])
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            raise HttpError(404, f"No graph file {request['path']!r}") from e
+        version = (path, stat.st_mtime_ns, stat.st_size)
+        registered = self.files.get(version)
+        if registered is None or not os.path.exists(_spooled(self.spool, registered["graph"])):
+            registered = await self._shared(("file",) + version, register_file, self.spool, path)
+            self.files[version] = registered
+        return registered
+
+    async def schedule(self, request: dict[str,Any]) -> bytes:
+        config = dict(request)
+        if "path" in config:
+            digest = (await self.register({"path": config.pop("path")}, b""))["graph"]
+        else:
+            digest = config.pop("graph", None)
+            if not isinstance(digest, str) or not os.path.exists(_spooled(self.spool, digest)):
+                raise HttpError(404, f"Unknown graph {digest!r}, register it with POST /graphs")
+        include_schedule = bool(config.pop("schedule", True))
+        key = ("schedule", digest, json.dumps(config, sort_keys=True), include_schedule)
+        return await self._shared(key, schedule_job, self.spool, digest, config, include_schedule)
+
+    def metrics(self) -> dict[str,Any]:
+        return {"routes": {route: window.as_dict() for route, window in self.latency.items()},
+                "coalesced": self.coalesced, "rejected": self.rejected, "in_flight": len(self.inflight),
+                "max_pending": self.max_pending, "workers": self.workers}
+
+    async def dispatch(self, method: str, path: str, body: bytes) -> bytes:
+        if path not in ROUTES:
+            raise HttpError(404, f"No route {path}")
+        if method != ROUTES[path]:
+            raise HttpError(405, f"{path} expects {ROUTES[path]}")
+        if path == "/graphs":
+            result = await self.register(_json_body(body), body)
+        elif path == "/schedule":
+            result = await self.schedule(_json_body(body))
+        else:
+            result = self.metrics()
+        return result if isinstance(result, bytes) else json.dumps(result).encode("utf-8")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """One HTTP/1.1 connection, kept alive until the client closes it or asks to."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+                start = perf_counter()
+                method, target, version = line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                path = target.split("?", 1)[0]
+                length = int(headers.get("content-length", 0))
+
+                status, extra = 200, {}
+                try:
+                    if length > MAX_BODY:
+                        raise HttpError(413, f"Body over {MAX_BODY} bytes")
+                    body = await reader.readexactly(length) if length else b""
+                    payload = await self.dispatch(method, path, body)
+                except HttpError as e:
+                    status, payload = e.status, json.dumps({"error": str(e)}).encode("utf-8")
+                    if status == 503:
+                        extra["Retry-After"] = "1"
+                except (ValueError, KeyError, TypeError) as e:
+                    status, payload = 400, json.dumps({"error": f"{type(e).__name__}: {e}"}).encode("utf-8")
+                except Exception as e:
+                    logger.exception(f"{method} {path} failed")
+                    status, payload = 500, json.dumps({"error": f"{type(e).__name__}: {e}"}).encode("utf-8")
+
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                elapsed = perf_counter() - start
+                self.latency.setdefault(path if path in ROUTES else "other", LatencyWindow()).record(elapsed, status >= 400)
+                head = [f"HTTP/1.1 {status} {REASONS[status]}", "Content-Type: application/json",
+                        f"Content-Length: {len(payload)}", f"X-Latency-Ms: {1000 * elapsed:.3f}",
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                head += [f"{name}: {value}" for name, value in extra.items()]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + payload)
+                await writer.drain()
+                if not keep_alive or status == 413:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            # Client gone, or not speaking HTTP
+            pass
+        finally:
+            writer.close()
+
+
+def _json_body(body: bytes) -> dict[str,Any]:
+    request = json.loads(body or b"{}")
+    if not isinstance(request, dict):
+        raise ValueError("The request body must be a JSON object")
+    return request
+
+
+async def serve(service: ScheduleService, host: str, port: int):
+    """Serve until SIGINT or SIGTERM, then shut the worker processes down."""
+    server = await asyncio.start_server(service.handle, host, port)
+    logger.info(f"Serving on {', '.join(str(sock.getsockname()) for sock in server.sockets)}")
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopped.set)
+    try:
+        async with server:
+            await stopped.wait()
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the schedulers over HTTP, see the module docstring.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("-j", "--workers", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--max-pending", type=int, default=None,
+                        help="distinct computations in flight before turning requests down (default: 4 per worker)")
+    parser.add_argument("--spool", default=".service", help="directory of the registered graphs and their bindings")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(serve(ScheduleService(args.spool, args.workers, args.max_pending), args.host, args.port))
@@ -0,0 +1,362 @@
+"""
+Object storage of the Lambda handlers: an S3 bucket, or a local directory
+standing in for it so that the whole handler path runs, and can be
+benchmarked, offline. With SCHEDULER_STORAGE set to a directory, bucket b is
+its subdirectory b and an object key a path below it:
+
+    SCHEDULER_STORAGE=/data/buckets python main.py event.json
+
+SCHEDULER_S3_ENDPOINT points the S3 client at an S3 compatible server
+instead (MinIO, moto, LocalStack...).
+
+Objects of at least RANGED_MIN_SIZE bytes are read with concurrent byte-range
+requests into a buffer allocated once (RangedReader), the reader of the
+stream only waiting for the part it reaches, so a graph is parsed while its
+end is still downloading. Smaller objects take a single GET. Given the
+ETag of the object (from head), every request is for that version only
+(If-Match), so an object overwritten during a read fails it instead of
+mixing parts of both versions.
+
+Objects whose key ends in ``.zst`` (zstandard, needs the zstandard package)
+or ``.gz`` (gzip) are compressed: graphs are decompressed while they are
+parsed, schedules are compressed the way their output key says, and bindings
+are compressed under their own key (PrefixStore).
+
+The S3 client is shared by the whole process, with a connection pool sized
+for the background uploads (Uploads), which run the puts of one invocation
+(e.g. the schedule and the binding) at the same time.
+"""
+import gzip
+import io
+import json
+import os
+import shutil
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import IO, Any, NamedTuple, Optional, Protocol
+
+STORAGE_VARIABLE = "SCHEDULER_STORAGE"
+ENDPOINT_VARIABLE = "SCHEDULER_S3_ENDPOINT"
+POOL_SIZE = 16
+PART_SIZE = 8 << 20
+RANGED_MIN_SIZE = 2 * PART_SIZE
+RANGE_WORKERS = 8
+CODECS = {".zst": "zstd", ".gz": "gzip"}
+SUFFIXES = {codec: suffix for suffix, codec in CODECS.items()}
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+class ObjectHead(NamedTuple):
+    # Version tag (S3 ETag), changing whenever the object is written
+    etag: str
+    size: int
+
+
+class Storage(Protocol):
+    """A bucket: bytes under string keys."""
+
+    def head(self, key: str) -> ObjectHead:
+        """Raises if there is no such object."""
+
+    def open(self, key: str, etag: Optional[str] = None) -> IO[bytes]:
+        """Binary stream of the object, as stored; raises if it is not the version etag (when given)."""
+
+    def read_into(self, key: str, offset: int, buffer: memoryview, etag: Optional[str] = None):
+        """Fill buffer with the bytes of the object from offset on, same etag check."""
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Content of the object, None if there is none."""
+
+    def put(self, key: str, data: bytes):
+        ...
+
+    def delete(self, key: str):
+        ...
+
+    def download(self, key: str, path: str):
+        """Copy the object to a local file."""
+
+
+@lru_cache(maxsize=None)
+def s3_client() -> Any:
+    import boto3
+    from botocore.config import Config
+
+    config = Config(max_pool_connections=POOL_SIZE, tcp_keepalive=True, retries={"mode": "adaptive", "max_attempts": 5})
+    return boto3.client("s3", endpoint_url=os.environ.get(ENDPOINT_VARIABLE) or None, config=config)
+
+
+def _fill(stream: IO[bytes], buffer: memoryview, what: str):
+    filled = 0
+    while filled < len(buffer):
+        n = stream.readinto(buffer[filled:])
+        if not n:
+            raise IOError(f"{what}: got {filled} of {len(buffer)} bytes")
+        filled += n
+
+
+def _if_match(etag: Optional[str]) -> dict[str, str]:
+    return {"IfMatch": etag} if etag is not None else {}
+
+
+class S3Storage:
+    def __init__(self, bucket: str, client: Any = None):
+        self.bucket = bucket
+        self.client = s3_client() if client is None else client
+
+    def head(self, key: str) -> ObjectHead:
+        response = self.client.head_object(Bucket=self.bucket, Key=key)
+        return ObjectHead(response["ETag"], response["ContentLength"])
+
+    def open(self, key: str, etag: Optional[str] = None) -> IO[bytes]:
+        return self.client.get_object(Bucket=self.bucket, Key=key, **_if_match(etag))["Body"]
+
+    def read_into(self, key: str, offset: int, buffer: memoryview, etag: Optional[str] = None):
+        byte_range = f"bytes={offset}-{offset + len(buffer) - 1}"
+        with self.client.get_object(Bucket=self.bucket, Key=key, Range=byte_range, **_if_match(etag))["Body"] as body:
+            _fill(body, buffer, f"{key} {byte_range}")
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self.open(key).read()
+        except self.client.exceptions.NoSuchKey:
+            return None
+
+    def put(self, key: str, data: bytes):
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data)
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def download(self, key: str, path: str):
+        self.client.download_file(self.bucket, key, path)
+
+
+class FileStorage:
+    """A directory standing in for a bucket, the keys being paths below it."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, *key.split("/"))
+
+    @staticmethod
+    def _head(stat: os.stat_result) -> ObjectHead:
+        return ObjectHead(f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"', stat.st_size)
+
+    def head(self, key: str) -> ObjectHead:
+        return self._head(os.stat(self.path(key)))
+
+    def open(self, key: str, etag: Optional[str] = None) -> IO[bytes]:
+        f = open(self.path(key), "rb")
+        if etag is not None:
+            found = self._head(os.fstat(f.fileno())).etag
+            if found != etag:
+                f.close()
+                raise IOError(f"{key}: version {found} instead of {etag}")
+        return f
+
+    def read_into(self, key: str, offset: int, buffer: memoryview, etag: Optional[str] = None):
+        with self.open(key, etag) as f:
+            f.seek(offset)
+            _fill(f, buffer, f"{key} at {offset}")
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with self.open(key) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, data: bytes):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Readers never see a partial object
+        tmp_path = f"{path}.{os.getpid()}.{id(data):x}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def delete(self, key: str):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def download(self, key: str, path: str):
+        shutil.copyfile(self.path(key), path)
+
+
+def storage_for(bucket: str) -> Storage:
+    """The bucket, or its directory under SCHEDULER_STORAGE when that is set."""
+    root = os.environ.get(STORAGE_VARIABLE)
+    if root:
+        return FileStorage(os.path.join(root, bucket))
+    return S3Storage(bucket)
+
+
+def codec_of(key: str) -> Optional[str]:
+    return CODECS.get(os.path.splitext(key)[1])
+
+
+def _zstandard() -> Any:
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("zstd compressed objects (.zst) need the zstandard package") from e
+    return zstandard
+
+
+def compress(data: bytes, codec: Optional[str]) -> bytes:
+    if codec == "gzip":
+        return gzip.compress(data, GZIP_LEVEL, mtime=0)
+    if codec == "zstd":
+        return _zstandard().ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return data
+
+
+def decompress(data: bytes, codec: Optional[str]) -> bytes:
+    if codec == "gzip":
+        return gzip.decompress(data)
+    if codec == "zstd":
+        return _zstandard().ZstdDecompressor().decompress(data)
+    return data
+
+
+def decompressed(stream: IO[bytes], codec: Optional[str]) -> IO[bytes]:
+    """Stream of the decompressed content, decompressed as it is read."""
+    if codec == "gzip":
+        return gzip.GzipFile(fileobj=stream, mode="rb")
+    if codec == "zstd":
+        return _zstandard().ZstdDecompressor().stream_reader(stream)
+    return stream
+
+
+def plain_key(key: str) -> str:
+    """Key without its compression suffix."""
+    return os.path.splitext(key)[0] if codec_of(key) else key
+
+
+class RangedReader(io.RawIOBase):
+    """
+    Stream of an object of the given size, downloaded part by part with
+    concurrent byte-range requests into one preallocated buffer; a read
+    waits for its part only, and stops at the end of it. With an etag,
+    every part comes from that version of the object.
+    """
+
+    def __init__(self, storage: Storage, key: str, size: int, part_size: int = PART_SIZE,
+                 workers: int = RANGE_WORKERS, etag: Optional[str] = None):
+        super().__init__()
+        self.buffer = memoryview(bytearray(size))
+        self.part_size = part_size
+        self.pos = 0
+        # The parts are requested in order, the first ones complete first
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="range")
+        self.parts = [self._executor.submit(storage.read_into, key, start, self.buffer[start:start + part_size], etag)
+                      for start in range(0, size, part_size)]
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b: Any) -> int:
+        if self.pos >= len(self.buffer):
+            return 0
+        k = self.pos // self.part_size
+        # Raises the error of the part, if any
+        self.parts[k].result()
+        end = min(self.pos + len(b), (k + 1) * self.part_size, len(self.buffer))
+        n = end - self.pos
+        memoryview(b).cast("B")[:n] = self.buffer[self.pos:end]
+        self.pos = end
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        super().close()
+
+
+def open_object(storage: Storage, key: str, size: Optional[int] = None, part_size: int = PART_SIZE,
+                etag: Optional[str] = None) -> IO[bytes]:
+    """
+    Decompressed stream of the object (of version etag if given), downloaded
+    by ranges when its size is known and large enough.
+    """
+    if size is not None and size >= max(RANGED_MIN_SIZE, 2 * part_size):
+        stream: IO[bytes] = RangedReader(storage, key, size, part_size, etag=etag)
+    else:
+        stream = storage.open(key, etag)
+    return decompressed(stream, codec_of(key))
+
+
+def download_object(storage: Storage, key: str, path: str, size: Optional[int] = None, etag: Optional[str] = None):
+    """
+    Copy the object (of version etag if given) to a local file, decompressed.
+    The download of the storage (S3 multipart download) cannot check the
+    version, objects of a known version go through open_object.
+    """
+    if codec_of(key) is None and etag is None:
+        storage.download(key, path)
+        return
+    with open_object(storage, key, size, etag=etag) as body, open(path, "wb") as f:
+        shutil.copyfileobj(body, f, 1 << 20)
+
+
+def encode_json(obj: Any, key: str) -> bytes:
+    """JSON of obj, compressed the way the key says."""
+    return compress(json.dumps(obj).encode("utf-8"), codec_of(key))
+
+
+@lru_cache(maxsize=None)
+def _upload_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(POOL_SIZE, thread_name_prefix="upload")
+
+
+class Uploads:
+    """Puts running in the background, waited for together."""
+
+    def __init__(self):
+        self.pending: list[Future] = []
+
+    def put(self, storage: Storage, key: str, data: bytes):
+        self.pending.append(_upload_executor().submit(storage.put, key, data))
+
+    def wait(self):
+        """Wait for every put, raising the first error."""
+        pending, self.pending = self.pending, []
+        for future in pending:
+            future.result()
+
+
+class PrefixStore:
+    """
+    Entries (e.g. the bindings of binding_cache.py) stored under a prefix of
+    a storage, compressed with codec, their puts running on uploads if given.
+    """
+
+    def __init__(self, storage: Storage, prefix: str = "bindings/", codec: Optional[str] = None,
+                 uploads: Optional[Uploads] = None):
+        self.storage = storage
+        self.prefix = prefix
+        self.codec = codec
+        self.uploads = uploads
+
+    def key(self, key: str) -> str:
+        return self.prefix + key + (SUFFIXES[self.codec] if self.codec else "")
+
+    def get(self, key: str) -> Optional[bytes]:
+        data = self.storage.get(self.key(key))
+        return None if data is None else decompress(data, self.codec)
+
+    def put(self, key: str, data: bytes):
+        data = compress(data, self.codec)
+        if self.uploads is not None:
+            self.uploads.put(self.storage, self.key(key), data)
+        else:
+            self.storage.put(self.key(key), data)
+
+    def delete(self, key: str):
+        self.storage.delete(self.key(key))
@@ -0,0 +1,220 @@
+"""
+Parallel benchmark sweeps over a declarative grid.
+
+A grid is a JSON friendly dict, every combination of its lists is one job:
+
+    {
+        "sizes": [[1000, 7], [2000, 9]],      (num_tasks, max_dependencies) pairs
+        "seeds": [42],
+        "shapes": ["random"],
+        "configs": [{"name": "4 cores", "nodes": 4}, ...],   see batch.py
+        "cached_binding": [false, true],
+        "repeats": 1
+    }
+
+Jobs run in separate processes, at most max_workers at a time, and a job
+running longer than the timeout is killed. Every finished job appends one
+row to a CSV results table; running the same grid again only runs the jobs
+that have no successful row yet.
+"""
+import argparse
+import csv
+import json
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from multiprocessing.connection import wait
+from timeit import default_timer as timer
+from typing import Any, NamedTuple, Optional
+
+from batch import Config, scheduler_for
+from binding_cache import BindingCache, LocalStore
+from graph import find_critical_path
+from graph_format import load_graph
+from graph_generator import graph_file_name, save_graph_to_json
+from timing import alap_order
+
+COLUMNS = ["job", "num_tasks", "max_dependencies", "seed", "shape", "config", "cached_binding", "repeat",
+           "status", "num_edges", "load_time", "binding_time", "schedule_time", "total_time",
+           "makespan", "critical_path_length", "error"]
+BINDINGS_DIR = "bindings"
+
+
+class Job(NamedTuple):
+    num_tasks: int
+    max_dependencies: int
+    seed: int
+    shape: str
+    config: Config
+    cached_binding: bool
+    repeat: int
+
+    @property
+    def config_name(self) -> str:
+        return self.config.get("name") or json.dumps(self.config, sort_keys=True)
+
+    @property
+    def graph_path(self) -> str:
+        return graph_file_name(self.num_tasks, self.max_dependencies, self.seed, self.shape)
+
+    @property
+    def key(self) -> str:
+        binding = "cached" if self.cached_binding else "cold"
+        return (f"{self.num_tasks}_{self.max_dependencies}_seed_{self.seed}_{self.shape}"
+                f"|{self.config_name}|{binding}|{self.repeat}")
+
+
+def expand_grid(grid: dict[str,Any]) -> list[Job]:
+    return [
+        Job(num_tasks, max_dependencies, seed, shape, config, cached, repeat)
+        for (num_tasks, max_dependencies), seed, shape, config, cached, repeat in product(
+            grid["sizes"], grid.get("seeds", [42]), grid.get("shapes", ["random"]), grid["configs"],
+            grid.get("cached_binding", [True]), range(grid.get("repeats", 1)))
+    ]
+
+
+def read_results(path: str) -> dict[str,dict[str,str]]:
+    """Last row of every job of a results table."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", newline="") as infile:
+        return {row["job"]: row for row in csv.DictReader(infile)}
+
+
+def prepare_graph(num_tasks: int, max_dependencies: int, seed: int, shape: str, warm_binding: bool) -> str:
+    """Generate the graph file if needed, and store its binding for the cached_binding jobs."""
+    path = graph_file_name(num_tasks, max_dependencies, seed, shape)
+    if not os.path.exists(path):
+        save_graph_to_json(num_tasks, max_dependencies, seed, shape)
+    if warm_binding:
+        BindingCache(LocalStore(BINDINGS_DIR)).binding(load_graph(path))
+    return path
+
+
+def run_job(job: Job) -> dict[str,Any]:
+    """Time the loading, the binding and the scheduling of one job."""
+    start = timer()
+    G = load_graph(job.graph_path)
+    loaded = timer()
+    if job.cached_binding:
+        data = BindingCache(LocalStore(BINDINGS_DIR)).binding(G)
+    else:
+        order, ub = alap_order(G)
+        data = {"order": order, "ub": ub}
+    bound = timer()
+    _, makespan = scheduler_for(job.config)(G, data)
+    end = timer()
+    _, critical_path_length = find_critical_path(G)
+
+    return {
+        "status": "ok",
+        "num_edges": G.number_of_edges(),
+        "load_time": loaded - start,
+        "binding_time": bound - loaded,
+        "schedule_time": end - bound,
+        "total_time": end - start,
+        "makespan": makespan,
+        "critical_path_length": critical_path_length,
+    }
+
+
+def _job_main(job: Job, conn: Any):
+    try:
+        row = run_job(job)
+    except Exception as e:
+        row = {"status": "error", "error": repr(e)}
+    conn.send(row)
+    conn.close()
+
+
+def _row(job: Job, result: dict[str,Any]) -> dict[str,Any]:
+    return {"job": job.key, "num_tasks": job.num_tasks, "max_dependencies": job.max_dependencies,
+            "seed": job.seed, "shape": job.shape, "config": job.config_name,
+            "cached_binding": job.cached_binding, "repeat": job.repeat, **result}
+
+
+def run_sweep(grid: dict[str,Any], results_path: str, max_workers: Optional[int] = None,
+              timeout: Optional[float] = None) -> list[dict[str,str]]:
+    """
+    Run the jobs of the grid that have no successful row in results_path yet,
+    and return the rows of every job of the grid, in grid order.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    jobs = expand_grid(grid)
+    previous = read_results(results_path)
+    pending = [job for job in jobs if previous.get(job.key, {}).get("status") != "ok"]
+
+    graphs: dict[tuple,bool] = {}
+    for job in pending:
+        graph = (job.num_tasks, job.max_dependencies, job.seed, job.shape)
+        graphs[graph] = graphs.get(graph, False) or job.cached_binding
+    if graphs:
+        with ProcessPoolExecutor(min(max_workers, len(graphs))) as executor:
+            futures = [executor.submit(prepare_graph, *graph, warm) for graph, warm in graphs.items()]
+            for future in futures:
+                future.result()
+
+    new_file = not os.path.exists(results_path)
+    with open(results_path, "a", newline="") as outfile:
+        writer = csv.DictWriter(outfile, COLUMNS)
+        if new_file:
+            writer.writeheader()
+
+        def record(job: Job, result: dict[str,Any]):
+            writer.writerow(_row(job, result))
+            outfile.flush()
+            print(f"[{result['status']}] {job.key}")
+
+        queue = list(reversed(pending))
+        running: dict[Any, tuple[Job, mp.Process, float]] = {}
+        while queue or running:
+            while queue and len(running) < max_workers:
+                job = queue.pop()
+                recv_conn, send_conn = mp.Pipe(duplex=False)
+                process = mp.Process(target=_job_main, args=(job, send_conn), daemon=True)
+                process.start()
+                send_conn.close()
+                running[recv_conn] = (job, process, timer())
+
+            wait_time = None
+            if timeout is not None:
+                now = timer()
+                wait_time = max(0.0, min(started + timeout - now for _, _, started in running.values()))
+            for conn in wait(list(running), wait_time):
+                job, process, _ = running.pop(conn)
+                try:
+                    result = conn.recv()
+                except EOFError:
+                    process.join()
+                    result = {"status": "crashed", "error": f"exit code {process.exitcode}"}
+                conn.close()
+                process.join()
+                record(job, result)
+
+            if timeout is not None:
+                now = timer()
+                for conn, (job, process, started) in list(running.items()):
+                    if now - started >= timeout:
+                        process.terminate()
+                        process.join()
+                        conn.close()
+                        del running[conn]
+                        record(job, {"status": "timeout", "error": f"killed after {timeout}s"})
+
+    results = read_results(results_path)
+    return [results[job.key] for job in jobs if job.key in results]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a benchmark grid across a pool of processes.")
+    parser.add_argument("grid", help="JSON file describing the grid")
+    parser.add_argument("-o", "--output", default="output_data/sweep.csv", help="results table (CSV), resumed if it exists")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="number of parallel jobs (default: CPU count)")
+    parser.add_argument("--timeout", type=float, default=None, help="per-job timeout in seconds")
+    args = parser.parse_args()
+
+    with open(args.grid, "r") as infile:
+        grid = json.load(infile)
+    rows = run_sweep(grid, args.output, args.workers, args.timeout)
+    print(f"{sum(row['status'] == 'ok' for row in rows)}/{len(rows)} jobs done, results in {args.output}")
@@ -0,0 +1,311 @@
+import hashlib
+import numbers
+import operator
+from array import array
+from functools import cached_property
+from typing import Any, Iterable, Sequence
+
+import numpy as np
+
+
+class TaskGraph:
+    """
+    Compact, array-backed task DAG.
+
+    Task ids are remapped to contiguous integers ``0..n-1`` in order of first
+    appearance (same order networkx would use for ``graph.nodes``); ``ids[i]``
+    gives back the original id. Dependencies are stored twice in CSR form so
+    that both predecessors and successors of a task are a slice of an array.
+    ``pred_data``, when the tasks declare it, is the amount of data sent along
+    each dependency, aligned with ``pred_idx``.
+
+    Durations, memories and data sizes are integers (int64 columns), as are
+    all the times of the schedulers: unlike networkx, which stored any value,
+    a fractional duration is rejected with a ValueError when the graph is
+    built. Inputs in fractions of a unit must be scaled to a finer one first.
+    """
+
+    def __init__(self, ids: Sequence[Any], duration: np.ndarray, memory: np.ndarray,
+                 pred_ptr: np.ndarray, pred_idx: np.ndarray,
+                 succ_ptr: np.ndarray | None = None, succ_idx: np.ndarray | None = None,
+                 pred_data: np.ndarray | None = None):
+        self.ids = ids
+        self.duration = duration
+        self.memory = memory
+        self.pred_ptr = pred_ptr
+        self.pred_idx = pred_idx
+        self.pred_data = pred_data
+
+        if succ_ptr is None or succ_idx is None:
+            succ_ptr, succ_idx = _transpose(len(duration), pred_ptr, pred_idx)
+        self.succ_ptr = succ_ptr
+        self.succ_idx = succ_idx
+
+    @classmethod
+    def from_tasks(cls, tasks: Iterable[dict[str, Any]]) -> "TaskGraph":
+        builder = TaskGraphBuilder()
+        for task in tasks:
+            builder.add_task(task["id"], task["duration"], task["memory"], task["dependencies"])
+        return builder.build()
+
+    @classmethod
+    def from_networkx(cls, graph: Any) -> "TaskGraph":
+        builder = TaskGraphBuilder()
+        for node, attrs in graph.nodes(data=True):
+            dependencies = [pred if data is None else {"id": pred, "data": data}
+                            for pred, _, data in graph.in_edges(node, data="data")]
+            builder.add_task(node, attrs["duration"], attrs.get("memory", 0), dependencies)
+        return builder.build()
+
+    def to_networkx(self) -> Any:
+        import networkx as nx
+
+        G = nx.DiGraph()
+        ids = self.ids
+        for i, (duration, memory) in enumerate(zip(self.duration.tolist(), self.memory.tolist())):
+            G.add_node(ids[i], duration=duration, memory=memory)
+        dst = np.repeat(np.arange(self.num_tasks), np.diff(self.pred_ptr))
+        if self.pred_data is None:
+            G.add_edges_from((ids[u], ids[v]) for u, v in zip(self.pred_idx.tolist(), dst.tolist()))
+        else:
+            G.add_edges_from((ids[u], ids[v], {"data": data})
+                             for u, v, data in zip(self.pred_idx.tolist(), dst.tolist(), self.pred_data.tolist()))
+        return G
+
+    @cached_property
+    def index(self) -> dict[Any, int]:
+        return {node: i for i, node in enumerate(self.ids)}
+
+    @cached_property
+    def succ_data(self) -> np.ndarray | None:
+        """pred_data aligned with succ_idx."""
+        if self.pred_data is None:
+            return None
+        return self.pred_data[np.argsort(self.pred_idx, kind="stable")]
+
+    @property
+    def num_tasks(self) -> int:
+        return len(self.duration)
+
+    def __len__(self) -> int:
+        return self.num_tasks
+
+    def number_of_edges(self) -> int:
+        return len(self.pred_idx)
+
+    def in_degree(self) -> np.ndarray:
+        return np.diff(self.pred_ptr)
+
+    def out_degree(self) -> np.ndarray:
+        return np.diff(self.succ_ptr)
+
+    def predecessors(self, i: int) -> np.ndarray:
+        return self.pred_idx[self.pred_ptr[i]:self.pred_ptr[i+1]]
+
+    def successors(self, i: int) -> np.ndarray:
+        return self.succ_idx[self.succ_ptr[i]:self.succ_ptr[i+1]]
+
+    def topological_levels(self) -> list[np.ndarray]:
+        """Tasks grouped by depth: every predecessor of a task is in an earlier level."""
+        indegree = self.in_degree().copy()
+        out_degree = self.out_degree()
+        frontier = np.flatnonzero(indegree == 0)
+        levels = []
+        seen = 0
+
+        while frontier.size:
+            levels.append(frontier)
+            seen += frontier.size
+            edges = csr_segments(self.succ_ptr[frontier], out_degree[frontier])
+            succ, count = np.unique(self.succ_idx[edges], return_counts=True)
+            indegree[succ] -= count
+            frontier = succ[indegree[succ] == 0]
+
+        if seen != self.num_tasks:
+            raise ValueError("Task graph contains a cycle")
+        return levels
+
+    def topological_order(self) -> np.ndarray:
+        levels = self.topological_levels()
+        return np.concatenate(levels) if levels else np.empty(0, dtype=np.int64)
+
+
+class TaskGraphBuilder:
+    """Incrementally fills the TaskGraph arrays, one task at a time."""
+
+    def __init__(self):
+        self.ids: list[Any] = []
+        self.index: dict[Any, int] = {}
+        self._duration = array("q")
+        self._memory = array("q")
+        self._defined = bytearray()
+        # Dependencies are kept flat, in the order tasks are added
+        self._order = array("q")
+        self._starts = array("q", [0])
+        self._preds = array("i")
+        # Data sizes of the dependencies, only once a task declares one
+        self._data: array | None = None
+
+    def _node(self, node: Any) -> int:
+        i = self.index.get(node)
+        if i is None:
+            i = self.index[node] = len(self.ids)
+            self.ids.append(node)
+            self._duration.append(0)
+            self._memory.append(0)
+            self._defined.append(0)
+        return i
+
+    def add_task(self, node: Any, duration: int, memory: int, dependencies: Iterable[Any]):
+        """
+        A dependency is a task id, or ``{"id": ..., "data": size}`` to declare
+        the data it sends. Integral floats (3.0) are taken as integers, other
+        non-integer values raise a ValueError naming the task.
+        """
+        if not isinstance(dependencies, (list, tuple)):
+            # Read twice below, a generator would be empty the second time
+            dependencies = list(dependencies)
+        i = self._node(node)
+        if self._defined[i]:
+            raise ValueError(f"Task {node!r} is defined twice")
+        try:
+            self._duration[i] = duration
+            self._memory[i] = memory
+        except TypeError:
+            self._duration[i] = _integer(node, "duration", duration)
+            self._memory[i] = _integer(node, "memory", memory)
+        self._defined[i] = 1
+
+        data = None
+        try:
+            deps = list(map(self.index.get, dependencies))
+        except TypeError:
+            dependencies, data = _split_data(dependencies)
+            deps = list(map(self.index.get, dependencies))
+        if None in deps:
+            deps = [self._node(dep) for dep in dependencies]
+        if len(set(deps)) != len(deps):
+            # Duplicate dependencies collapse into a single edge, like in a DiGraph
+            if data is None:
+                deps = list(dict.fromkeys(deps))
+            else:
+                merged: dict[int, int] = {}
+                for dep, size in zip(deps, data):
+                    merged[dep] = max(merged.get(dep, 0), size)
+                deps, data = list(merged), list(merged.values())
+
+        if data is not None:
+            if not all(type(size) is int for size in data):
+                data = [_integer(node, "data size", size) for size in data]
+            if self._data is None:
+                self._data = array("q", bytes(8 * len(self._preds)))
+        self._order.append(i)
+        self._preds.extend(deps)
+        if self._data is not None:
+            self._data.extend(data if data is not None else [0] * len(deps))
+        self._starts.append(len(self._preds))
+
+    def build(self) -> TaskGraph:
+        if len(self._order) != len(self.ids):
+            missing = [self.ids[i] for i, d in enumerate(self._defined) if not d]
+            raise ValueError(f"Unknown dependencies: {missing[:10]}")
+
+        n = len(self.ids)
+        order = np.frombuffer(self._order, dtype=np.int64)
+        starts = np.frombuffer(self._starts, dtype=np.int64)
+        preds = np.frombuffer(self._preds, dtype=np.int32)
+        data = None if self._data is None else np.frombuffer(self._data, dtype=np.int64)
+
+        if np.array_equal(order, np.arange(n)):
+            pred_ptr, pred_idx, pred_data = starts, preds, data
+        else:
+            # Some dependencies were declared before their own task: reorder the
+            # blocks so that they follow the task indices
+            counts = np.diff(starts)
+            pred_ptr = np.zeros(n + 1, dtype=np.int64)
+            pred_ptr[order + 1] = counts
+            np.cumsum(pred_ptr, out=pred_ptr)
+            by_index = np.argsort(order)
+            edges = csr_segments(starts[by_index], counts[by_index])
+            pred_idx = preds[edges]
+            pred_data = None if data is None else data[edges]
+
+        graph = TaskGraph(self.ids, np.frombuffer(self._duration, dtype=np.int64),
+                          np.frombuffer(self._memory, dtype=np.int64), pred_ptr, pred_idx, pred_data=pred_data)
+        graph.__dict__["index"] = self.index
+        return graph
+
+
+def _integer(node: Any, name: str, value: Any) -> int:
+    """Integral value of a task attribute (3.0 is 3), ValueError naming the task otherwise."""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    try:
+        return operator.index(value)
+    except TypeError:
+        raise ValueError(f"Task {node!r}: {name} must be an integer, got {value!r}") from None
+
+
+def _split_data(dependencies: Iterable[Any]) -> tuple[list[Any], list[int]]:
+    """Ids and data sizes of dependencies given as ids or ``{"id", "data"}`` dicts."""
+    ids, data = [], []
+    for dep in dependencies:
+        if isinstance(dep, dict):
+            ids.append(dep["id"])
+            data.append(dep.get("data", 0))
+        else:
+            ids.append(dep)
+            data.append(0)
+    return ids, data
+
+
+def csr_segments(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Concatenate the index ranges ``[starts[k], starts[k] + counts[k])``."""
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    return offsets + np.arange(len(offsets))
+
+
+def _transpose(n: int, ptr: np.ndarray, idx: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Reverse the edges of a CSR adjacency, keeping sources in increasing order."""
+    dst = np.repeat(np.arange(n, dtype=np.int32), np.diff(ptr))
+    order = np.argsort(idx, kind="stable")
+    rev_ptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(idx, minlength=n), out=rev_ptr[1:])
+    return rev_ptr, dst[order]
+
+
+def graph_digest(graph: TaskGraph) -> str:
+    """
+    Hash of the graph contents (ids, durations, memories, dependencies and
+    their data sizes).
+    It only depends on the tasks, not on how the graph was loaded.
+    """
+    h = hashlib.blake2b(digest_size=20)
+    for arr, dtype in ((graph.duration, np.int64), (graph.memory, np.int64),
+                       (graph.pred_ptr, np.int64), (graph.pred_idx, np.int32)):
+        h.update(np.ascontiguousarray(arr, dtype=dtype).data)
+    if graph.pred_data is not None:
+        h.update(b"data")
+        h.update(np.ascontiguousarray(graph.pred_data, dtype=np.int64).data)
+
+    ids = graph.ids
+    if hasattr(ids, "offsets") and hasattr(ids, "blob"):
+        # IdTable of a mapped .tg file, already encoded
+        lengths, blob = np.diff(ids.offsets), ids.blob
+    elif all(isinstance(node, numbers.Integral) and not isinstance(node, bool) for node in ids):
+        lengths, blob = None, np.asarray(list(ids), dtype=np.int64).data
+    else:
+        encoded = [str(node).encode("utf-8") for node in ids]
+        lengths, blob = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), b"".join(encoded)
+    h.update(b"str" if lengths is not None else b"int")
+    if lengths is not None:
+        h.update(np.ascontiguousarray(lengths, dtype=np.int64).data)
+    h.update(blob)
+    return h.hexdigest()
+
+
+def as_task_graph(graph: Any) -> TaskGraph:
+    """Accept either a TaskGraph or a networkx DiGraph (converted once)."""
+    if isinstance(graph, TaskGraph):
+        return graph
+    return TaskGraph.from_networkx(graph)
@@ -0,0 +1,91 @@
+import random
+
+import pytest
+
+from availability import INF, AvailabilityTimeline
+from schedule_memory import processors_views
+
+MAPPING = {0: ([0, 1, 2], [3]), 100: ([0, 2, 5], [3, 4]), 250: ([0, 1, 2, 5], [4]), 400: ([1], [3, 4])}
+
+
+def views(types):
+    """Like processors_views, in list order."""
+    return [list(dict.fromkeys([*types[0], *types[1]])), list(types[1])]
+
+
+def timeline(mapping=MAPPING):
+    return AvailabilityTimeline(mapping, views)
+
+
+def in_view(mapping, t, view, p):
+    return p in views(mapping[t])[view]
+
+
+def brute_window_end(mapping, j, view, p):
+    thresholds = sorted(mapping)
+    if not in_view(mapping, thresholds[j], view, p):
+        return -INF
+    for t in thresholds[j+1:]:
+        if not in_view(mapping, t, view, p):
+            return t
+    return INF
+
+
+def test_windows():
+    tl = timeline()
+    assert len(tl) == 4
+    assert [tl.segment(t) for t in (-5, 0, 99, 100, 399, 400, 10**9)] == [0, 0, 0, 1, 2, 3, 3]
+    assert tl.window_end(0, 0, 1) == 100 and tl.window_end(2, 0, 1) == INF
+    assert tl.window_end(0, 1, 3) == 250 and tl.window_end(3, 1, 3) == INF
+    assert tl.window_end(0, 0, 5) == -INF
+    assert tl.window_start(2, 0, 1) == 250 and tl.window_start(1, 0, 2) == 0
+    # Any view: 4 is up from 100, 3 goes down at 250 and back at 400
+    assert tl.window(2, 4) == (100, INF)
+    assert tl.window(1, 3) == (0, 250)
+
+
+def test_runs_and_ranks():
+    tl = timeline()
+    # Sorted by window end, the latest first, ties in view order
+    assert tl.views(1) == [[4, 0, 2, 5, 3], [4, 3]]
+    assert [tl.rank(1, 0, p) for p in tl.views(1)[0]] == [4, 0, 1, 2, 3]
+    assert tl.runs(1, 0, INF) == [(0, 1)]
+    assert tl.runs(1, 0, 300) == [(0, 1), (1, 4)]
+    assert tl.runs(1, 0, 200) == [(0, 1), (1, 4), (4, 5)]
+    assert tl.runs(1, 0, 100) == tl.runs(1, 0, 250)
+    assert tl.runs(3, 0, INF) == [(0, 3)]
+    assert tl.runs(1, 1, 10**6) == [(0, 1)]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_counts_match_brute_force(seed):
+    rng = random.Random(seed)
+    processors = range(8)
+    mapping = {t: (rng.sample(processors, rng.randint(1, 4)), rng.sample(processors, rng.randint(1, 3)))
+               for t in sorted(rng.sample(range(1, 500), 5)) + [0]}
+    tl = timeline(mapping)
+    thresholds = sorted(mapping)
+    for j, t in enumerate(thresholds):
+        for view in (0, 1):
+            members = tl.views(j)[view]
+            for p in members:
+                assert tl.window_end(j, view, p) == brute_window_end(mapping, j, view, p)
+            for end in rng.sample(range(0, 700), 20) + [INF]:
+                staying = [p for p in members if brute_window_end(mapping, j, view, p) >= end]
+                assert tl.count_up(j, view, end) == len(staying)
+                runs = tl.runs(j, view, end)
+                assert [p for lo, hi in runs for p in members[lo:hi]] == members[:len(staying)]
+                for lo, hi in runs:
+                    assert len({tl.window_end(j, view, p) for p in members[lo:hi]}) == 1
+                    assert [tl.rank(j, view, p) for p in members[lo:hi]] == sorted(tl.rank(j, view, p)
+                                                                                 for p in members[lo:hi])
+                if end != INF and end > t:
+                    assert sorted(tl.up_during(t, end - t, view)) == sorted(staying)
+
+
+def test_typed_views():
+    mapping = {0: ({0, 1}, {2}), 10: ({0}, {2, 3})}
+    tl = AvailabilityTimeline(mapping, processors_views)
+    assert sorted(tl.views(1)[0]) == [0, 2, 3] and sorted(tl.views(1)[1]) == [2, 3]
+    assert tl.up_during(-1, 5) == []
+    assert tl.up_during(5, 10) == [0, 2]
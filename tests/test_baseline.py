@@ -0,0 +1,87 @@
+"""
+The schedulers on the array-backed graph, whichever way it is loaded, give
+the schedules of the networkx implementation (tests/data, written by the
+schedulers of the baseline commit on util.random_tasks graphs). With
+several memory thresholds the schedules only agree until the pool first
+changes: processors joining it are now free from their threshold on, and
+tasks no longer run on processors leaving it before they end.
+"""
+import io
+import json
+import os
+
+import pytest
+
+import schedule
+import schedule_memory
+import schedule_module
+from batch import parse_processors
+from failures import FailureTrace
+from graph_format import load_task_graph, save_task_graph
+from graph_stream import stream_task_graph
+from task_graph import TaskGraph
+from timing import alap_order
+from util import random_tasks
+
+with open(os.path.join(os.path.dirname(__file__), "data", "baseline_schedules.json")) as f:
+    BASELINE = json.load(f)
+
+
+def run(graph, case):
+    order, ub = alap_order(graph)
+    data = {"order": order, "ub": ub}
+    if case["scheduler"] == "schedule":
+        return schedule.modified_critical_path(graph, 4, data)[:2]
+    if case["scheduler"] == "schedule_module":
+        return schedule_module.modified_critical_path(graph, parse_processors(BASELINE["module_processors"]), data)[:2]
+    return schedule_memory.modified_critical_path(graph, parse_processors(BASELINE["memory_processors"]),
+                                                  BASELINE["mem_lim"], data)[:2]
+
+
+def from_tasks(tasks, tmp_path):
+    return TaskGraph.from_tasks(tasks)
+
+
+def from_json(tasks, tmp_path):
+    return stream_task_graph(io.BytesIO(json.dumps({"tasks": tasks}).encode()), chunk_size=97)
+
+
+def from_binary(tasks, tmp_path):
+    path = str(tmp_path / "g.tg")
+    save_task_graph(TaskGraph.from_tasks(tasks), path)
+    return load_task_graph(path)
+
+
+@pytest.mark.parametrize("load", [from_tasks, from_json, from_binary], ids=["tasks", "stream", "binary"])
+@pytest.mark.parametrize("case", [c for c in BASELINE["cases"] if c["scheduler"] != "schedule_memory_multi"],
+                         ids=lambda c: f"{c['scheduler']}-{c['seed']}")
+def test_same_schedule_as_baseline(case, load, tmp_path):
+    tasks = random_tasks(case["seed"], case["num_tasks"])
+    graph = load(tasks, tmp_path)
+    result, makespan = run(graph, case)
+    assert {task.id: [task.start_time, task.processor] for task in result} == case["schedule"]
+    assert makespan == case["makespan"]
+
+
+def test_no_failure_trace_changes_nothing_before_the_failure():
+    case = next(c for c in BASELINE["cases"] if c["scheduler"] == "schedule_module")
+    graph = TaskGraph.from_tasks(random_tasks(case["seed"], case["num_tasks"]))
+    order, ub = alap_order(graph)
+    result, _, _, _ = schedule_module.modified_critical_path(graph, parse_processors(BASELINE["module_processors"]),
+                                                             {"order": order, "ub": ub}, failures=FailureTrace())
+    assert {task.id: [task.start_time, task.processor] for task in result} == case["schedule"]
+
+
+@pytest.mark.parametrize("case", [c for c in BASELINE["cases"] if c["scheduler"] == "schedule_memory_multi"],
+                         ids=lambda c: f"seed-{c['seed']}")
+def test_multi_threshold_same_picks_until_the_pool_changes(case):
+    processors = parse_processors(BASELINE["memory_multi_processors"])
+    graph = TaskGraph.from_tasks(random_tasks(case["seed"], case["num_tasks"]))
+    order, ub = alap_order(graph)
+    result, _, _, _ = schedule_memory.modified_critical_path(graph, processors, BASELINE["mem_lim"],
+                                                             {"order": order, "ub": ub})
+    schedule = {task.id: [task.start_time, task.processor] for task in result}
+    first_change = sorted(processors)[1]
+    before = {node: placed for node, placed in case["schedule"].items() if placed[0] < first_change}
+    assert before
+    assert {node: schedule[node] for node in before} == before
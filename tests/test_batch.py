@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+import schedule
+from batch import num_cores, schedule_batch, scheduler_for
+from graph_format import load_task_graph, save_task_graph
+from task_graph import TaskGraph
+from timing import alap_order
+from util import random_tasks
+
+CONFIGS = [{"nodes": 4},
+           {"nodes": 3, "placement": "insertion", "name": "insertion"},
+           {"nodes": 4, "selection": "eft", "priority": "upward_rank"},
+           {"processors": {"0": 4, "250": 2}},
+           {"processors": {"0": [[0, 1, 2], [3]]}, "mem_lim": 512},
+           {"nodes": 2, "failures": [{"processor": 1, "time": 30, "recovery": 60}], "profile": True}]
+
+
+@pytest.fixture(scope="module")
+def graph():
+    return TaskGraph.from_tasks(random_tasks(0, 200))
+
+
+def without_stats(results):
+    return [{key: value for key, value in result.items() if key != "stats"} for result in results]
+
+
+def test_workers_give_the_serial_results(graph, tmp_path):
+    serial = schedule_batch(graph, CONFIGS, max_workers=1)
+    # The workers receive the graph pickled, mapped ids included
+    path = str(tmp_path / "g.tg")
+    save_task_graph(graph, path)
+    parallel = schedule_batch(load_task_graph(path), CONFIGS, max_workers=2)
+    assert [result["config"] for result in parallel] == CONFIGS
+    assert json.loads(json.dumps(without_stats(parallel))) == json.loads(json.dumps(without_stats(serial)))
+    assert "stats" in parallel[-1] and "stats" not in parallel[0]
+
+
+def test_same_as_the_scheduler(graph):
+    order, ub = alap_order(graph)
+    expected, makespan, _, _ = schedule.modified_critical_path(graph, 4, {"order": order, "ub": ub})
+    result, = schedule_batch(graph, [{"nodes": 4}], include_schedules=True)
+    assert result["makespan"] == makespan
+    assert result["schedule"] == expected.per_core(4)
+
+
+def test_binding_is_not_consumed(graph):
+    order, ub = alap_order(graph)
+    binding = {"order": order, "ub": ub}
+    first = schedule_batch(graph, [{"nodes": 4}, {"nodes": 4}], binding, max_workers=1, include_schedules=False)
+    assert binding["order"] == order and first[0] == first[1]
+    assert "schedule" not in first[0]
+
+
+def test_num_cores_and_errors():
+    assert [num_cores(config) for config in CONFIGS[:5]] == [4, 3, 4, 4, 4]
+    with pytest.raises(ValueError):
+        scheduler_for({"nodes": 2, "placement": "sideways"})
+    with pytest.raises(ValueError, match="typed cores"):
+        scheduler_for({"processors": {"0": [[0], [1]]}, "mem_lim": 1, "failures": [{"processor": 0, "time": 1}]})
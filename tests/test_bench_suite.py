@@ -0,0 +1,44 @@
+import bench_suite
+from bench_suite import compare
+
+
+def results(**medians):
+    return {"results": {key: {"median_s": median, "peak_rss_mb": 10.0} for key, median in medians.items()}}
+
+
+def test_compare_needs_a_relative_and_absolute_slowdown():
+    baseline = results(fast=0.001, slow=1.0, steady=1.0)
+    current = results(fast=0.002, slow=1.5, steady=1.05)
+    assert compare(current, baseline, 0.1) == ["slow: 1.50x slower"]
+    assert compare(current, baseline, 0.1, min_delta=0) == ["fast: 2.00x slower", "slow: 1.50x slower"]
+
+
+def test_compare_gates_on_peak_rss():
+    def with_rss(**peaks):
+        return {"results": {key: {"median_s": 1.0, "peak_rss_mb": peak, "peak_rss_timed_only": True}
+                            for key, peak in peaks.items()}}
+    baseline = with_rss(small=20.0, large=500.0, steady=500.0)
+    current = with_rss(small=30.0, large=700.0, steady=550.0)
+    assert compare(current, baseline, 0.1) == ["large: peak RSS 1.40x larger"]
+    assert compare(current, baseline, 0.1, min_rss_delta=0) == ["small: peak RSS 1.50x larger",
+                                                                "large: peak RSS 1.40x larger"]
+    # Peaks measured differently are not compared
+    baseline["results"]["large"]["peak_rss_timed_only"] = False
+    assert compare(current, baseline, 0.1) == []
+
+
+def test_compare_reports_failures():
+    current = {"results": {"a": {"error": "boom"}}}
+    assert compare(current, results(a=1.0), 0.1) == ["a: failed (boom)"]
+
+
+def test_peak_rss_restarts_from_the_current_rss():
+    if not bench_suite._reset_peak_rss():
+        return
+    before = bench_suite._rss_mb()
+    data = bytearray(64 << 20)
+    data[::4096] = b"\x01" * len(data[::4096])
+    assert bench_suite._peak_rss_mb() - before > 50
+    del data
+    bench_suite._reset_peak_rss()
+    assert bench_suite._peak_rss_mb() - bench_suite._rss_mb() < 10
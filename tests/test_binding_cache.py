@@ -0,0 +1,102 @@
+import os
+import struct
+
+import pytest
+
+import binding_cache
+from binding_cache import BindingCache, LocalStore, binding_key, decode_binding, encode_binding
+from task_graph import TaskGraph, graph_digest
+from timing import alap_order
+from util import random_tasks
+
+
+class DictStore:
+    def __init__(self):
+        self.blobs = {}
+
+    def get(self, key):
+        return self.blobs.get(key)
+
+    def put(self, key, data):
+        self.blobs[key] = data
+
+    def delete(self, key):
+        self.blobs.pop(key, None)
+
+
+@pytest.fixture
+def graph():
+    return TaskGraph.from_tasks(random_tasks(0, 100))
+
+
+def encoded(graph):
+    order, ub = alap_order(graph)
+    digest = graph_digest(graph)
+    return encode_binding(graph, order, ub, digest), order, ub, digest
+
+
+def test_roundtrip(graph):
+    blob, order, ub, digest = encoded(graph)
+    assert decode_binding(graph, blob, digest) == {"order": order, "ub": ub}
+
+
+def test_invalid_blobs(graph):
+    blob, _, _, digest = encoded(graph)
+    other = TaskGraph.from_tasks(random_tasks(1, 100))
+    header = binding_cache._HEADER.size
+    flipped = bytearray(blob)
+    flipped[header + 3] ^= 1
+    stale = bytearray(blob)
+    struct.pack_into("<I", stale, 12, binding_cache.BINDING_VERSION + 1)
+    cases = {
+        "truncated header": blob[:header - 1],
+        "not a binding file": b"X" + blob[1:],
+        "stale binding version": bytes(stale),
+        "truncated payload": blob[:-4],
+        "checksum mismatch": bytes(flipped),
+    }
+    for message, bad in cases.items():
+        with pytest.raises(ValueError, match=message):
+            decode_binding(graph, bad, digest)
+    with pytest.raises(ValueError, match="another graph"):
+        decode_binding(other, blob, graph_digest(other))
+
+
+def test_invalid_entries_are_dropped_and_rebuilt(graph, tmp_path):
+    local, remote = LocalStore(str(tmp_path)), DictStore()
+    cache = BindingCache(local, remote)
+    key = binding_key(graph_digest(graph))
+    local.put(key, b"garbage")
+    remote.put(key, b"garbage")
+    assert cache.load(graph) is None
+    assert local.get(key) is None and remote.get(key) is None
+
+    order, ub = alap_order(graph)
+    assert cache.binding(graph) == {"order": order, "ub": ub}
+    assert local.get(key) == remote.get(key) is not None
+
+
+def test_remote_hit_fills_local(graph, tmp_path):
+    remote = DictStore()
+    BindingCache(remote=remote).binding(graph)
+    local = LocalStore(str(tmp_path))
+    order, ub = alap_order(graph)
+    assert BindingCache(local, remote).load(graph) == {"order": order, "ub": ub}
+    assert local.get(binding_key(graph_digest(graph))) is not None
+
+
+def test_local_store_evicts_least_recently_used(tmp_path):
+    store = LocalStore(str(tmp_path), max_bytes=250, max_entries=3)
+    for k, name in enumerate("abc"):
+        store.put(f"{name}.bind", b"x" * 100 if name != "a" else b"x" * 10)
+        os.utime(store.path(f"{name}.bind"), (k, k))
+    # 210 bytes and 3 entries, within both limits
+    assert sorted(os.listdir(tmp_path)) == ["a.bind", "b.bind", "c.bind"]
+    # Reading a refreshes it, b is now the least recently used
+    store.get("a.bind")
+    store.put("d.bind", b"x" * 10)
+    assert sorted(os.listdir(tmp_path)) == ["a.bind", "c.bind", "d.bind"]
+    # Past max_bytes, the oldest go until the rest fits
+    store.max_entries = None
+    store.put("e.bind", b"x" * 200)
+    assert sorted(os.listdir(tmp_path)) == ["a.bind", "d.bind", "e.bind"]
@@ -0,0 +1,72 @@
+import random
+
+import numpy as np
+import pytest
+
+from communication import INF, Arrival, CommunicationModel, predecessors_arrival
+
+MODEL = CommunicationModel([[100, 10], [10, None]], [[1, 5], [7, 2]], {3: 1, 4: 1, 11: 1})
+# 10 and 11 never run a predecessor, one of each type
+PROCESSORS = [0, 1, 2, 3, 4, 10, 11]
+
+
+def brute_on(placed, processor, time=0):
+    return max([time] + [end if p == processor else end + MODEL.transfer_time(data, MODEL.type_of(p),
+                                                                              MODEL.type_of(processor))
+                         for end, p, data in placed])
+
+
+def test_model():
+    assert MODEL.transfer_time(25, 0, 1) == 5 + 3
+    assert MODEL.transfer_time(0, 0, 1) == 5
+    assert MODEL.transfer_time(10**6, 1, 1) == 2
+    single = CommunicationModel.from_dict({"bandwidth": 4, "latency": 1})
+    assert single.transfer_time(9, 0, 0) == 1 + 3
+    assert np.allclose(single.mean_transfer_time(np.array([0, 9])), [1, 4])
+    assert CommunicationModel.from_dict(MODEL.to_dict()).to_dict() == MODEL.to_dict()
+    assert MODEL.with_types({0: 1, 3: 0}).types == {0: 1, 3: 1, 4: 1, 11: 1}
+    with pytest.raises(ValueError):
+        CommunicationModel([[1, 2]], [[1]])
+    with pytest.raises(ValueError):
+        CommunicationModel([[1]], [[1]], {0: 1})
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_arrival_matches_brute_force(seed):
+    rng = random.Random(seed)
+    time = rng.choice([0, 50])
+    arrival = Arrival(MODEL, time)
+    placed = []
+    for _ in range(rng.randint(1, 8)):
+        # Few processors, so that the same one often sends several times
+        end, p, data = rng.randint(0, 60), rng.choice(PROCESSORS[:5]), rng.choice([0, 30, 200])
+        arrival.add(end, p, data)
+        placed.append((end, p, data))
+        on = {q: brute_on(placed, q, time) for q in PROCESSORS}
+        assert {q: arrival.on(q) for q in PROCESSORS} == on
+        assert arrival.earliest() == min(on.values())
+        assert arrival.remote() == max(on[10], on[11])
+
+
+def test_top_two_remote_arrivals_per_type():
+    arrival = Arrival(MODEL)
+    arrival.add(10, 0, 0)
+    # 0 sends to type 0 in 11 and to type 1 in 15
+    assert arrival.best == [11, 15] and arrival.best_processor == [0, 0] and arrival.second == [-INF, -INF]
+    arrival.add(20, 0, 0)
+    # A later input from the same processor replaces its arrival instead of becoming the second one
+    assert arrival.best == [21, 25] and arrival.second == [-INF, -INF]
+    arrival.add(18, 3, 0)
+    # 3 (type 1) sends to type 0 in 25 and to type 1 in 20
+    assert arrival.best == [25, 25] and arrival.best_processor == [3, 0] and arrival.second == [21, 20]
+    assert arrival.on(0) == 25 and arrival.on(3) == 25 and arrival.on(4) == 25 and arrival.on(1) == 25
+    arrival.add(40, 4, 0)
+    assert arrival.on(4) == 40 and arrival.on(3) == 42 and arrival.on(10) == 47
+
+
+def test_predecessors_arrival():
+    task_end, task_processor = [10, 20, 30, 40], [0, 3, -1, 0]
+    arrival = predecessors_arrival(MODEL, [0, 1, 2, 3], [0, 100, 50, 0], task_end, task_processor)
+    # Task 2 is not placed yet
+    placed = [(10, 0, 0), (20, 3, 100), (40, 0, 0)]
+    assert {q: arrival.on(q) for q in PROCESSORS} == {q: brute_on(placed, q) for q in PROCESSORS}
@@ -0,0 +1,93 @@
+import heapq
+
+import numpy as np
+import pytest
+
+import schedule
+from communication import CommunicationModel
+from engine import PRIORITIES, cpop_priority, critical_path_tasks, priority_order
+from task_graph import TaskGraph
+from util import check_schedule, random_tasks
+
+MODEL = CommunicationModel.from_dict({"bandwidth": [[10, 5], [5, None]], "latency": [[1, 3], [3, 0]]})
+
+
+def brute_ranks(tasks, model=None):
+    """Upward and downward ranks over the task dicts, mean transfer times on the edges."""
+    duration = {task["id"]: task["duration"] for task in tasks}
+    edges = [(dep["id"], task["id"], dep["data"]) for task in tasks for dep in task["dependencies"]]
+
+    def cost(data):
+        return 0 if model is None else model.mean_transfer_time(np.array([data]))[0]
+
+    down = {}
+    for task in tasks:
+        down[task["id"]] = max((down[a] + duration[a] + cost(data) for a, b, data in edges if b == task["id"]),
+                               default=0)
+    up = {}
+    for task in reversed(tasks):
+        up[task["id"]] = duration[task["id"]] + max((cost(data) + up[b] for a, b, data in edges if a == task["id"]),
+                                                    default=0)
+    return up, down
+
+
+def popped(order):
+    order = list(order)
+    return [heapq.heappop(order)[1] for _ in range(len(order))]
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("model", [None, MODEL], ids=["static", "model"])
+def test_ranks_match_brute_force(seed, model):
+    tasks = random_tasks(seed, 120, data=True)
+    graph = TaskGraph.from_tasks(tasks)
+    up, down = brute_ranks(tasks, model)
+    order, ub = priority_order(graph, "upward_rank", model)
+    assert ub == sum(task["duration"] for task in tasks)
+    assert {node: -key for key, node in order} == pytest.approx(up)
+    assert cpop_priority(graph, model) == pytest.approx([up[node] + down[node] for node in graph.ids])
+    order, _ = priority_order(graph, "cpop", model)
+    assert {node: -key for key, node in order} == pytest.approx({node: up[node] + down[node] for node in up})
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_blevel_order(seed):
+    tasks = random_tasks(seed, 120)
+    for task in tasks:
+        task["dependencies"] = [{"id": dep, "data": 0} for dep in task["dependencies"]]
+    graph = TaskGraph.from_tasks(tasks)
+    up, down = brute_ranks(tasks)
+    order, _ = priority_order(graph, "blevel")
+    # Longest b-level first, then the latest ASAP start, then the task id
+    assert popped(order) == sorted(up, key=lambda node: (-up[node], -down[node], node))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_cpop_critical_path(seed):
+    graph = TaskGraph.from_tasks(random_tasks(seed, 150, data=True))
+    priority = cpop_priority(graph, MODEL)
+    path = critical_path_tasks(graph, priority)
+    assert graph.in_degree()[path[0]] == 0 and graph.out_degree()[path[-1]] == 0
+    assert all(b in graph.successors(a).tolist() for a, b in zip(path, path[1:]))
+    assert np.allclose(priority[path], priority.max())
+
+    result, _, _, _ = schedule.modified_critical_path(graph, 4, None, communication=MODEL, priority="cpop")
+    check_schedule(graph, result)
+    processors = {task.id: task.processor for task in result}
+    assert len({processors[graph.ids[i]] for i in path}) == 1
+
+
+@pytest.mark.parametrize("priority", PRIORITIES)
+@pytest.mark.parametrize("placement", ["append", "insertion"])
+def test_every_priority_gives_a_valid_schedule(priority, placement):
+    graph = TaskGraph.from_tasks(random_tasks(7, 200, data=True))
+    for model in (None, MODEL):
+        result, makespan, _, _ = schedule.modified_critical_path(graph, 3, None, placement=placement,
+                                                                 communication=model, priority=priority)
+        check_schedule(graph, result)
+        assert makespan == max(task.end_time for task in result)
+
+
+def test_unknown_priority():
+    with pytest.raises(ValueError, match="Unknown priority"):
+        priority_order(TaskGraph.from_tasks(random_tasks(0, 5)), "heft")
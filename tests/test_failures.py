@@ -0,0 +1,74 @@
+import pytest
+
+import schedule
+from batch import scheduler_for
+from failures import Failure, FailureTrace, reexecute
+from task_graph import TaskGraph
+from timing import alap_order
+from util import check_schedule, random_tasks
+
+CHAIN = [{"id": i, "duration": 10, "memory": 0, "dependencies": [i - 1] if i else []} for i in range(5)]
+
+
+def binding(graph):
+    order, ub = alap_order(graph)
+    return {"order": order, "ub": ub}
+
+
+def check_trace(result, trace):
+    """No task runs on a processor while it is down."""
+    for task in result:
+        for time, recovery in zip(trace.times.get(task.processor, []), trace.recoveries.get(task.processor, [])):
+            assert task.end_time <= time or task.start_time >= recovery, (task, time, recovery)
+
+
+def test_trace_merges_overlapping_failures():
+    trace = FailureTrace([Failure(0, 10, 20), Failure(0, 15, 30), Failure(1, 5)])
+    assert trace.to_list() == [{"processor": 1, "time": 5}, {"processor": 0, "time": 10, "recovery": 30}]
+    assert trace.down_until(0, 25) == 30
+    assert trace.down_until(0, 30) is None
+    assert trace.up_from(0, 12) == 30
+    assert trace.next_failure(0, 10) == float("inf")
+
+
+def test_chain_moves_to_another_core():
+    graph = TaskGraph.from_tasks(CHAIN)
+    result, makespan = scheduler_for({"nodes": 4, "failures": [{"processor": 0, "time": 15}]})(graph, binding(graph))
+    trace = FailureTrace([Failure(0, 15)])
+    check_schedule(graph, result)
+    check_trace(result, trace)
+    # Task 1 runs again from the failure on, on another core
+    assert makespan == 15 + 4 * 10
+
+
+def test_no_processor_left():
+    graph = TaskGraph.from_tasks(CHAIN)
+    result, _, _, _ = schedule.modified_critical_path(graph, 1, binding(graph))
+    with pytest.raises(ValueError, match="No processor"):
+        reexecute(graph, result, FailureTrace([Failure(0, 15)]), range(1))
+
+
+def test_failures_with_typed_cores_are_rejected():
+    with pytest.raises(ValueError, match="mem_lim"):
+        scheduler_for({"processors": {"0": [[0, 1], [2]]}, "mem_lim": 100, "failures": [{"processor": 0, "time": 5}]})
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_reexecute_keeps_a_valid_schedule(seed):
+    graph = TaskGraph.from_tasks(random_tasks(seed, 150))
+    result, makespan, _, _ = schedule.modified_critical_path(graph, 4, binding(graph))
+    trace = FailureTrace([Failure(seed % 4, 20 + seed, 60 + 3 * seed), Failure((seed + 1) % 4, 2 * makespan // 3)])
+    new_result, new_makespan, interrupted = reexecute(graph, result, trace, range(4), 1)
+    check_schedule(graph, new_result)
+    check_trace(new_result, trace)
+    assert new_makespan >= makespan or not interrupted
+    assert reexecute(graph, result, FailureTrace(), range(4))[1] == makespan
+
+
+@pytest.mark.parametrize("config", [{"nodes": 3}, {"processors": {"0": 2, "40": 3}}])
+def test_batch_failures(config):
+    graph = TaskGraph.from_tasks(random_tasks(7, 100))
+    failures = [{"processor": 2, "time": 30}, {"processor": 0, "time": 10, "recovery": 50}]
+    result, _ = scheduler_for({**config, "failures": failures})(graph, binding(graph))
+    check_schedule(graph, result)
+    check_trace(result, FailureTrace.from_list(failures))
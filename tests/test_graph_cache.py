@@ -0,0 +1,52 @@
+from graph_cache import GraphCache, estimate_nbytes
+from task_graph import TaskGraph
+from timing import alap_order
+from util import random_tasks
+
+
+def graph_and_binding(seed, n=50):
+    graph = TaskGraph.from_tasks(random_tasks(seed, n))
+    order, ub = alap_order(graph)
+    return graph, {"order": order, "ub": ub}
+
+
+def test_hits_and_copies():
+    cache = GraphCache(max_bytes=1 << 30)
+    graph, binding = graph_and_binding(0)
+    cache.put("g", graph, binding, 0.5)
+    assert cache.get("x") is None
+    entry = cache.get("g")
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert entry.graph is graph and entry.load_time == 0.5
+    # The schedulers consume the order: every binding is a fresh copy
+    data = entry.binding()
+    data["order"].clear()
+    assert entry.binding()["order"] == binding["order"]
+
+
+def test_evicts_least_recently_used():
+    entries = [graph_and_binding(seed) for seed in range(3)]
+    size = max(estimate_nbytes(graph, binding) for graph, binding in entries)
+    cache = GraphCache(max_bytes=2 * size)
+    cache.put(0, *entries[0], 0.0)
+    cache.put(1, *entries[1], 0.0)
+    cache.get(0)
+    cache.put(2, *entries[2], 0.0)
+    assert list(cache.entries) == [0, 2]
+    assert cache.nbytes == sum(entry.nbytes for entry in cache.entries.values())
+    # Replacing an entry does not count it twice
+    cache.put(2, *entries[2], 0.0)
+    assert len(cache) == 2 and cache.nbytes <= cache.max_bytes
+
+
+def test_too_large_is_not_kept():
+    graph, binding = graph_and_binding(1, 500)
+    cache = GraphCache(max_bytes=estimate_nbytes(graph, binding) - 1)
+    entry = cache.put("big", graph, binding, 0.0)
+    assert entry.graph is graph
+    assert len(cache) == 0 and cache.nbytes == 0
+
+
+def test_default_budget(monkeypatch):
+    monkeypatch.setenv("AWS_LAMBDA_FUNCTION_MEMORY_SIZE", "2048")
+    assert GraphCache().max_bytes == 1 << 30
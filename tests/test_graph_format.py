@@ -0,0 +1,105 @@
+import json
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+import graph_format
+from graph_format import binary_path, convert_json, load_graph, load_task_graph, save_task_graph
+from task_graph import TaskGraph, graph_digest
+from util import random_tasks
+
+
+def check_equal(graph, expected):
+    assert list(graph.ids) == list(expected.ids)
+    for name in ("duration", "memory", "pred_ptr", "pred_idx", "succ_ptr", "succ_idx"):
+        assert np.array_equal(getattr(graph, name), getattr(expected, name)), name
+    if expected.pred_data is None:
+        assert graph.pred_data is None
+    else:
+        assert np.array_equal(graph.pred_data, expected.pred_data)
+    assert graph_digest(graph) == graph_digest(expected)
+
+
+def int_ids(tasks, kind=int):
+    """The same tasks with integer ids."""
+    def number(node):
+        return kind(node[1:])
+    return [{**task, "id": number(task["id"]),
+             "dependencies": [{**dep, "id": number(dep["id"])} if isinstance(dep, dict) else number(dep)
+                              for dep in task["dependencies"]]}
+            for task in tasks]
+
+
+@pytest.mark.parametrize("ids", ["str", "int"])
+@pytest.mark.parametrize("data", [False, True])
+def test_binary_roundtrip(tmp_path, ids, data):
+    tasks = random_tasks(1, 150, data=data)
+    if ids == "int":
+        tasks = int_ids(tasks)
+    graph = TaskGraph.from_tasks(tasks)
+    path = str(tmp_path / "g.tg")
+    save_task_graph(graph, path)
+    loaded = load_task_graph(path)
+    check_equal(loaded, graph)
+    assert loaded.index == graph.index
+    # Workers receive the graph pickled, ids included
+    check_equal(pickle.loads(pickle.dumps(loaded)), graph)
+    assert os.listdir(tmp_path) == ["g.tg"]
+
+
+def test_numpy_integer_ids(tmp_path):
+    graph = TaskGraph.from_tasks(int_ids(random_tasks(2, 50), np.int64))
+    path = str(tmp_path / "g.tg")
+    save_task_graph(graph, path)
+    loaded = load_task_graph(path)
+    assert all(type(node) is int for node in loaded.ids)
+    assert list(loaded.ids) == list(range(50))
+    assert graph_digest(loaded) == graph_digest(graph)
+
+
+def test_id_table_indexing(tmp_path):
+    path = str(tmp_path / "g.tg")
+    save_task_graph(TaskGraph.from_tasks(random_tasks(3, 5)), path)
+    ids = load_task_graph(path).ids
+    assert ids[-1] == "t4" and ids[-5] == "t0"
+    assert ids[1:3] == ["t1", "t2"] and ids[::-2] == ["t4", "t2", "t0"]
+    for i in (5, -6):
+        with pytest.raises(IndexError):
+            ids[i]
+
+
+def test_failed_save_keeps_the_previous_file(tmp_path, monkeypatch):
+    path = str(tmp_path / "g.tg")
+    graph = TaskGraph.from_tasks(random_tasks(4, 30))
+    save_task_graph(graph, path)
+
+    def fail(*args):
+        raise OSError("disk full")
+    monkeypatch.setattr(graph_format, "_padding", fail)
+    with pytest.raises(OSError, match="disk full"):
+        save_task_graph(TaskGraph.from_tasks(random_tasks(5, 40)), path)
+    assert os.listdir(tmp_path) == ["g.tg"]
+    monkeypatch.undo()
+    check_equal(load_task_graph(path), graph)
+
+
+def test_load_graph_prefers_fresh_binary(tmp_path):
+    json_path = str(tmp_path / "g.json")
+    tasks = random_tasks(2, 50)
+    with open(json_path, "w") as outfile:
+        json.dump({"tasks": tasks}, outfile)
+    assert not os.path.exists(binary_path(json_path))
+    check_equal(load_graph(json_path), TaskGraph.from_tasks(tasks))
+
+    assert convert_json(json_path) == binary_path(json_path)
+    check_equal(load_graph(json_path), TaskGraph.from_tasks(tasks))
+
+    # A JSON file newer than its binary one is read again
+    tasks = random_tasks(3, 60)
+    with open(json_path, "w") as outfile:
+        json.dump({"tasks": tasks}, outfile)
+    stat = os.stat(binary_path(json_path))
+    os.utime(json_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    check_equal(load_graph(json_path), TaskGraph.from_tasks(tasks))
@@ -0,0 +1,39 @@
+import json
+import os
+
+import pytest
+
+import graph_generator
+from graph_format import load_graph
+from graph_generator import save_graph_to_json
+
+
+@pytest.mark.parametrize("shape", graph_generator.SHAPES)
+def test_saved_graph_loads(tmp_path, shape):
+    path = str(tmp_path / "g.json")
+    assert save_graph_to_json(500, 5, 3, shape, path) == path
+    with open(path) as f:
+        content = json.load(f)
+    assert content["random_seed"] == 3 and len(content["tasks"]) == 500
+    assert load_graph(path).num_tasks == 500
+    assert os.listdir(tmp_path) == ["g.json"]
+
+
+def test_interrupted_write_leaves_no_file(tmp_path, monkeypatch):
+    generate_batches = graph_generator.generate_batches
+
+    def broken(*args):
+        yield next(generate_batches(*args))
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(graph_generator, "generate_batches", broken)
+    with pytest.raises(KeyboardInterrupt):
+        save_graph_to_json(20000, 5, 3, filename=str(tmp_path / "g.json"))
+    assert os.listdir(tmp_path) == []
+
+
+def test_missing_directory_keeps_the_original_error(tmp_path):
+    with pytest.raises(FileNotFoundError) as e:
+        save_graph_to_json(10, 2, 3, filename=str(tmp_path / "missing" / "g.json"))
+    # Raised by open(), not by the cleanup of a temporary file never created
+    assert e.value.__context__ is None
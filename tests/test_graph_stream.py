@@ -0,0 +1,42 @@
+import io
+import json
+
+import numpy as np
+import pytest
+
+from graph_stream import iter_json_tasks, stream_task_graph
+from task_graph import TaskGraph, graph_digest
+from util import random_tasks
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 20])
+def test_stream_matches_from_tasks(chunk_size):
+    tasks = random_tasks(0, 150, data=True)
+    body = json.dumps({"name": "g", "tasks": tasks, "meta": {"tasks": [1, 2]}}).encode("utf-8")
+    graph, expected = stream_task_graph(io.BytesIO(body), chunk_size), TaskGraph.from_tasks(tasks)
+    assert list(graph.ids) == list(expected.ids)
+    for name in ("duration", "memory", "pred_ptr", "pred_idx", "pred_data"):
+        assert np.array_equal(getattr(graph, name), getattr(expected, name)), name
+    assert graph_digest(graph) == graph_digest(expected)
+
+
+def test_stream_multibyte_ids():
+    # Ids of several UTF-8 bytes are cut across chunks
+    tasks = [{"id": "tâche-é", "duration": 1, "memory": 0, "dependencies": []},
+             {"id": "任务", "duration": 2, "memory": 0, "dependencies": ["tâche-é"]}]
+    body = json.dumps({"tasks": tasks}, ensure_ascii=False).encode("utf-8")
+    graph = stream_task_graph(io.BytesIO(body), chunk_size=1)
+    assert list(graph.ids) == ["tâche-é", "任务"]
+    assert graph.predecessors(1).tolist() == [0]
+
+
+def test_text_and_empty_streams():
+    assert list(iter_json_tasks(io.StringIO('{"tasks": []}'))) == []
+    assert list(iter_json_tasks(io.StringIO('{}'))) == []
+    assert list(iter_json_tasks(io.StringIO(' { "tasks" : [ {"id": 1} ] } '), chunk_size=2)) == [{"id": 1}]
+
+
+def test_truncated_stream():
+    body = json.dumps({"tasks": random_tasks(1, 20)}).encode("utf-8")
+    with pytest.raises(ValueError):
+        stream_task_graph(io.BytesIO(body[:-30]), chunk_size=16)
@@ -0,0 +1,119 @@
+import random
+
+import pytest
+
+from incremental import GraphDelta, IncrementalSchedule, apply_delta
+from task_graph import TaskGraph
+from timing import compute_timing
+from util import check_schedule, random_tasks
+
+
+def apply_to_tasks(tasks, delta):
+    """The tasks a delta leads to, still in an order where a task comes after its dependencies."""
+    tasks = {t["id"]: {**t, "dependencies": list(t["dependencies"])} for t in tasks}
+    for node in delta.removed:
+        del tasks[node]
+    for t in tasks.values():
+        t["dependencies"] = [d for d in t["dependencies"] if (d["id"] if isinstance(d, dict) else d) in tasks
+                             and ((d["id"] if isinstance(d, dict) else d), t["id"]) not in delta.removed_edges]
+    for t in delta.added:
+        tasks[t["id"]] = {**t, "dependencies": list(t["dependencies"])}
+    for u, v, size in delta.added_edges:
+        tasks[v]["dependencies"].append({"id": u, "data": size})
+    for node, d in delta.durations.items():
+        tasks[node]["duration"] = d
+    for node, m in delta.memories.items():
+        tasks[node]["memory"] = m
+    return list(tasks.values())
+
+
+def rebuild(tasks, delta):
+    """The graph a delta leads to, built from scratch."""
+    return TaskGraph.from_tasks(apply_to_tasks(tasks, delta))
+
+
+def assert_same_graph(graph, expected):
+    ids = graph.ids
+    assert sorted(ids) == sorted(expected.ids)
+    index = expected.index
+    for i, node in enumerate(ids):
+        j = index[node]
+        assert graph.duration[i] == expected.duration[j]
+        assert graph.memory[i] == expected.memory[j]
+        assert [ids[p] for p in graph.predecessors(i)] == [expected.ids[p] for p in expected.predecessors(j)]
+        assert sorted(ids[s] for s in graph.successors(i)) == sorted(expected.ids[s] for s in expected.successors(j))
+        # Successors in index order, like the builder
+        assert list(graph.successors(i)) == sorted(graph.successors(i))
+    timing, expected_timing = compute_timing(graph), compute_timing(expected)
+    for i, node in enumerate(ids):
+        assert timing.alap[i] == expected_timing.alap[index[node]]
+        assert timing.asap[i] == expected_timing.asap[index[node]]
+
+
+def test_added_tasks_out_of_order():
+    tasks = [{"id": "a", "duration": 1, "memory": 0, "dependencies": []},
+             {"id": "b", "duration": 100, "memory": 0, "dependencies": []}]
+    delta = GraphDelta(added=[{"id": "c", "duration": 1, "memory": 0, "dependencies": ["b"]},
+                              {"id": "d", "duration": 1, "memory": 0, "dependencies": ["a"]}])
+    graph, _ = apply_delta(TaskGraph.from_tasks(tasks), delta)
+    ids = graph.ids
+    assert [ids[s] for s in graph.successors(graph.index["a"])] == ["d"]
+    assert [ids[s] for s in graph.successors(graph.index["b"])] == ["c"]
+    assert_same_graph(graph, rebuild(tasks, delta))
+
+
+def random_delta(rng, tasks, prefix="new"):
+    ids = [t["id"] for t in tasks]
+    removed = rng.sample(ids, rng.randint(0, 3))
+    kept = [node for node in ids if node not in removed]
+    edges = [((d["id"] if isinstance(d, dict) else d), t["id"]) for t in tasks for d in t["dependencies"]]
+    kept_edges = [(u, v) for u, v in edges if u in kept and v in kept]
+    removed_edges = rng.sample(kept_edges, min(len(kept_edges), rng.randint(0, 3)))
+    position = {node: k for k, node in enumerate(ids)}
+    added = []
+    for k in range(rng.randint(0, 5)):
+        deps = rng.sample(kept + [t["id"] for t in added], rng.randint(0, 3))
+        added.append({"id": f"{prefix}{k}", "duration": rng.randint(1, 30), "memory": 0,
+                      "dependencies": [{"id": d, "data": rng.randint(0, 9)} for d in deps]})
+    # New edges go forward in the original order, so the graph stays acyclic
+    added_edges = []
+    for _ in range(rng.randint(0, 5)):
+        u, v = sorted(rng.sample(kept, 2), key=position.get)
+        if (u, v) not in edges and (u, v) not in [e[:2] for e in added_edges]:
+            added_edges.append((u, v, rng.randint(0, 9)))
+    durations = {node: rng.randint(1, 40) for node in rng.sample(kept, rng.randint(0, 3))}
+    return GraphDelta(added, removed, added_edges, removed_edges, durations, {})
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_apply_delta_matches_rebuild(seed):
+    rng = random.Random(seed)
+    tasks = random_tasks(seed, rng.randint(5, 60), data=seed % 2 == 0)
+    delta = random_delta(rng, tasks)
+    graph, _ = apply_delta(TaskGraph.from_tasks(tasks), delta)
+    assert_same_graph(graph, rebuild(tasks, delta))
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_update_keeps_a_valid_schedule(seed):
+    rng = random.Random(seed)
+    tasks = random_tasks(seed, 80)
+    incremental = IncrementalSchedule.schedule(TaskGraph.from_tasks(tasks), 3)
+    for step in range(5):
+        delta = random_delta(rng, tasks, f"new{step}-")
+        result, makespan, _ = incremental.update(delta)
+        expected = rebuild(tasks, delta)
+        assert_same_graph(incremental.graph, expected)
+        check_schedule(incremental.graph, result)
+        assert makespan == int(result.end.max(initial=0))
+        alap = compute_timing(incremental.graph).alap
+        assert sorted(incremental.binding()["order"]) == sorted(zip(alap.tolist(), incremental.graph.ids))
+        tasks = apply_to_tasks(tasks, delta)
+
+
+def test_cycle_is_rejected():
+    tasks = random_tasks(0, 20)
+    incremental = IncrementalSchedule.schedule(TaskGraph.from_tasks(tasks), 2)
+    u, v = "t0", next(t["id"] for t in tasks if "t0" in t["dependencies"])
+    with pytest.raises(ValueError, match="cycle"):
+        incremental.update(GraphDelta(added_edges=[(v, u, 0)]))
@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+import schedule
+from instrumentation import SchedulerStats
+from task_graph import TaskGraph
+from timing import alap_order
+from util import random_tasks
+
+
+def test_laps_and_histogram():
+    stats = SchedulerStats()
+    now = stats.clock()
+    now = stats.lap("setup", now)
+    for _ in range(3):
+        now = stats.selection_lap(now)
+    stats.count("tasks_scheduled", 3)
+    summary = stats.as_dict()
+    assert set(summary["phases"]) == {"setup", "processor_selection"}
+    assert summary["total"] == pytest.approx(sum(summary["phases"].values()))
+    assert summary["counters"] == {"tasks_scheduled": 3}
+    histogram = summary["selection_histogram"]
+    assert sum(bucket["count"] for bucket in histogram) == 3
+    assert [bucket["le_ns"] for bucket in histogram] == sorted(bucket["le_ns"] for bucket in histogram)
+    assert json.loads(json.dumps(summary)) == summary
+
+
+@pytest.mark.parametrize("placement", ["append", "insertion"])
+def test_profiled_run(placement):
+    graph = TaskGraph.from_tasks(random_tasks(0, 200))
+    order, ub = alap_order(graph)
+    stats = SchedulerStats()
+    profiled = schedule.modified_critical_path(graph, 3, {"order": order.copy(), "ub": ub}, stats, placement)
+    plain = schedule.modified_critical_path(graph, 3, {"order": order.copy(), "ub": ub}, None, placement)
+    # Profiling does not change the schedule
+    assert profiled[1] == plain[1]
+    assert [(t.id, t.start_time, t.processor) for t in profiled[0]] == [(t.id, t.start_time, t.processor)
+                                                                       for t in plain[0]]
+
+    counters = stats.counters
+    assert counters["tasks_scheduled"] == 200
+    assert sum(stats.selection_histogram.values()) == 200
+    # Every task with a predecessor is either on its preferred core or pays the penalty
+    with_preds = sum(1 for i in range(graph.num_tasks) if graph.predecessors(i).size)
+    assert counters["preferred_processor_hits"] + counters["com_penalties"] == with_preds
+    assert {"setup", "heap_pop", "processor_selection", "bookkeeping", "successor_release"} <= set(stats.phase_ns)
@@ -0,0 +1,47 @@
+import os
+
+import numpy as np
+import pytest
+
+import main
+from binding_cache import LocalStore
+from graph_cache import GraphCache
+from graph_format import save_task_graph
+from task_graph import TaskGraph
+from util import random_tasks
+
+
+@pytest.fixture
+def bucket(tmp_path, monkeypatch):
+    monkeypatch.setenv("SCHEDULER_STORAGE", str(tmp_path / "buckets"))
+    monkeypatch.setattr(main, "GRAPH_DIR", str(tmp_path / "graphs"))
+    monkeypatch.setattr(main, "local_bindings", LocalStore(str(tmp_path / "bindings")))
+    monkeypatch.setattr(main, "warm_graphs", GraphCache())
+    directory = tmp_path / "buckets" / "b" / "graphs"
+    directory.mkdir(parents=True)
+    return directory
+
+
+def test_new_version_does_not_overwrite_a_mapped_graph(bucket):
+    first, second = TaskGraph.from_tasks(random_tasks(0, 50)), TaskGraph.from_tasks(random_tasks(1, 80))
+    save_task_graph(first, str(bucket / "g.tg"))
+    entry, cache = main.load_graph_binding("b", "graphs/g.tg")
+    assert not cache["hit"]
+
+    save_task_graph(second, str(bucket / "g.tg"))
+    os.utime(bucket / "g.tg", ns=(1, 1))
+    new_entry, cache = main.load_graph_binding("b", "graphs/g.tg")
+    assert not cache["hit"]
+    # The first graph is still mapped, and still intact
+    assert entry.graph.num_tasks == first.num_tasks
+    assert np.array_equal(entry.graph.duration, first.duration)
+    assert np.array_equal(new_entry.graph.duration, second.duration)
+    assert len([name for name in os.listdir(main.GRAPH_DIR) if not name.endswith(".tmp")]) == 2
+
+
+def test_version_downloaded_once(bucket, monkeypatch):
+    save_task_graph(TaskGraph.from_tasks(random_tasks(0, 50)), str(bucket / "g.tg"))
+    main.read_binary_graph("b", "graphs/g.tg")
+    monkeypatch.setattr(main, "download_object", pytest.fail)
+    assert main.read_binary_graph("b", "graphs/g.tg").num_tasks == 50
+    assert main.local_graph_path("b", "graphs/g.tg", "x") != main.local_graph_path("c", "graphs/g.tg", "x")
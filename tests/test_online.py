@@ -0,0 +1,80 @@
+import io
+import json
+
+import pytest
+
+from online import OnlineScheduler, schedule_stream, write_assignments
+from util import random_tasks
+
+
+def check_assignments(tasks, assignments, num_processors):
+    """Every dependency is respected and no two tasks overlap on a processor."""
+    placed = {a.id: a for a in assignments}
+    assert len(placed) == len(tasks)
+    for task in tasks:
+        a = placed[task["id"]]
+        assert 0 <= a.processor < num_processors
+        assert a.end == a.start + task["duration"]
+        for dep in task["dependencies"]:
+            assert placed[dep].end <= a.start, (dep, task["id"])
+    by_core = {}
+    for a in assignments:
+        by_core.setdefault(a.processor, []).append((a.start, a.end))
+    for intervals in by_core.values():
+        intervals.sort()
+        for x, y in zip(intervals, intervals[1:]):
+            assert x[1] <= y[0], (x, y)
+
+
+@pytest.mark.parametrize("placement", ["append", "insertion"])
+@pytest.mark.parametrize("selection", ["affinity", "eft"])
+def test_valid_schedule(placement, selection):
+    tasks = random_tasks(0, 300)
+    scheduler = OnlineScheduler.on_cores(4, placement, selection)
+    assignments = [scheduler.submit(t["id"], t["duration"], t["memory"], t["dependencies"]) for t in tasks]
+    check_assignments(tasks, assignments, 4)
+
+
+@pytest.mark.parametrize("placement", ["append", "insertion"])
+def test_clock_and_retirement(placement):
+    tasks = random_tasks(1, 300)
+    scheduler = OnlineScheduler.on_cores(3, placement)
+    assignments = []
+    for k, task in enumerate(tasks):
+        if k % 20 == 0:
+            now = scheduler.now + 15
+            running = {node for node, (end, _) in scheduler.tasks.items() if end > now}
+            scheduler.advance(now)
+            # Only the tasks still running are kept
+            assert set(scheduler.tasks) == running
+        a = scheduler.submit(task["id"], task["duration"], task["memory"], task["dependencies"])
+        assert a.start >= scheduler.now
+        assignments.append(a)
+    # Retired predecessors are done: the dependencies still hold
+    check_assignments(tasks, assignments, 3)
+
+
+def test_errors():
+    scheduler = OnlineScheduler.on_cores(2)
+    scheduler.submit("a", 5)
+    with pytest.raises(ValueError, match="defined twice"):
+        scheduler.submit("a", 5)
+    scheduler.advance(10)
+    with pytest.raises(ValueError, match="cannot go back"):
+        scheduler.advance(9)
+    # An unknown dependency is a task already done
+    assert scheduler.submit("b", 1, dependencies=["x"]).start == 10
+
+
+def test_schedule_stream():
+    lines = [json.dumps({"id": "a", "duration": 4, "memory": 10, "dependencies": []}),
+             "",
+             json.dumps({"id": "b", "duration": 3, "dependencies": ["a"]}),
+             json.dumps({"time": 20}),
+             json.dumps({"id": "c", "duration": 1, "dependencies": ["b"], "time": 25})]
+    out = io.StringIO()
+    write_assignments(schedule_stream(OnlineScheduler.on_cores(2), lines), out)
+    rows = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert rows == [{"id": "a", "processor": 0, "start": 0, "end": 4},
+                    {"id": "b", "processor": 0, "start": 4, "end": 7},
+                    {"id": "c", "processor": rows[2]["processor"], "start": 25, "end": 26}]
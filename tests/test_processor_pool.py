@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+from processor_pool import ProcessorPool
+
+
+def brute_earliest(pool, view, exclude=None, limit=None, start=0):
+    candidates = [p for p in view[start:limit] if p != exclude]
+    if not candidates:
+        return None
+    best = min(pool.times[p] for p in candidates)
+    return next(p for p in candidates if pool.times[p] == best)
+
+
+def brute_first_idle(pool, view, t, exclude=None, limit=None, start=0):
+    return next((p for p in view[start:limit] if p != exclude and pool.times[p] <= t), None)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_linear_scans(seed):
+    rng = random.Random(seed)
+    processors = list(range(13))
+    views = [rng.sample(processors, len(processors)), [p for p in processors if p % 3], [7, 2, 11]]
+    pool = ProcessorPool(views, {p: rng.randint(0, 5) for p in processors})
+    for _ in range(500):
+        pool.assign(rng.choice(processors), rng.randint(0, 30))
+        v = rng.randrange(len(views))
+        view = views[v]
+        exclude = rng.choice([None, rng.choice(processors)])
+        limit = rng.choice([None, rng.randint(0, len(view) + 2)])
+        start = rng.choice([0, rng.randint(0, len(view) + 1)])
+        t = rng.randint(0, 30)
+        assert pool.earliest(v, exclude, limit, start) == brute_earliest(pool, view, exclude, limit, start)
+        assert pool.first_idle(t, v, exclude, limit, start) == brute_first_idle(pool, view, t, exclude, limit, start)
+        assert pool.min_time(v) == min(pool.times[p] for p in view)
+
+
+def test_exclude_is_restored():
+    pool = ProcessorPool.from_processors([0, 1, 2])
+    pool.assign(0, 1)
+    pool.assign(1, 5)
+    pool.assign(2, 3)
+    assert pool.earliest(exclude=0) == 2
+    assert pool.earliest() == 0
+    # A processor outside the view changes nothing
+    assert pool.earliest(exclude=9) == 0
+
+
+def test_ties_and_empty():
+    pool = ProcessorPool([[3, 1, 2], []], {1: 4, 2: 4, 3: 4})
+    assert pool.earliest() == 3
+    assert pool.first_idle(3) is None
+    assert pool.first_idle(4, limit=2) == 3
+    assert pool.earliest(1) is None
+    assert 3 in pool and 9 not in pool
+    pool.set_views([[2, 1]])
+    assert pool.earliest() == 2
+    assert 3 not in pool
@@ -0,0 +1,38 @@
+import pytest
+
+import schedule_memory
+from batch import parse_processors, scheduler_for
+from ready_list import ready_list_schedule
+from task_graph import TaskGraph
+from timing import alap_order
+from util import check_schedule, random_tasks
+
+PROCESSORS = {"0": [[0, 1, 2], [3, 4]], "40": [[0, 1], [3, 4, 5]]}
+
+
+def rows(result):
+    return [(task.id, task.start_time, task.processor) for task in result]
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("placement", ["append", "insertion"])
+def test_same_schedule_as_schedule_memory(seed, placement):
+    graph = TaskGraph.from_tasks(random_tasks(seed, 200))
+    order, ub = alap_order(graph)
+    processors = parse_processors(PROCESSORS)
+    result, makespan, _, _ = ready_list_schedule(graph, processors, 512, {"order": order.copy(), "ub": ub},
+                                                 placement=placement)
+    check_schedule(graph, result)
+    expected, expected_makespan, _, _ = schedule_memory.modified_critical_path(
+        graph, processors, 512, {"order": order.copy(), "ub": ub}, placement=placement)
+    assert rows(result) == rows(expected)
+    assert makespan == expected_makespan
+
+
+def test_batch_option():
+    graph = TaskGraph.from_tasks(random_tasks(4, 150))
+    order, ub = alap_order(graph)
+    config = {"processors": PROCESSORS, "mem_lim": 512}
+    result, makespan = scheduler_for({**config, "scheduler": "ready_list"})(graph, {"order": order.copy(), "ub": ub})
+    expected, expected_makespan = scheduler_for(config)(graph, {"order": order.copy(), "ub": ub})
+    assert rows(result) == rows(expected) and makespan == expected_makespan
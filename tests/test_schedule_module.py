@@ -0,0 +1,91 @@
+import pytest
+
+import schedule_module
+from batch import parse_processors
+from communication import CommunicationModel
+from failures import Failure, FailureTrace
+from task_graph import TaskGraph
+from timing import alap_order
+from util import check_schedule, random_tasks
+
+
+def binding(graph):
+    order, ub = alap_order(graph)
+    return {"order": order, "ub": ub}
+
+
+def check_no_start_while_down(result, trace):
+    for task in result:
+        assert trace.down_until(task.processor, task.start_time) is None, task
+
+
+TRACE = FailureTrace([Failure(0, 510, 591), Failure(0, 734, 973), Failure(2, 231, 472)])
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("placement", ["append", "insertion"])
+@pytest.mark.parametrize("selection", ["affinity", "eft"])
+def test_no_task_starts_on_a_failed_core(seed, placement, selection):
+    graph = TaskGraph.from_tasks(random_tasks(seed, 300))
+    for processors in ({0: 4}, {0: 2, 300: 4, 700: 3}):
+        result, _, _, _ = schedule_module.modified_critical_path(graph, parse_processors(processors), binding(graph),
+                                                                 placement=placement, selection=selection,
+                                                                 failures=TRACE)
+        check_schedule(graph, result)
+        check_no_start_while_down(result, TRACE)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_no_task_starts_on_a_failed_core_with_communication(seed):
+    graph = TaskGraph.from_tasks(random_tasks(seed, 300, data=True))
+    communication = CommunicationModel.from_dict({"latency": 2, "bandwidth": 10})
+    result, _, _, _ = schedule_module.modified_critical_path(graph, parse_processors({0: 4}), binding(graph),
+                                                             communication=communication, failures=TRACE)
+    check_schedule(graph, result)
+    check_no_start_while_down(result, TRACE)
+
+
+def test_no_task_starts_after_the_default_failure():
+    # Used to start a task on core 0 after it failed for good
+    graph = TaskGraph.from_tasks(random_tasks(4, 2000))
+    result, _, _, _ = schedule_module.modified_critical_path(graph, parse_processors({0: 4}), binding(graph))
+    check_schedule(graph, result)
+    check_no_start_while_down(result, schedule_module.DEFAULT_FAILURES)
+
+
+def chain(n, roots=()):
+    """n tasks of 100 one after the other, the first one after the roots (tasks of 10)."""
+    tasks = [{"id": root, "duration": 10, "memory": 0, "dependencies": []} for root in roots]
+    tasks += [{"id": f"t{i}", "duration": 100, "memory": 0, "dependencies": [f"t{i-1}"] if i else list(roots)}
+              for i in range(n)]
+    return TaskGraph.from_tasks(tasks)
+
+
+@pytest.mark.parametrize("placement, selection", [("append", "affinity"), ("append", "eft"),
+                                                  ("insertion", "affinity"), ("insertion", "eft")])
+def test_every_core_down_for_good(placement, selection):
+    # Core 0 fails for good at 1500 in the default trace
+    graph = chain(20, ["a", "b"])
+    data = binding(graph)
+    result, _, _, _ = schedule_module.modified_critical_path(graph, parse_processors({0: 2, 10: 1}), data,
+                                                             placement=placement, selection=selection)
+    check_schedule(graph, result)
+    check_no_start_while_down(result, schedule_module.DEFAULT_FAILURES)
+    # Core 1, removed at 10, takes the rest once it is free, from the upper bound
+    assert [(task.start_time, task.processor) for task in result if task.start_time >= 1500][0] == (data["ub"], 1)
+
+    graph = chain(20)
+    with pytest.raises(ValueError, match="Every core is down for good"):
+        schedule_module.modified_critical_path(graph, parse_processors({0: 1}), binding(graph),
+                                               placement=placement, selection=selection)
+
+
+def test_eft_falls_back_like_append():
+    # Used to return a start at infinity once core 0 failed for good
+    graph = chain(20)
+    makespans = [schedule_module.modified_critical_path(graph, parse_processors({0: 2, 1000: 1}), binding(graph),
+                                                        selection=selection)[1]
+                 for selection in ("affinity", "eft")]
+    assert makespans == [2400, 2400]
+    with pytest.raises(ValueError, match="Every core is down for good"):
+        schedule_module.modified_critical_path(graph, parse_processors({0: 1}), binding(graph), selection="eft")
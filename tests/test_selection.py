@@ -0,0 +1,48 @@
+import random
+
+import pytest
+
+from communication import Arrival
+from processor_pool import ProcessorPool
+from selection import check_selection, earliest_finish, penalty_model
+
+
+def test_earliest_finish():
+    arrival = Arrival(penalty_model(5))
+    arrival.add(10, 0, 0)
+    arrival.add(12, 1, 0)
+    times = {0: 30, 1: 12, 2: 0, 3: 0}
+    # 1 has its own input at 12 and the one of 0 at 15, 2 gets both at 17
+    assert earliest_finish([0, 1, 2, None], arrival, times) == (1, 15)
+    assert earliest_finish([0, 2], arrival, times) == (2, 17)
+    # Ties go to the lowest processor
+    assert earliest_finish([3, 2], arrival, times) == (2, 17)
+    assert earliest_finish([0, 1, 2], arrival, times, not_before=40) == (0, 40)
+    assert earliest_finish([0, 1, 2], arrival, times, fits=lambda p, start: start >= 17) == (2, 17)
+    assert earliest_finish([None], arrival, times) is None
+    assert earliest_finish([0, 1], arrival, times, fits=lambda p, start: False) is None
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_predecessor_cores_and_earliest_core_suffice(seed):
+    # The candidates of the eft selection give the best start over all the cores,
+    # though not always on the lowest core among those giving it
+    rng = random.Random(seed)
+    processors = range(8)
+    pool = ProcessorPool.from_processors(processors)
+    for p in processors:
+        pool.assign(p, rng.randint(0, 50))
+    arrival = Arrival(penalty_model(rng.randint(0, 10)))
+    for _ in range(rng.randint(1, 4)):
+        arrival.add(rng.randint(0, 50), rng.choice(processors), 0)
+    best = min(max(arrival.on(p), pool.times[p]) for p in processors)
+    candidates = [*arrival.local, pool.earliest()]
+    processor, start = earliest_finish(candidates, arrival, pool.times)
+    assert start == best
+    assert processor == min(p for p in candidates if max(arrival.on(p), pool.times[p]) == best)
+
+
+def test_check_selection():
+    check_selection("eft")
+    with pytest.raises(ValueError, match="Unknown selection"):
+        check_selection("heft")
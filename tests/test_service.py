@@ -0,0 +1,103 @@
+import asyncio
+import json
+
+import pytest
+
+from batch import run_config
+from service import HttpError, ScheduleService
+from task_graph import TaskGraph, graph_digest
+from timing import alap_order
+from util import random_tasks
+
+CONFIGS = [{"nodes": 4}, {"nodes": 3, "placement": "insertion"}, {"nodes": 2, "mem_lim": 512}]
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = ScheduleService(str(tmp_path / "spool"), workers=1)
+    yield service
+    service.close()
+
+
+def expected(tasks, config):
+    graph = TaskGraph.from_tasks(tasks)
+    order, ub = alap_order(graph)
+    return json.loads(json.dumps(run_config(graph, {"order": order, "ub": ub}, config)))
+
+
+def request(service, method, path, body):
+    return json.loads(asyncio.run(service.dispatch(method, path, json.dumps(body).encode("utf-8"))))
+
+
+@pytest.mark.parametrize("config", CONFIGS)
+def test_schedule_registered_body(service, config):
+    tasks = random_tasks(0, 150)
+    registered = request(service, "POST", "/graphs", {"tasks": tasks})
+    assert registered == {"graph": graph_digest(TaskGraph.from_tasks(tasks)), "tasks": 150}
+    assert request(service, "POST", "/schedule", {"graph": registered["graph"], **config}) == expected(tasks, config)
+
+
+def test_schedule_by_path(service, tmp_path):
+    tasks = random_tasks(1, 100)
+    path = tmp_path / "g.json"
+    path.write_text(json.dumps({"tasks": tasks}))
+    result = request(service, "POST", "/schedule", {"path": str(path), "nodes": 4, "schedule": False})
+    assert "schedule" not in result
+    assert result["makespan"] == expected(tasks, {"nodes": 4})["makespan"]
+    # Registered once, by the schedule request
+    assert request(service, "POST", "/graphs", {"path": str(path)})["tasks"] == 100
+
+
+def test_errors(service):
+    with pytest.raises(HttpError) as e:
+        request(service, "POST", "/schedule", {"graph": "0" * 40, "nodes": 4})
+    assert e.value.status == 404
+    with pytest.raises(HttpError) as e:
+        request(service, "GET", "/graphs", {})
+    assert e.value.status == 405
+    with pytest.raises(HttpError) as e:
+        request(service, "POST", "/graphs", {"path": "no/such/file.json"})
+    assert e.value.status == 404
+
+
+def test_turned_down_past_max_pending(tmp_path):
+    service = ScheduleService(str(tmp_path / "spool"), workers=1, max_pending=0)
+    try:
+        with pytest.raises(HttpError) as e:
+            request(service, "POST", "/graphs", {"tasks": random_tasks(2, 10)})
+        assert e.value.status == 503
+        assert service.metrics()["rejected"] == 1
+    finally:
+        service.close()
+
+
+def test_http(service):
+    tasks = random_tasks(3, 50)
+
+    async def exchange():
+        server = await asyncio.start_server(service.handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        responses = []
+        for method, path, body in (("POST", "/graphs", {"tasks": tasks}), ("POST", "/schedule", {"nodes": 2}),
+                                   ("GET", "/metrics", None)):
+            payload = b"" if body is None else json.dumps(body).encode("utf-8")
+            writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(payload)}\r\n\r\n".encode("latin-1")
+                         + payload)
+            status = (await reader.readline()).split()[1]
+            headers = {}
+            while (line := await reader.readline()) != b"\r\n":
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            responses.append((int(status), json.loads(await reader.readexactly(int(headers["content-length"])))))
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return responses
+
+    (status, registered), (bad_status, error), (_, metrics) = asyncio.run(exchange())
+    assert status == 200 and registered["tasks"] == 50
+    # No graph given
+    assert bad_status == 404 and "Unknown graph" in error["error"]
+    assert metrics["routes"]["/graphs"]["count"] == 1
+    assert metrics["routes"]["/schedule"]["errors"] == 1
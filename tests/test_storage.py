@@ -0,0 +1,94 @@
+import gzip
+import io
+import os
+
+import pytest
+
+import storage as storage_module
+from storage import FileStorage, PrefixStore, RangedReader, S3Storage, Uploads, download_object, open_object
+
+DATA = bytes(range(256)) * 1000
+
+
+class FakeClient:
+    """The get_object calls of an S3 client, served from a bytes object."""
+
+    def __init__(self, data, etag):
+        self.data, self.etag = data, etag
+        self.calls = []
+
+    def get_object(self, Bucket, Key, Range=None, IfMatch=None):
+        self.calls.append({"Range": Range, "IfMatch": IfMatch})
+        if IfMatch is not None and IfMatch != self.etag:
+            raise IOError("PreconditionFailed")
+        if Range is None:
+            return {"Body": io.BytesIO(self.data)}
+        start, end = map(int, Range[len("bytes="):].split("-"))
+        return {"Body": io.BytesIO(self.data[start:end + 1])}
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = FileStorage(str(tmp_path))
+    storage.put("graphs/data.bin", DATA)
+    storage.put("graphs/data.bin.gz", gzip.compress(DATA))
+    return storage
+
+
+@pytest.mark.parametrize("part_size", [1000, 4096, len(DATA)])
+def test_ranged_reader(storage, part_size):
+    head = storage.head("graphs/data.bin")
+    with RangedReader(storage, "graphs/data.bin", head.size, part_size, etag=head.etag) as reader:
+        assert io.BufferedReader(reader).read() == DATA
+
+
+@pytest.mark.parametrize("ranged_min_size", [0, storage_module.RANGED_MIN_SIZE])
+def test_open_object(storage, tmp_path, monkeypatch, ranged_min_size):
+    monkeypatch.setattr(storage_module, "RANGED_MIN_SIZE", ranged_min_size)
+    for key in ("graphs/data.bin", "graphs/data.bin.gz"):
+        head = storage.head(key)
+        with open_object(storage, key, head.size, part_size=1 << 14, etag=head.etag) as body:
+            assert body.read() == DATA
+        for etag in (head.etag, None):
+            download_object(storage, key, str(tmp_path / "copy"), head.size, etag)
+            assert (tmp_path / "copy").read_bytes() == DATA
+
+
+def test_changed_object_fails(storage, tmp_path, monkeypatch):
+    monkeypatch.setattr(storage_module, "RANGED_MIN_SIZE", 0)
+    head = storage.head("graphs/data.bin")
+    storage.put("graphs/data.bin", DATA[::-1])
+    os.utime(storage.path("graphs/data.bin"), ns=(1, 1))
+    with pytest.raises(IOError):
+        with open_object(storage, "graphs/data.bin", head.size, part_size=1 << 14, etag=head.etag) as body:
+            body.read()
+    with pytest.raises(IOError):
+        download_object(storage, "graphs/data.bin", str(tmp_path / "copy"), head.size, head.etag)
+
+
+def test_s3_ranged_reads_send_the_etag(monkeypatch):
+    monkeypatch.setattr(storage_module, "RANGED_MIN_SIZE", 0)
+    client = FakeClient(DATA, '"v1"')
+    storage = S3Storage("bucket", client)
+    with open_object(storage, "data.bin", len(DATA), part_size=1 << 14, etag='"v1"') as body:
+        assert body.read() == DATA
+    assert len(client.calls) == -(-len(DATA) // (1 << 14))
+    assert all(call["IfMatch"] == '"v1"' and call["Range"] for call in client.calls)
+    with open_object(storage, "data.bin", etag='"v1"') as body:
+        assert body.read() == DATA
+    assert client.calls[-1] == {"Range": None, "IfMatch": '"v1"'}
+    client.etag = '"v2"'
+    with pytest.raises(IOError):
+        with open_object(storage, "data.bin", len(DATA), part_size=1 << 14, etag='"v1"') as body:
+            body.read()
+
+
+def test_prefix_store(storage):
+    uploads = Uploads()
+    store = PrefixStore(storage, codec="gzip", uploads=uploads)
+    store.put("k", b"binding")
+    uploads.wait()
+    assert storage.get("bindings/k.gz") == gzip.compress(b"binding", 6, mtime=0)
+    assert store.get("k") == b"binding"
+    store.delete("k")
+    assert store.get("k") is None
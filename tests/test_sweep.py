@@ -0,0 +1,87 @@
+import os
+import time
+
+import pytest
+
+import sweep
+from sweep import expand_grid, read_results, run_sweep
+
+GRID = {"sizes": [[60, 3]], "seeds": [1, 2], "configs": [{"name": "2 cores", "nodes": 2}, {"nodes": 3}],
+        "cached_binding": [False, True]}
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    # Graphs go to input_data/ and bindings to bindings/, relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("input_data")
+
+
+def test_grid_expansion():
+    jobs = expand_grid({**GRID, "repeats": 2})
+    assert len(jobs) == 1 * 2 * 2 * 2 * 2
+    assert len({job.key for job in jobs}) == len(jobs)
+    assert jobs[0].config_name == "2 cores" and jobs[4].config_name == '{"nodes": 3}'
+
+
+def test_runs_and_resumes(monkeypatch):
+    rows = run_sweep(GRID, "results.csv", max_workers=2)
+    assert [row["job"] for row in rows] == [job.key for job in expand_grid(GRID)]
+    assert all(row["status"] == "ok" for row in rows)
+    assert all(int(row["makespan"]) >= int(row["critical_path_length"]) for row in rows)
+    # Cold and cached bindings give the same schedules
+    makespans = {(row["seed"], row["config"], row["cached_binding"]): row["makespan"] for row in rows}
+    assert all(makespans[seed, config, "True"] == makespans[seed, config, "False"] for seed, config, _ in makespans)
+
+    # Nothing left to run: no job process is started
+    def no_job(*args, **kwargs):
+        raise AssertionError("job started again")
+    monkeypatch.setattr(sweep.mp, "Process", no_job)
+    assert run_sweep(GRID, "results.csv", max_workers=2) == rows
+
+
+def test_only_unfinished_jobs_run_again():
+    grid = {**GRID, "seeds": [1], "cached_binding": [False]}
+    run_sweep(grid, "results.csv", max_workers=2)
+    with open("results.csv") as f:
+        lines = f.readlines()
+    # Drop the last job as if the sweep had been interrupted
+    with open("results.csv", "w") as f:
+        f.writelines(lines[:-1])
+    rows = run_sweep(grid, "results.csv", max_workers=2)
+    assert [row["status"] for row in rows] == ["ok", "ok"]
+    with open("results.csv") as f:
+        assert len(f.readlines()) == len(lines)
+
+
+def test_timeout_and_errors(monkeypatch):
+    run_job = sweep.run_job
+
+    def slow_or_failing(job):
+        if job.config.get("nodes") == 3:
+            time.sleep(30)
+        if job.seed == 2:
+            raise RuntimeError("boom")
+        return run_job(job)
+
+    # The job processes are forked and see the patched function
+    monkeypatch.setattr(sweep, "run_job", slow_or_failing)
+    start = time.monotonic()
+    rows = run_sweep({**GRID, "cached_binding": [False]}, "results.csv", max_workers=4, timeout=1.0)
+    assert time.monotonic() - start < 20
+    status = {(row["seed"], row["config"]): (row["status"], row["error"]) for row in rows}
+    assert status["1", "2 cores"] == ("ok", "")
+    assert status["2", "2 cores"] == ("error", "RuntimeError('boom')")
+    assert status["1", '{"nodes": 3}'] == ("timeout", "killed after 1.0s")
+
+    # Failed and timed out jobs run again, the successful one does not
+    monkeypatch.setattr(sweep, "run_job", run_job)
+    rows = run_sweep({**GRID, "cached_binding": [False]}, "results.csv", max_workers=4)
+    assert all(row["status"] == "ok" for row in rows)
+    assert len(read_results("results.csv")) == 4
+
+
+def test_crashed_job(monkeypatch):
+    monkeypatch.setattr(sweep, "run_job", lambda job: os._exit(3))
+    rows = run_sweep({**GRID, "seeds": [1], "configs": [{"nodes": 2}], "cached_binding": [False]}, "results.csv", 1)
+    assert [(row["status"], row["error"]) for row in rows] == [("crashed", "exit code 3")]
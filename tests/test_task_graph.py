@@ -0,0 +1,132 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+from task_graph import TaskGraph, TaskGraphBuilder, graph_digest
+from util import random_tasks
+
+
+def nx_graph(tasks):
+    """Graph of the networkx build_graph the TaskGraph replaced."""
+    G = nx.DiGraph()
+    for task in tasks:
+        G.add_node(task["id"], duration=task["duration"], memory=task["memory"])
+        for dep in task["dependencies"]:
+            G.add_edge(dep, task["id"])
+    return G
+
+
+def check_same(graph, G, successor_order=True):
+    assert list(graph.ids) == list(G.nodes)
+    ids, index = graph.ids, graph.index
+    for i, node in enumerate(G.nodes):
+        assert index[node] == i
+        assert graph.duration[i] == G.nodes[node]["duration"]
+        assert graph.memory[i] == G.nodes[node]["memory"]
+        assert [ids[p] for p in graph.predecessors(i).tolist()] == list(G.predecessors(node))
+        successors = [ids[s] for s in graph.successors(i).tolist()]
+        if successor_order:
+            assert successors == list(G.successors(node))
+        else:
+            assert sorted(successors) == sorted(G.successors(node))
+    assert graph.number_of_edges() == G.number_of_edges()
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_networkx(seed):
+    tasks = random_tasks(seed, 200)
+    check_same(TaskGraph.from_tasks(tasks), nx_graph(tasks))
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_forward_references(seed):
+    # Tasks listed in reverse: every dependency is referenced before its own task.
+    # Successors then come in index order, networkx keeps the order tasks are defined in
+    tasks = random_tasks(seed, 100)[::-1]
+    check_same(TaskGraph.from_tasks(tasks), nx_graph(tasks), successor_order=False)
+
+
+def test_duplicate_dependencies_collapse():
+    tasks = [{"id": "a", "duration": 1, "memory": 0, "dependencies": []},
+             {"id": "b", "duration": 2, "memory": 0, "dependencies": ["a", "a"]},
+             {"id": "c", "duration": 3, "memory": 0,
+              "dependencies": [{"id": "a", "data": 5}, {"id": "b", "data": 1}, {"id": "a", "data": 7}]}]
+    graph = TaskGraph.from_tasks(tasks)
+    assert graph.predecessors(1).tolist() == [0]
+    assert graph.predecessors(2).tolist() == [0, 1]
+    # b declared no data, a keeps the largest of its sizes
+    assert graph.pred_data.tolist() == [0, 7, 1]
+
+
+def test_edge_data():
+    tasks = random_tasks(0, 100, data=True)
+    graph = TaskGraph.from_tasks(tasks)
+    for i, task in enumerate(tasks):
+        ptr = graph.pred_ptr
+        assert graph.pred_data[ptr[i]:ptr[i+1]].tolist() == [dep["data"] for dep in task["dependencies"]]
+
+
+def test_networkx_roundtrip():
+    graph = TaskGraph.from_tasks(random_tasks(1, 100, data=True))
+    again = TaskGraph.from_networkx(graph.to_networkx())
+    assert graph_digest(again) == graph_digest(graph)
+
+
+def test_topological_order():
+    graph = TaskGraph.from_tasks(random_tasks(2, 200)[::-1])
+    position = np.empty(graph.num_tasks, dtype=np.int64)
+    position[graph.topological_order()] = np.arange(graph.num_tasks)
+    for i in range(graph.num_tasks):
+        assert all(position[p] < position[i] for p in graph.predecessors(i).tolist())
+
+
+def test_integral_floats_are_accepted():
+    builder = TaskGraphBuilder()
+    builder.add_task("a", 3.0, 100.0, [])
+    builder.add_task("b", 2, 0, [{"id": "a", "data": 8.0}])
+    graph = builder.build()
+    assert graph.duration.tolist() == [3, 2]
+    assert graph.memory.tolist() == [100, 0]
+    assert graph.pred_data.tolist() == [8]
+
+
+@pytest.mark.parametrize("field, value, message", [
+    ("duration", 1.5, "Task 'b': duration must be an integer, got 1.5"),
+    ("memory", 0.25, "Task 'b': memory must be an integer, got 0.25"),
+    ("duration", "3", "Task 'b': duration must be an integer, got '3'"),
+    ("memory", None, "Task 'b': memory must be an integer, got None"),
+])
+def test_non_integer_attributes(field, value, message):
+    task = {"id": "b", "duration": 1, "memory": 0, "dependencies": ["a"]}
+    task[field] = value
+    with pytest.raises(ValueError) as e:
+        TaskGraph.from_tasks([{"id": "a", "duration": 1, "memory": 0, "dependencies": []}, task])
+    assert str(e.value) == message
+
+
+def test_non_integer_data_size():
+    with pytest.raises(ValueError, match="Task 'b': data size must be an integer, got 2.5"):
+        TaskGraph.from_tasks([{"id": "a", "duration": 1, "memory": 0, "dependencies": []},
+                              {"id": "b", "duration": 1, "memory": 0, "dependencies": [{"id": "a", "data": 2.5}]}])
+
+
+def test_defined_twice():
+    builder = TaskGraphBuilder()
+    builder.add_task("a", 1, 0, [])
+    with pytest.raises(ValueError, match="defined twice"):
+        builder.add_task("a", 1, 0, [])
+
+
+def test_unknown_dependency():
+    with pytest.raises(ValueError, match="Unknown dependencies"):
+        TaskGraph.from_tasks([{"id": "a", "duration": 1, "memory": 0, "dependencies": ["x"]}])
+
+
+def test_dependencies_from_a_generator():
+    builder = TaskGraphBuilder()
+    builder.add_task("a", 1, 0, iter([]))
+    builder.add_task("c", 1, 0, (dep for dep in ["a", "b"]))
+    builder.add_task("b", 1, 0, (dep for dep in [{"id": "a", "data": 4}]))
+    graph = builder.build()
+    assert [graph.ids[p] for p in graph.predecessors(graph.index["c"]).tolist()] == ["a", "b"]
+    assert [graph.ids[p] for p in graph.predecessors(graph.index["b"]).tolist()] == ["a"]
@@ -0,0 +1,95 @@
+import random
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from graph import find_critical_path
+from task_graph import TaskGraph
+from timing import _topological_positions, compute_timing
+from util import random_tasks
+
+
+def baseline_critical_path(tasks):
+    """graph.find_critical_path before the TaskGraph port."""
+    dag = nx.DiGraph()
+    for task in tasks:
+        dag.add_node(task["id"], duration=task["duration"])
+        for dep in task["dependencies"]:
+            dag.add_edge(dep, task["id"])
+    longest_path_length = {node: 0 for node in dag.nodes}
+    predecessor = {node: None for node in dag.nodes}
+    for node in nx.topological_sort(dag):
+        for succ in dag.successors(node):
+            new_length = longest_path_length[node] + dag.nodes[node]["duration"]
+            if new_length > longest_path_length[succ]:
+                longest_path_length[succ] = new_length
+                predecessor[succ] = node
+    end_node = max(longest_path_length, key=longest_path_length.get)
+    critical_path = []
+    node = end_node
+    while node is not None:
+        critical_path.append(node)
+        node = predecessor[node]
+    return list(reversed(critical_path)), longest_path_length[end_node]
+
+
+def tied_tasks(seed, n):
+    """Random DAG whose durations are mostly equal, so that many paths tie."""
+    rng = random.Random(seed)
+    return [{"id": i, "duration": rng.choice([1, 1, 1, 2, 0]), "memory": 0,
+             "dependencies": rng.sample(range(i), min(i, rng.randint(0, 4)))} for i in range(n)]
+
+
+def test_tie_keeps_the_first_predecessor():
+    tasks = [{"id": 0, "duration": 1, "memory": 0, "dependencies": []},
+             {"id": 1, "duration": 1, "memory": 0, "dependencies": []},
+             {"id": 2, "duration": 1, "memory": 0, "dependencies": [1, 0]}]
+    assert find_critical_path(TaskGraph.from_tasks(tasks)) == ([0, 2], 1)
+    assert baseline_critical_path(tasks) == ([0, 2], 1)
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_critical_path_matches_baseline(seed):
+    tasks = tied_tasks(seed, random.Random(seed).randint(1, 200))
+    assert find_critical_path(TaskGraph.from_tasks(tasks)) == baseline_critical_path(tasks)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_positions_follow_networkx(seed):
+    tasks = random_tasks(seed, 300)
+    graph = TaskGraph.from_tasks(tasks)
+    dag = nx.DiGraph()
+    for task in tasks:
+        dag.add_node(task["id"])
+        dag.add_edges_from((dep, task["id"]) for dep in task["dependencies"])
+    position = _topological_positions(graph, graph.topological_levels())
+    assert [graph.ids[i] for i in np.argsort(position)] == list(nx.topological_sort(dag))
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_asap_alap(seed):
+    tasks = random_tasks(seed, 200)
+    graph = TaskGraph.from_tasks(tasks)
+    timing = compute_timing(graph)
+    finish = timing.asap + graph.duration
+    for i in range(graph.num_tasks):
+        preds = graph.predecessors(i)
+        assert timing.asap[i] == max(finish[preds], default=0)
+        succ = graph.successors(i)
+        assert timing.alap[i] == min(timing.alap[succ], default=0) - graph.duration[i]
+    assert timing.critical_length == timing.asap.max()
+    assert (timing.slack >= 0).all()
+
+
+def test_bindings_still_importable_from_the_schedulers():
+    import schedule
+    import schedule_memory
+    import schedule_module
+    import timing
+    for module in (schedule, schedule_module, schedule_memory):
+        assert module.alap_binding is timing.alap_binding and module.asap_binding is timing.asap_binding
+    graph = TaskGraph.from_tasks(random_tasks(0, 50))
+    alap, ub = schedule.alap_binding(graph)
+    assert min(alap.values()) == -(compute_timing(graph).asap + graph.duration).max()
+    assert ub == graph.duration.sum()
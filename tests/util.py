@@ -0,0 +1,33 @@
+import random
+from typing import Any
+
+
+def random_tasks(seed: int, n: int, max_deps: int = 3, data: bool = False) -> list[dict[str, Any]]:
+    """Tasks of a random DAG, in the JSON task file format, dependencies on earlier tasks only."""
+    rng = random.Random(seed)
+    tasks = []
+    for i in range(n):
+        deps = rng.sample(range(i), min(i, rng.randint(0, max_deps)))
+        tasks.append({"id": f"t{i}", "duration": rng.randint(1, 20), "memory": rng.choice([0, 100, 600]),
+                      "dependencies": [{"id": f"t{d}", "data": rng.randint(0, 50)} if data else f"t{d}" for d in deps]})
+    return tasks
+
+
+def check_schedule(graph, result):
+    """Every dependency is respected and no two tasks overlap on a processor."""
+    start, end, processor = {}, {}, {}
+    for task in result:
+        start[task.id], end[task.id], processor[task.id] = task.start_time, task.end_time, task.processor
+    assert len(start) == graph.num_tasks
+    ids = graph.ids
+    for i in range(graph.num_tasks):
+        for pred in graph.predecessors(i).tolist():
+            assert end[ids[pred]] <= start[ids[i]], (ids[pred], ids[i])
+    by_core: dict[int, list[tuple[int, int]]] = {}
+    for node in start:
+        if end[node] > start[node]:
+            by_core.setdefault(processor[node], []).append((start[node], end[node]))
+    for intervals in by_core.values():
+        intervals.sort()
+        for a, b in zip(intervals, intervals[1:]):
+            assert a[1] <= b[0], (a, b)
@@ -0,0 +1,158 @@
+import heapq
+from typing import Any, NamedTuple, Optional
+
+import numpy as np
+
+from task_graph import TaskGraph, as_task_graph, csr_segments
+
+# Version of the binding (ALAP priority heap) computed by alap_order, bump it
+# whenever the priorities or their tie-breaking change so that cached
+# bindings get rebuilt
+BINDING_VERSION = 1
+
+
+class Timing(NamedTuple):
+    levels: list[np.ndarray]
+    asap: np.ndarray
+    alap: np.ndarray
+    slack: np.ndarray
+    ub: int
+    critical_path: list[int]
+    critical_length: int
+
+
+def _reduce_edges(ufunc: np.ufunc, ptr: np.ndarray, idx: np.ndarray, nodes: np.ndarray,
+                  values: np.ndarray) -> np.ndarray:
+    """ufunc-reduce ``values`` over the CSR neighbours of each node (all must have some)."""
+    counts = ptr[nodes + 1] - ptr[nodes]
+    edges = csr_segments(ptr[nodes], counts)
+    starts = np.cumsum(counts) - counts
+    return ufunc.reduceat(values[idx[edges]], starts)
+
+
+def _topological_positions(graph: TaskGraph, levels: list[np.ndarray]) -> np.ndarray:
+    """
+    Rank of every task in the order of networkx.topological_sort on the same
+    graph: level by level, in the order their last predecessor is visited,
+    then in the order of its successors.
+    """
+    position = np.empty(graph.num_tasks, dtype=np.int64)
+    seen = 0
+    for k, nodes in enumerate(levels):
+        if k:
+            last = _reduce_edges(np.maximum, graph.pred_ptr, graph.pred_idx, nodes, position)
+            nodes = nodes[np.lexsort((nodes, last))]
+        position[nodes] = np.arange(seen, seen + nodes.size)
+        seen += nodes.size
+    return position
+
+
+def compute_timing(graph: TaskGraph) -> Timing:
+    """
+    ASAP and ALAP start times, slack, upper bound and critical path in one
+    sweep over the topological levels, reducing edge arrays level by level.
+
+    ``alap`` keeps the convention of the former alap_binding: the latest start
+    of a task relative to a deadline at time 0, so sinks get ``-duration``.
+    """
+    graph = as_task_graph(graph)
+    duration = graph.duration
+    levels = graph.topological_levels()
+
+    asap = np.zeros(graph.num_tasks, dtype=np.int64)
+    finish = duration.copy()
+    for nodes in levels[1:]:
+        asap[nodes] = _reduce_edges(np.maximum, graph.pred_ptr, graph.pred_idx, nodes, finish)
+        finish[nodes] = asap[nodes] + duration[nodes]
+
+    alap = -duration
+    out_degree = graph.out_degree()
+    for nodes in reversed(levels):
+        nodes = nodes[out_degree[nodes] > 0]
+        if nodes.size:
+            alap[nodes] = _reduce_edges(np.minimum, graph.succ_ptr, graph.succ_idx, nodes, alap) - duration[nodes]
+
+    makespan = int(finish.max(initial=0))
+    slack = alap + makespan - asap
+
+    critical_path = []
+    position = None
+    if graph.num_tasks:
+        node = int(np.argmax(asap))
+        critical_path.append(node)
+        while asap[node] > 0:
+            preds = graph.predecessors(node)
+            tied = preds[finish[preds] == asap[node]]
+            if tied.size > 1:
+                # Like the networkx version: the first one in topological order
+                if position is None:
+                    position = _topological_positions(graph, levels)
+                node = int(tied[np.argmin(position[tied])])
+            else:
+                node = int(tied[0])
+            critical_path.append(node)
+        critical_path.reverse()
+
+    return Timing(levels, asap, alap, slack, int(duration.sum()), critical_path,
+                  int(asap.max(initial=0)))
+
+
+def alap_binding(graph: TaskGraph) -> tuple[dict[Any,int],int]:
+    graph = as_task_graph(graph)
+    timing = compute_timing(graph)
+    return dict(zip(graph.ids, timing.alap.tolist())), timing.ub
+
+
+def asap_binding(graph: TaskGraph) -> dict[Any,int]:
+    graph = as_task_graph(graph)
+    timing = compute_timing(graph)
+    return dict(zip(graph.ids, timing.asap.tolist()))
+
+
+def alap_order(graph: TaskGraph) -> tuple[list[tuple[int,Any]],int]:
+    """Heap of (ALAP, task id) pairs, ready for the MCP loop, and the upper bound."""
+    graph = as_task_graph(graph)
+    timing = compute_timing(graph)
+    order = list(zip(timing.alap.tolist(), graph.ids))
+    heapq.heapify(order)
+    return order, timing.ub
+
+
+def upward_rank(graph: TaskGraph, edge_cost: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    HEFT upward rank: duration of a task plus the longest path from its end
+    to an exit task, edge_cost (aligned with succ_idx) included. Without
+    edge costs it is the static b-level, that is -alap.
+    """
+    graph = as_task_graph(graph)
+    rank = graph.duration.astype(np.float64)
+    out_degree = graph.out_degree()
+    for nodes in reversed(graph.topological_levels()):
+        nodes = nodes[out_degree[nodes] > 0]
+        if nodes.size:
+            counts = out_degree[nodes]
+            edges = csr_segments(graph.succ_ptr[nodes], counts)
+            values = rank[graph.succ_idx[edges]]
+            if edge_cost is not None:
+                values = values + edge_cost[edges]
+            rank[nodes] += np.maximum.reduceat(values, np.cumsum(counts) - counts)
+    return rank
+
+
+def downward_rank(graph: TaskGraph, edge_cost: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Longest path from an entry task to the start of a task, edge_cost
+    (aligned with pred_idx) included. Without edge costs it is the ASAP start.
+    """
+    graph = as_task_graph(graph)
+    rank = np.zeros(graph.num_tasks, dtype=np.float64)
+    in_degree = graph.in_degree()
+    for nodes in graph.topological_levels()[1:]:
+        counts = in_degree[nodes]
+        edges = csr_segments(graph.pred_ptr[nodes], counts)
+        preds = graph.pred_idx[edges]
+        values = rank[preds] + graph.duration[preds]
+        if edge_cost is not None:
+            values = values + edge_cost[edges]
+        rank[nodes] = np.maximum.reduceat(values, np.cumsum(counts) - counts)
+    return rank